@@ -0,0 +1,132 @@
+"""Building blocks for the application factories in app.py and aws_app.py.
+
+Importing either app module must be cheap. It should not connect to
+AWS, open files or start threads. Two helpers make that possible without
+rewriting every handler:
+
+* ``RouteRegistry`` collects views, teardown handlers and CLI commands
+  declared at module level and attaches them when ``create_app()`` builds
+  a Flask app. Endpoint names remain the view function names, so every
+  ``url_for()`` call is unchanged.
+* ``Lazy`` stands in for an expensive object (a boto3 resource, a table,
+  the tick store) and creates it on first use.
+
+Background services are started separately, once per process, by each
+module's ``start_services()``; see ``Services``.
+"""
+import threading
+
+import click
+from flask.cli import with_appcontext
+
+# Shared by every Lazy: boto3 sessions are not thread-safe, and one lazy
+# object's factory may use another
+_create_lock = threading.RLock()
+
+
+class Lazy:
+    """A proxy that calls ``factory()`` on first attribute access and delegates to the result."""
+
+    def __init__(self, factory):
+        object.__setattr__(self, '_factory', factory)
+        object.__setattr__(self, '_value', None)
+
+    def get(self):
+        """Returns the underlying object, creating it if needed."""
+        value = self._value
+        if value is None:
+            with _create_lock:
+                value = self._value
+                if value is None:
+                    value = self._factory()
+                    object.__setattr__(self, '_value', value)
+        return value
+
+    @property
+    def created(self):
+        return self._value is not None
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self.get(), name, value)
+
+    def __repr__(self):
+        return f'<Lazy {self._value!r}>' if self.created else '<Lazy (not created)>'
+
+
+class RouteRegistry:
+    """Records routes, request hooks, teardown handlers and CLI commands until ``init_app()``."""
+
+    def __init__(self):
+        self._routes = []
+        self._hooks = []
+        self._teardowns = []
+        self._commands = []
+
+    def route(self, rule, **options):
+        """Like ``Flask.route``; the endpoint defaults to the view function's name."""
+        def decorator(view):
+            view_options = dict(options)
+            endpoint = view_options.pop('endpoint', view.__name__)
+            self._routes.append((rule, endpoint, view, view_options))
+            return view
+        return decorator
+
+    def before_request(self, fn):
+        self._hooks.append(('before_request', fn))
+        return fn
+
+    def after_request(self, fn):
+        self._hooks.append(('after_request', fn))
+        return fn
+
+    def teardown_request(self, fn):
+        self._hooks.append(('teardown_request', fn))
+        return fn
+
+    def teardown_appcontext(self, fn):
+        self._teardowns.append(fn)
+        return fn
+
+    def command(self, name):
+        """Like ``app.cli.command``: a click command run inside an app context."""
+        def decorator(fn):
+            self._commands.append(click.command(name)(with_appcontext(fn)))
+            return fn
+        return decorator
+
+    def init_app(self, app):
+        """Attaches everything recorded so far to ``app``."""
+        for rule, endpoint, view, options in self._routes:
+            app.add_url_rule(rule, endpoint, view, **options)
+        for hook, fn in self._hooks:
+            getattr(app, hook)(fn)
+        for fn in self._teardowns:
+            app.teardown_appcontext(fn)
+        for command in self._commands:
+            app.cli.add_command(command)
+        return app
+
+
+class Services:
+    """Runs a process's background services exactly once.
+
+    ``start()`` calls each starter in order the first time and returns
+    True. Later calls, from any thread or app instance, return False.
+    """
+
+    def __init__(self, *starters):
+        self.starters = starters
+        self.started = False
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self.started:
+                return False
+            for starter in self.starters:
+                starter()
+            self.started = True
+        return True
@@ -0,0 +1,134 @@
+"""Load benchmark: the same request mix against every storage backend.
+
+Builds the app from views.py once per backend (memory, SQLite in a
+scratch directory, and DynamoDB through moto when it is installed) and
+replays one seeded mix of trader requests through the Flask test client:
+dashboard and portfolio loads, history pages, price polls and trades.
+The in-memory backend does no storage I/O, so its numbers are the
+ceiling the other two are measured against.
+
+moto only emulates DynamoDB, so its latencies say nothing about a real
+table; use them to compare request shapes, not absolute speed.
+
+    python benchmarks/bench_backends.py [requests] [traders]
+"""
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from market import Market  # noqa: E402
+from sqlite_storage import SQLiteStorage  # noqa: E402
+from storage import MemoryStorage  # noqa: E402
+from views import Stocker, create_app  # noqa: E402
+
+SYMBOLS = ['AAPL', 'MSFT', 'TSLA', 'NVDA', 'AMZN', 'GOOGL']
+
+# (weight, kind): most requests read, one in ten trades
+MIX = [
+    (30, 'dashboard'),
+    (15, 'portfolio'),
+    (10, 'history'),
+    (25, 'prices'),
+    (10, 'valuation'),
+    (10, 'trade'),
+]
+
+
+def dynamo_storage():
+    """Returns a DynamoStorage on moto's in-process DynamoDB, or None without moto."""
+    try:
+        import boto3
+        from moto import mock_aws
+    except ImportError:
+        return None
+    from dynamo_storage import DynamoStorage
+    for name in ('AWS_ACCESS_KEY_ID', 'AWS_SECRET_ACCESS_KEY'):
+        os.environ.setdefault(name, 'bench')
+    mock = mock_aws()
+    mock.start()
+    storage = DynamoStorage(boto3.resource('dynamodb', region_name='us-east-1'))
+    storage.mock = mock
+    return storage
+
+
+def build(storage, workdir):
+    market = Market(SYMBOLS, os.path.join(workdir, f'ticks-{storage.name}'), seed=1)
+    storage.init()
+    market.publish()
+    app = create_app(Stocker(storage, market), 'bench')
+    return app, market
+
+
+def login(client, i):
+    email = f'trader{i}@example.com'
+    client.post('/signup', data={'username': f'trader{i}', 'email': email, 'password': 'pw', 'role': 'Trader'})
+    client.post('/login', data={'email': email, 'password': 'pw', 'role': 'Trader'})
+    return client
+
+
+def request(client, kind, rng):
+    if kind == 'trade':
+        return client.post('/trade', data={'stock_symbol': rng.choice(SYMBOLS), 'quantity': rng.randint(1, 10),
+                                           'trade_type': 'BUY'})
+    path = {'dashboard': '/dashboard', 'portfolio': '/portfolio', 'history': '/history',
+            'prices': '/api/stock_prices', 'valuation': '/api/portfolio/valuation'}[kind]
+    return client.get(path)
+
+
+def run(app, requests, traders, seed=7):
+    """Replays the mix; returns (requests/sec, {kind: sorted latencies in ms})."""
+    clients = [login(app.test_client(), i) for i in range(traders)]
+    rng = random.Random(seed)
+    kinds = rng.choices([kind for _, kind in MIX], weights=[w for w, _ in MIX], k=requests)
+    latencies = {kind: [] for _, kind in MIX}
+    started = time.perf_counter()
+    for n, kind in enumerate(kinds):
+        before = time.perf_counter()
+        response = request(clients[n % traders], kind, rng)
+        latencies[kind].append((time.perf_counter() - before) * 1000)
+        if response.status_code >= 400:
+            raise RuntimeError(f'{kind} failed with {response.status_code}')
+    elapsed = time.perf_counter() - started
+    return requests / elapsed, {kind: sorted(values) for kind, values in latencies.items()}
+
+
+def percentile(values, p):
+    return values[min(len(values) - 1, int(len(values) * p))] if values else 0.0
+
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    traders = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    workdir = tempfile.mkdtemp(prefix='stocker-bench-')
+    backends = [MemoryStorage(), SQLiteStorage(os.path.join(workdir, 'stocker.db'))]
+    dynamo = dynamo_storage()
+    if dynamo is None:
+        print('moto is not installed: skipping DynamoDB')
+    else:
+        backends.append(dynamo)
+    try:
+        print(f'{requests} requests from {traders} traders')
+        for storage in backends:
+            app, market = build(storage, workdir)
+            rate, latencies = run(app, requests, traders)
+            every = sorted(v for values in latencies.values() for v in values)
+            print(f'{storage.name:>8}: {rate:8.0f} req/s  p50 {percentile(every, 0.5):7.2f} ms  '
+                  f'p99 {percentile(every, 0.99):7.2f} ms')
+            for kind, values in latencies.items():
+                print(f'{"":>10}{kind:<10} p50 {percentile(values, 0.5):7.2f} ms  '
+                      f'p99 {percentile(values, 0.99):7.2f} ms  ({len(values)})')
+            market.tick_store.close()
+            storage.close()
+    finally:
+        if dynamo is not None:
+            dynamo.mock.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
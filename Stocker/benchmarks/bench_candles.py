@@ -0,0 +1,99 @@
+"""Benchmark: tick store size, append rate and candle query latency.
+
+Appends ``days`` of 10-second ticks for the app's 24 symbols into a
+scratch tick store. It reports bytes on disk per tick, compared with the
+same ticks written as one SQLite row per (tick, symbol). It then times
+candle queries over the whole range, both cold (bars rolled up from the
+memory-mapped segments) and warm (bars of sealed segments served from
+the cache).
+
+    python benchmarks/bench_candles.py [days]
+"""
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..'))
+
+from price_engine import PriceEngine  # noqa: E402
+from tick_store import DAY_MS, TickStore  # noqa: E402
+
+SYMBOLS = [
+    'AAPL', 'GOOGL', 'MSFT', 'AMZN', 'TSLA', 'NVDA', 'META', 'NFLX',
+    'ADBE', 'CRM', 'ORCL', 'INTC', 'AMD', 'PYPL', 'UBER', 'SPOT',
+    'TWTR', 'SNAP', 'SQ', 'ZOOM', 'SHOP', 'ROKU', 'PINS', 'DOCU'
+]
+TICK_SECONDS = 10
+SQLITE_SAMPLE_TICKS = 20_000
+
+
+def disk_usage(directory):
+    # Allocated blocks, so the sparse tail of a segment is not counted
+    return sum(os.stat(os.path.join(directory, name)).st_blocks * 512 for name in os.listdir(directory))
+
+
+def sqlite_bytes_per_tick(engine, scratch):
+    path = os.path.join(scratch, 'ticks.db')
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE ticks (symbol TEXT, timestamp INTEGER, price REAL, volume INTEGER)')
+    conn.execute('CREATE INDEX idx_ticks_symbol_timestamp ON ticks (symbol, timestamp)')
+    for i in range(SQLITE_SAMPLE_TICKS):
+        prices = engine.step().round(2).tolist()
+        conn.executemany('INSERT INTO ticks VALUES (?, ?, ?, 0)',
+                         ((symbol, i * TICK_SECONDS, price) for symbol, price in zip(SYMBOLS, prices)))
+    conn.commit()
+    conn.close()
+    return os.path.getsize(path) / SQLITE_SAMPLE_TICKS
+
+
+def timed(fn, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000, result
+
+
+def main():
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else 90
+    ticks = days * 86400 // TICK_SECONDS
+    scratch = tempfile.mkdtemp(prefix='stocker-ticks-')
+    try:
+        engine = PriceEngine(SYMBOLS, seed=42)
+        store = TickStore(os.path.join(scratch, 'ticks'), SYMBOLS)
+        start = (int(time.time() * 1000) // DAY_MS - days) * DAY_MS / 1000
+
+        started = time.perf_counter()
+        for i in range(ticks):
+            store.append(engine.step().round(2), start + i * TICK_SECONDS)
+        elapsed = time.perf_counter() - started
+        store.close()
+        size = disk_usage(os.path.join(scratch, 'ticks'))
+        print(f'{days} days, {ticks:,} ticks x {len(SYMBOLS)} symbols')
+        print(f'append: {ticks / elapsed:,.0f} ticks/sec')
+        print(f'tick store: {size / 2**20:.1f} MiB, {size / ticks:.0f} bytes/tick')
+        print(f'sqlite rows: {sqlite_bytes_per_tick(PriceEngine(SYMBOLS, seed=42), scratch):.0f} bytes/tick')
+
+        end = start + ticks * TICK_SECONDS
+        queries = [
+            ('1h, whole range', '1h', start, end, 5000),
+            ('5m, last week', '5m', end - 7 * 86400, end, 5000),
+            ('1m, last day', '1m', end - 86400, end, 5000),
+            ('1m, latest 500', '1m', None, end, 500),
+        ]
+        for label, interval, lo, hi, limit in queries:
+            cold = TickStore(os.path.join(scratch, 'ticks'), SYMBOLS)
+            cold_ms, bars = timed(lambda: cold.candles('AAPL', interval, lo, hi, limit), repeat=1)
+            warm_ms, _ = timed(lambda: cold.candles('AAPL', interval, lo, hi, limit))
+            print(f'{label:>16}: {len(bars):5d} bars  cold {cold_ms:7.2f} ms  warm {warm_ms:7.2f} ms')
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""Benchmark: peak memory of streaming trade exports.
+
+Fills scratch databases of increasing size, then exports each one in a
+fresh child process that drains the CSV or NDJSON generator the same way a
+Response would and reports its peak RSS. Streaming exports should level
+off at the interpreter plus the SQLite page cache whatever the row count,
+while the fetchall() baseline grows with the table. The script exits with
+status 1 if a streaming export peaks above the limit (64 MB by default),
+so it can gate a change that reintroduces buffering.
+
+    python benchmarks/bench_export.py [max_rows] [limit_mb]
+"""
+import os
+import random
+import resource
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..'))
+
+from db import ConnectionPool  # noqa: E402
+from exports import SQLITE_EXPORTS, sqlite_export  # noqa: E402
+from migrations import migrate  # noqa: E402
+
+USERS = 100
+SYMBOLS = ['AAPL', 'GOOGL', 'MSFT', 'AMZN', 'TSLA', 'NVDA', 'META', 'NFLX']
+BATCH = 100_000
+STREAMING_MODES = ('csv', 'ndjson')
+
+# Peak RSS a streaming export may reach; the interpreter alone is ~17 MB
+# and the SQLite page cache levels off below 40 MB at 1M rows
+PEAK_RSS_LIMIT_MB = 64
+
+
+def populate(conn, start, stop):
+    for offset in range(start, stop, BATCH):
+        rows = (
+            (random.randint(1, USERS), random.choice(SYMBOLS), random.randint(1, 100),
+             round(random.uniform(50, 500), 2), random.choice(('BUY', 'SELL')),
+             f'2024-01-01 00:00:{i:012d}')
+            for i in range(offset, min(offset + BATCH, stop))
+        )
+        conn.executemany('''
+            INSERT INTO trades (user_id, stock_symbol, qty, price, type, timestamp)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', rows)
+        conn.commit()
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_export(path, mode):
+    """Child process: drains one export and prints 'rows bytes seconds peak_mb'."""
+    started = time.perf_counter()
+    size = 0
+    if mode == 'fetchall':
+        columns, sql = SQLITE_EXPORTS['trades']
+        conn = sqlite3.connect(path)
+        rows = conn.execute(sql).fetchall()
+        size = sum(len(','.join(map(str, row))) + 1 for row in rows)
+    else:
+        pool = ConnectionPool(path, size=1)
+        for chunk in sqlite_export(pool, 'trades', mode):
+            size += len(chunk)
+    elapsed = time.perf_counter() - started
+    print(f'{size} {elapsed:.2f} {peak_rss_mb():.1f}')
+
+
+def measure(path, mode):
+    out = subprocess.run([sys.executable, __file__, '--child', path, mode],
+                         check=True, capture_output=True, text=True).stdout.split()
+    return int(out[0]), float(out[1]), float(out[2])
+
+
+def main():
+    max_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    limit_mb = float(sys.argv[2]) if len(sys.argv) > 2 else PEAK_RSS_LIMIT_MB
+    sizes = [n for n in (1_000, 10_000, 100_000, 1_000_000, 10_000_000) if n <= max_rows]
+
+    over = []
+    scratch = tempfile.mkdtemp(prefix='stocker-bench-')
+    try:
+        path = os.path.join(scratch, 'bench.db')
+        conn = sqlite3.connect(path)
+        migrate(conn)
+        conn.executemany(
+            'INSERT INTO users (username, email, password, role) VALUES (?, ?, ?, ?)',
+            [(f'user{i}', f'user{i}@example.com', 'x', 'Trader') for i in range(1, USERS + 1)])
+        conn.commit()
+
+        print(f"{'rows':>10} {'mode':>9} {'MB out':>8} {'seconds':>8} {'peak RSS MB':>12}")
+        filled = 0
+        for rows in sizes:
+            populate(conn, filled, rows)
+            filled = rows
+            for mode in STREAMING_MODES + ('fetchall',):
+                size, elapsed, peak = measure(path, mode)
+                print(f'{rows:>10} {mode:>9} {size / 1e6:>8.1f} {elapsed:>8.2f} {peak:>12.1f}')
+                if mode in STREAMING_MODES and peak > limit_mb:
+                    over.append(f'{mode} export of {rows} rows peaked at {peak:.1f} MB')
+        conn.close()
+    finally:
+        shutil.rmtree(scratch)
+    if over:
+        for failure in over:
+            print(f'FAIL: {failure}, over the {limit_mb:g} MB limit')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) == 4 and sys.argv[1] == '--child':
+        run_export(sys.argv[2], sys.argv[3])
+    else:
+        main()
@@ -0,0 +1,105 @@
+"""Benchmark: logins per second at each scrypt cost setting.
+
+Each setting is run the way login() uses it: ``clients`` threads check
+a password through one PasswordHasher pool, whose hashes were made with
+that setting. The legacy unsalted SHA-256 check is the baseline. While
+the logins run, another thread times a small stand-in for a trade
+request, showing how much a login storm slows the rest of the app for
+that pool size.
+
+    python benchmarks/bench_passwords.py [seconds] [clients] [workers]
+"""
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from passwords import PasswordHasher, PasswordHasherBusy, encode, legacy_hash  # noqa: E402
+
+# (n, r, p); 2**14 with r=8 is the default
+SETTINGS = [
+    (2 ** 12, 8, 1),
+    (2 ** 14, 8, 1),
+    (2 ** 15, 8, 1),
+    (2 ** 16, 8, 1),
+]
+
+
+def request_work():
+    """Roughly the Python work of a cheap request: build and format a small payload."""
+    return ','.join(f'{i}:{i * 1.5:.2f}' for i in range(200))
+
+
+def probe(stop, latencies):
+    while not stop.is_set():
+        started = time.perf_counter()
+        request_work()
+        latencies.append((time.perf_counter() - started) * 1000)
+        time.sleep(0.001)
+
+
+def run(check, seconds, clients):
+    """Calls ``check()`` from ``clients`` threads for ``seconds``; returns (logins/sec, busy, probe p99 ms)."""
+    stop = threading.Event()
+    counts = [0] * clients
+    busy = [0] * clients
+    latencies = []
+
+    def client(i):
+        while not stop.is_set():
+            try:
+                check()
+                counts[i] += 1
+            except PasswordHasherBusy:
+                busy[i] += 1
+                time.sleep(0.001)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    threads.append(threading.Thread(target=probe, args=(stop, latencies)))
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99)] if latencies else 0.0
+    return sum(counts) / elapsed, sum(busy), p99
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 3.0
+    clients = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else 2
+
+    idle = []
+    stop = threading.Event()
+    thread = threading.Thread(target=probe, args=(stop, idle))
+    thread.start()
+    time.sleep(1.0)
+    stop.set()
+    thread.join()
+    idle.sort()
+    print(f'{clients} clients, {workers} hashing workers, {os.cpu_count()} CPUs; '
+          f'idle request p99 {idle[int(len(idle) * 0.99)]:.3f} ms')
+
+    stored = legacy_hash('correct horse')
+    rate, _, p99 = run(lambda: legacy_hash('correct horse') == stored, seconds, clients)
+    print(f'{"sha256 (legacy)":>22}: {rate:9.0f} logins/sec  request p99 {p99:7.3f} ms')
+
+    for n, r, p in SETTINGS:
+        hasher = PasswordHasher(n, r, p, workers=workers, max_pending=clients)
+        stored = encode('correct horse', n, r, p)
+        rate, busy, p99 = run(lambda: hasher.check('correct horse', stored), seconds, clients)
+        memory = 128 * n * r // (1024 * 1024)
+        print(f'{f"scrypt n=2**{n.bit_length() - 1} r={r} p={p}":>22}: {rate:9.1f} logins/sec  '
+              f'request p99 {p99:7.3f} ms  ({memory} MB per hash, {busy} turned away)')
+        hasher.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""Benchmark: price simulation ticks/sec.
+
+Times one full-universe tick for each price model, plus the original
+per-symbol random.uniform loop for comparison.
+
+    python benchmarks/bench_price_engine.py [symbols] [ticks]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from price_engine import GBMModel, JumpDiffusionModel, PriceEngine, SectorModel  # noqa: E402
+
+SECTORS = 11
+
+
+def legacy_step(prices):
+    for symbol in prices:
+        change = random.uniform(-0.05, 0.05)
+        prices[symbol] = round(prices[symbol] * (1 + change), 2)
+
+
+def rate(fn, ticks):
+    started = time.perf_counter()
+    for _ in range(ticks):
+        fn()
+    return ticks / (time.perf_counter() - started)
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    ticks = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    symbols = [f'SYM{i}' for i in range(n)]
+    sectors = [i % SECTORS for i in range(n)]
+
+    legacy = {s: random.uniform(50, 500) for s in symbols}
+    print(f'{n} symbols, {ticks} ticks')
+    print(f"{'legacy loop':>16}: {rate(lambda: legacy_step(legacy), ticks):10.1f} ticks/sec")
+
+    models = {
+        'gbm': GBMModel(),
+        'jump': JumpDiffusionModel(),
+        'sector': SectorModel(sectors),
+    }
+    for name, model in models.items():
+        engine = PriceEngine(symbols, model=model, seed=42)
+        # Publishing includes rounding and building the {symbol: price} dict
+        step_rate = rate(engine.step, ticks)
+        publish_rate = rate(lambda: (engine.step(), engine.as_dict()), ticks)
+        print(f'{name:>16}: {step_rate:10.1f} ticks/sec, {publish_rate:10.1f} ticks/sec with as_dict()')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""Benchmark: hot-query latency as the trades table grows.
+
+Fills a scratch database in steps and, at each size, times the queries
+behind history(), trade() and login() against the schema before and after
+the index migration. With the indexes in place latency should stay flat
+while the unindexed timings grow with the table.
+
+    python benchmarks/bench_queries.py [max_rows]
+"""
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from migrations import migrate  # noqa: E402
+
+USERS = 1000
+SYMBOLS = ['AAPL', 'GOOGL', 'MSFT', 'AMZN', 'TSLA', 'NVDA', 'META', 'NFLX']
+REPEAT = 200
+
+QUERIES = {
+    'history': ('''
+        SELECT stock_symbol, qty, price, type, timestamp
+        FROM trades
+        WHERE user_id = ?
+        ORDER BY timestamp DESC
+        LIMIT 50
+    ''', lambda: (random.randint(1, USERS),)),
+    'position': ('''
+        SELECT quantity, avg_price FROM portfolio
+        WHERE user_id = ? AND stock_symbol = ?
+    ''', lambda: (random.randint(1, USERS), random.choice(SYMBOLS))),
+    'login': ('''
+        SELECT * FROM users WHERE email = ? AND role = ?
+    ''', lambda: (f'user{random.randint(1, USERS)}@example.com', 'Trader')),
+}
+
+
+def populate(conn, start, stop):
+    rows = (
+        (random.randint(1, USERS), random.choice(SYMBOLS), random.randint(1, 100),
+         round(random.uniform(50, 500), 2), random.choice(('BUY', 'SELL')),
+         f'2024-01-01 00:00:{i:012d}')
+        for i in range(start, stop)
+    )
+    conn.executemany('''
+        INSERT INTO trades (user_id, stock_symbol, qty, price, type, timestamp)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', rows)
+    conn.commit()
+
+
+def time_query(conn, sql, params, budget=1.0):
+    # Runs up to REPEAT queries or until the time budget is spent
+    started = time.perf_counter()
+    runs = 0
+    while runs < REPEAT:
+        conn.execute(sql, params()).fetchall()
+        runs += 1
+        if time.perf_counter() - started > budget:
+            break
+    return (time.perf_counter() - started) / runs * 1e6
+
+
+def setup(path, indexed):
+    conn = sqlite3.connect(path)
+    migrate(conn, target=2 if indexed else 1)
+    conn.executemany(
+        'INSERT INTO users (username, email, password, role) VALUES (?, ?, ?, ?)',
+        [(f'user{i}', f'user{i}@example.com', 'x', 'Trader') for i in range(1, USERS + 1)])
+    conn.executemany(
+        'INSERT INTO portfolio (user_id, stock_symbol, quantity, avg_price) VALUES (?, ?, ?, ?)',
+        [(u, s, 10, 100.0) for u in range(1, USERS + 1) for s in SYMBOLS])
+    conn.commit()
+    return conn
+
+
+def main():
+    max_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    sizes = [n for n in (10_000, 100_000, 500_000, 1_000_000, 2_000_000, 5_000_000) if n <= max_rows]
+    workdir = tempfile.mkdtemp(prefix='stocker-bench-')
+    databases = {
+        'unindexed': setup(os.path.join(workdir, 'plain.db'), indexed=False),
+        'indexed': setup(os.path.join(workdir, 'indexed.db'), indexed=True),
+    }
+
+    print(f"{'rows':>10} {'schema':>10} " + ' '.join(f'{name + " us":>12}' for name in QUERIES))
+    filled = 0
+    for size in sizes:
+        for label, conn in databases.items():
+            random.seed(size)
+            populate(conn, filled, size)
+            timings = [time_query(conn, sql, params) for sql, params in QUERIES.values()]
+            print(f'{size:>10} {label:>10} ' + ' '.join(f'{t:>12.1f}' for t in timings))
+        filled = size
+
+    for conn in databases.values():
+        conn.close()
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""Benchmark: shared-memory price reads while the publisher writes.
+
+A writer process creates a scratch block and publishes ticks into it as
+fast as it can. Reader processes read the block in a loop. Each tick
+sets every price to the tick's sequence number, so a torn read (prices
+from two ticks) is easy to detect. The benchmark reports reads per
+second, read latency and torn reads, which should be zero.
+
+    python benchmarks/bench_shared_prices.py [readers] [seconds]
+"""
+import multiprocessing
+import os
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..'))
+
+import numpy as np  # noqa: E402
+
+from shared_prices import SharedPrices  # noqa: E402
+
+SYMBOLS = [
+    'AAPL', 'GOOGL', 'MSFT', 'AMZN', 'TSLA', 'NVDA', 'META', 'NFLX',
+    'ADBE', 'CRM', 'ORCL', 'INTC', 'AMD', 'PYPL', 'UBER', 'SPOT',
+    'TWTR', 'SNAP', 'SQ', 'ZOOM', 'SHOP', 'ROKU', 'PINS', 'DOCU'
+]
+NAME = f'stocker_bench_{os.getpid()}'
+
+
+def write(ready, stop, ticks):
+    # Created here rather than in the parent, so every process has its own resource tracker
+    shared = SharedPrices.create(NAME, SYMBOLS)
+    ready.set()
+    prices = np.zeros(len(SYMBOLS))
+    seq = 0
+    while not stop.is_set():
+        seq += 1
+        prices[:] = seq
+        shared.publish(seq, time.time(), prices)
+    ticks.value = seq
+    shared.close()
+
+
+def read(stop, results):
+    shared = SharedPrices.attach(NAME, SYMBOLS)
+    reads = torn = 0
+    started = time.perf_counter()
+    while not stop.is_set():
+        tick = shared.read()
+        if tick is None:
+            continue
+        seq, _, prices = tick
+        reads += 1
+        if not (prices == seq).all():
+            torn += 1
+    results.put((reads, torn, time.perf_counter() - started))
+    shared.close()
+
+
+def main():
+    readers = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 3
+    ready = multiprocessing.Event()
+    stop = multiprocessing.Event()
+    ticks = multiprocessing.Value('q', 0)
+    results = multiprocessing.Queue()
+    writer = multiprocessing.Process(target=write, args=(ready, stop, ticks))
+    writer.start()
+    ready.wait()
+    processes = [multiprocessing.Process(target=read, args=(stop, results)) for _ in range(readers)]
+    for process in processes:
+        process.start()
+    time.sleep(seconds)
+    stop.set()
+    samples = [results.get() for _ in range(readers)]
+    for process in processes + [writer]:
+        process.join()
+
+    reads = sum(s[0] for s in samples)
+    torn = sum(s[1] for s in samples)
+    elapsed = max(s[2] for s in samples)
+    print(f'{readers} readers, 1 writer, {seconds:g}s, {len(SYMBOLS)} symbols')
+    print(f'writer: {ticks.value / seconds:,.0f} ticks/sec')
+    print(f'readers: {reads / elapsed:,.0f} reads/sec in total, '
+          f'{elapsed / max(reads / readers, 1) * 1e6:.2f} us per read')
+    print(f'torn reads: {torn}')
+
+
+if __name__ == '__main__':
+    main()
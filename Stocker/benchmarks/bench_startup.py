@@ -0,0 +1,77 @@
+"""Benchmark: import-to-first-request latency of the app modules.
+
+Each measurement runs in a fresh interpreter, working in a scratch
+directory. It times importing the module, then serving a first request
+to ``/`` through the Flask test client. It also reports how many threads
+the import left running. The AWS module is imported with dummy
+credentials and no network access, so any AWS call made at import time
+shows up as a failure or a timeout.
+
+    python benchmarks/bench_startup.py [runs]
+"""
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.join(HERE, '..')
+
+CHILD = '''
+import json, sys, threading, time
+started = time.perf_counter()
+sys.path.insert(0, {app_dir!r})
+module = __import__({module!r})
+imported = time.perf_counter()
+threads = threading.active_count()
+response = module.app.test_client().get('/')
+served = time.perf_counter()
+print(json.dumps({{'import': imported - started, 'first_request': served - imported,
+                  'total': served - started, 'threads': threads, 'status': response.status_code}}))
+'''
+
+# Unroutable endpoint: a module that calls AWS at import fails fast instead of reaching the internet
+ENV = {
+    'AWS_ACCESS_KEY_ID': 'bench',
+    'AWS_SECRET_ACCESS_KEY': 'bench',
+    'AWS_DEFAULT_REGION': 'us-east-1',
+    'AWS_ENDPOINT_URL': 'http://127.0.0.1:9',
+    'AWS_MAX_ATTEMPTS': '1',
+}
+
+
+def measure(module, scratch):
+    code = CHILD.format(app_dir=os.path.abspath(APP_DIR), module=module)
+    result = subprocess.run([sys.executable, '-c', code], cwd=scratch, capture_output=True,
+                            text=True, timeout=120, env={**os.environ, **ENV})
+    if result.returncode:
+        raise RuntimeError(f'{module}: {result.stderr.strip().splitlines()[-1]}')
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    scratch = tempfile.mkdtemp(prefix='stocker-startup-')
+    try:
+        print(f'{runs} runs each, median')
+        for module in ('app', 'aws_app'):
+            try:
+                samples = [measure(module, scratch) for _ in range(runs)]
+            except RuntimeError as e:
+                print(f'{module:>8}: failed ({e})')
+                continue
+            median = {key: statistics.median(s[key] for s in samples)
+                      for key in ('import', 'first_request', 'total')}
+            print(f"{module:>8}: import {median['import'] * 1000:7.1f} ms  "
+                  f"first request {median['first_request'] * 1000:7.1f} ms  "
+                  f"total {median['total'] * 1000:7.1f} ms  "
+                  f"threads after import {samples[0]['threads']}  status {samples[0]['status']}")
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""Benchmark: concurrent trade execution.
+
+Runs many threads placing orders for a handful of users and symbols and
+reports trades/sec for the engine and for the legacy read-then-write
+implementation, with buys only and with mixed buys and sells. It only
+measures speed: tests/test_trading.py checks that concurrent orders lose
+no updates and cannot oversell.
+
+    python benchmarks/bench_trades.py [threads] [orders_per_thread]
+"""
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from db import ConnectionPool  # noqa: E402
+from migrations import migrate  # noqa: E402
+from trading import execute_trade  # noqa: E402
+
+USERS = 4
+SYMBOLS = ['AAPL', 'MSFT', 'TSLA']
+
+
+def legacy_trade(conn, user_id, symbol, quantity, price, trade_type):
+    """The pre-engine trade() body: separate SELECT and UPDATE/INSERT."""
+    cursor = conn.cursor()
+    cursor.execute('INSERT INTO trades (user_id, stock_symbol, qty, price, type) VALUES (?, ?, ?, ?, ?)',
+                   (user_id, symbol, quantity, price, trade_type))
+    cursor.execute('SELECT quantity, avg_price FROM portfolio WHERE user_id = ? AND stock_symbol = ?',
+                   (user_id, symbol))
+    existing = cursor.fetchone()
+    if trade_type == 'BUY':
+        if existing:
+            new_qty = existing[0] + quantity
+            new_avg = ((existing[0] * existing[1]) + (quantity * price)) / new_qty
+            cursor.execute('UPDATE portfolio SET quantity = ?, avg_price = ? WHERE user_id = ? AND stock_symbol = ?',
+                           (new_qty, new_avg, user_id, symbol))
+        else:
+            cursor.execute('INSERT OR IGNORE INTO portfolio (user_id, stock_symbol, quantity, avg_price) VALUES (?, ?, ?, ?)',
+                           (user_id, symbol, quantity, price))
+    else:
+        if existing:
+            cursor.execute('UPDATE portfolio SET quantity = ? WHERE user_id = ? AND stock_symbol = ?',
+                           (existing[0] - quantity, user_id, symbol))
+        else:
+            cursor.execute('INSERT OR IGNORE INTO portfolio (user_id, stock_symbol, quantity, avg_price) VALUES (?, ?, ?, ?)',
+                           (user_id, symbol, -quantity, price))
+    conn.commit()
+
+
+def run(pool, trade_fn, threads, orders, sides):
+    def worker(seed):
+        rng = random.Random(seed)
+        conn = pool.acquire()
+        try:
+            for _ in range(orders):
+                try:
+                    trade_fn(conn, rng.randint(1, USERS), rng.choice(SYMBOLS), rng.randint(1, 10),
+                             round(rng.uniform(50, 500), 2), rng.choice(sides))
+                except ValueError:
+                    # The engine rejects oversells without recording a trade
+                    pass
+        finally:
+            pool.release(conn)
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    started = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return threads * orders / (time.perf_counter() - started)
+
+
+def main():
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    orders = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    workdir = tempfile.mkdtemp(prefix='stocker-bench-')
+    try:
+        for name, trade_fn in (('legacy', legacy_trade), ('engine', execute_trade)):
+            for phase, sides in (('buys', ('BUY',)), ('mixed', ('BUY', 'SELL'))):
+                pool = ConnectionPool(os.path.join(workdir, f'{name}-{phase}.db'), size=threads)
+                with pool.connection() as conn:
+                    migrate(conn)
+                rate = run(pool, trade_fn, threads, orders, sides)
+                print(f'{name:>7} {phase:>6}: {rate:9.0f} trades/sec')
+                pool.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
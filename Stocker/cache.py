@@ -0,0 +1,193 @@
+"""Small in-process caches shared by request threads."""
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+# Returned by get() when a key is absent or expired
+MISSING = object()
+
+
+class TTLCache:
+    """A bounded mapping whose entries expire ``ttl`` seconds after they are set.
+
+    When full, the entry set longest ago is evicted. ``set()`` may give a
+    per-entry ttl, e.g. to keep negative lookups for less time than positive ones.
+    """
+
+    def __init__(self, ttl, maxsize=10000):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=MISSING):
+        """Returns the cached value for ``key``, or ``default`` if absent or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            expires, value = entry
+            if expires <= time.monotonic():
+                del self._entries[key]
+                return default
+            return value
+
+    def set(self, key, value, ttl=None):
+        """Caches ``value`` for ``ttl`` seconds (the cache default if None)."""
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (expires, value)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        """Drops ``key`` if cached."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class PortfolioCache:
+    """Per-user portfolio rows with LRU eviction and write-through updates.
+
+    ``get()`` serves a user's rows from memory, loading them on a miss.
+    Trades run inside ``writing(user_id)`` and report the resulting
+    position with ``set_position()``, so the cached rows stay current
+    without a reload. Two safeguards keep the cache from going stale:
+
+    * rows loaded while a trade for the same user was in flight are not
+      stored, since the load may predate the trade's commit;
+    * if two trades for one user overlap, the write-through order is not
+      guaranteed, so the user's entry is dropped instead.
+
+    Write-through only sees this process's trades. Another worker process,
+    or a command run against the same database, can change the positions
+    behind it, so with ``ttl`` set each entry is reloaded at most ``ttl``
+    seconds after it was loaded.
+    """
+
+    def __init__(self, maxsize=1024, symbol_of=lambda row: row[0], ttl=None):
+        self.maxsize = maxsize
+        self.symbol_of = symbol_of
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        # user_id -> monotonic time its rows expire, when ttl is set
+        self._expires = {}
+        self._lock = threading.Lock()
+        # user_id -> trades in flight, and users whose trades overlapped
+        self._writers = {}
+        self._overlapped = set()
+        # Loads in flight, and the write sequence of users written during them
+        self._loading = 0
+        self._write_seq = 0
+        self._written_at = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, user_id, loader):
+        """Returns the user's rows, calling ``loader()`` for them on a miss."""
+        with self._lock:
+            rows = self._entries.get(user_id)
+            if rows is not None and self._expires.get(user_id, float('inf')) <= time.monotonic():
+                self._drop(user_id)
+                self.expirations += 1
+                rows = None
+            if rows is not None:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return list(rows.values())
+            self.misses += 1
+            self._loading += 1
+            seq = self._write_seq
+        loaded = None
+        try:
+            loaded = list(loader())
+        finally:
+            with self._lock:
+                self._loading -= 1
+                fresh = user_id not in self._writers and self._written_at.get(user_id, seq) <= seq
+                if loaded is not None and fresh:
+                    self._store(user_id, OrderedDict((self.symbol_of(row), row) for row in loaded))
+                if not self._loading:
+                    self._written_at.clear()
+        return list(loaded)
+
+    @contextmanager
+    def writing(self, user_id):
+        """Marks a trade for ``user_id`` as in flight for the duration of the block."""
+        with self._lock:
+            self._mark_written(user_id)
+            if self._writers.get(user_id):
+                self._overlapped.add(user_id)
+                self._drop(user_id)
+            self._writers[user_id] = self._writers.get(user_id, 0) + 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._mark_written(user_id)
+                self._writers[user_id] -= 1
+                if not self._writers[user_id]:
+                    del self._writers[user_id]
+                    self._overlapped.discard(user_id)
+
+    def set_position(self, user_id, symbol, row):
+        """Writes one position through to a cached user; ``row=None`` removes it."""
+        with self._lock:
+            rows = self._entries.get(user_id)
+            if rows is None:
+                return
+            if user_id in self._overlapped:
+                self._drop(user_id)
+            elif row is None:
+                rows.pop(symbol, None)
+            else:
+                rows[symbol] = row
+
+    def invalidate(self, user_id):
+        """Drops the user's cached rows."""
+        with self._lock:
+            self._drop(user_id)
+
+    def stats(self):
+        """Returns size and hit/miss/eviction counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+    def _mark_written(self, user_id):
+        self._write_seq += 1
+        if self._loading:
+            self._written_at[user_id] = self._write_seq
+
+    def _store(self, user_id, rows):
+        self._entries[user_id] = rows
+        self._entries.move_to_end(user_id)
+        if self.ttl is not None:
+            self._expires[user_id] = time.monotonic() + self.ttl
+        while len(self._entries) > self.maxsize:
+            evicted, _ = self._entries.popitem(last=False)
+            self._expires.pop(evicted, None)
+            self.evictions += 1
+
+    def _drop(self, user_id):
+        self._entries.pop(user_id, None)
+        self._expires.pop(user_id, None)
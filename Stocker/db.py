@@ -0,0 +1,158 @@
+import queue
+import sqlite3
+import threading
+import time
+
+from metrics import record_db_query
+
+# Pragmas applied to every pooled connection.
+# WAL lets readers (dashboard, portfolio) proceed while a trade is writing,
+# synchronous=NORMAL is durable under WAL except on power loss, and the
+# cache/mmap sizes keep hot pages of portfolio and trades in memory.
+PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -20000,         # ~20 MB page cache per connection
+    'mmap_size': 268435456,       # 256 MB memory-mapped I/O
+    'temp_store': 'MEMORY',
+    'busy_timeout': 5000,         # ms to wait on a locked database
+}
+
+# Number of prepared statements sqlite3 keeps per connection
+STATEMENT_CACHE_SIZE = 256
+
+
+class TimedCursor(sqlite3.Cursor):
+    """A cursor that reports each statement, and the time spent on it, to metrics.py.
+
+    sqlite3 runs a SELECT up to its first row in execute() and the rest in
+    the fetch calls, so fetch time is added to the statement's time.
+    """
+
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            record_db_query(time.perf_counter() - started)
+
+    def executemany(self, sql, seq_of_parameters):
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            record_db_query(time.perf_counter() - started)
+
+    def fetchone(self):
+        started = time.perf_counter()
+        try:
+            return super().fetchone()
+        finally:
+            record_db_query(time.perf_counter() - started, queries=0)
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        try:
+            return super().fetchmany(self.arraysize if size is None else size)
+        finally:
+            record_db_query(time.perf_counter() - started, queries=0)
+
+    def fetchall(self):
+        started = time.perf_counter()
+        try:
+            return super().fetchall()
+        finally:
+            record_db_query(time.perf_counter() - started, queries=0)
+
+
+class TimedConnection(sqlite3.Connection):
+    """A connection whose cursors, including those of execute(), are TimedCursors."""
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+class ConnectionPool:
+    """A fixed-size pool of tuned SQLite connections shared between threads."""
+
+    def __init__(self, database, size=8, pragmas=None):
+        self.database = database
+        self.size = size
+        self.pragmas = dict(PRAGMAS if pragmas is None else pragmas)
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.database,
+            timeout=self.pragmas.get('busy_timeout', 5000) / 1000,
+            check_same_thread=False,
+            cached_statements=STATEMENT_CACHE_SIZE,
+            factory=TimedConnection,
+        )
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def acquire(self, timeout=None):
+        """Returns an idle connection, opening a new one while under the pool size."""
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            can_create = self._created < self.size
+            if can_create:
+                self._created += 1
+        if can_create:
+            try:
+                return self._connect()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+        return self._idle.get(timeout=timeout)
+
+    def release(self, conn):
+        """Returns a connection to the pool, rolling back any unfinished transaction."""
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put(conn)
+
+    def connection(self):
+        """Context manager that borrows a connection for the duration of a block."""
+        return _PooledConnection(self)
+
+    def close(self):
+        """Closes every idle connection held by the pool."""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._created -= 1
+
+
+class _PooledConnection:
+    def __init__(self, pool):
+        self.pool = pool
+        self.conn = None
+
+    def __enter__(self):
+        self.conn = self.pool.acquire()
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.pool.release(self.conn)
+        self.conn = None
@@ -0,0 +1,437 @@
+"""DynamoDB storage backend.
+
+Users are keyed by email, which is also the user id the session keeps.
+A trade and its position change are written in one transaction by
+dynamo_trading.py. Trade history pages are read from timestamp-sorted
+GSIs, admin views use parallel scans (dynamo_scan.py), and the admin
+dashboard counters live in one item of the stats table. Prices reach the
+stocks table through a write-behind PriceWriter, so a tick never waits
+on DynamoDB.
+
+Items hold Decimals. They are converted at this boundary: the views see
+ints and floats like every other backend.
+"""
+from datetime import datetime
+from decimal import Decimal, getcontext
+
+from boto3.dynamodb.conditions import Attr, Key
+
+from app_factory import Lazy
+from cache import MISSING, TTLCache
+from dynamo_scan import iter_scan, scan_table
+from dynamo_trading import execute_trade
+from price_writer import PriceWriter
+from stats import STAT_NAMES
+from storage import Storage
+from trade_history import PAGE_SIZE, encode_cursor, timestamp_bounds
+
+# Set the precision for Decimal calculations
+getcontext().prec = 10 # Set precision to 10 decimal places for financial calculations
+
+# Table names
+USERS_TABLE = 'stocker_user'
+STOCKS_TABLE = 'stocker_stocks'
+TRANSACTIONS_TABLE = 'stocker_transactions'
+PORTFOLIO_TABLE = 'stocker_portfolio'
+STATS_TABLE = 'stocker_stats'
+
+# Username availability is a keys-only GSI lookup rather than a table scan
+USERNAME_INDEX = 'username-index'
+USERNAME_INDEX_ATTRIBUTES = [
+    {'AttributeName': 'username', 'AttributeType': 'S'}
+]
+USERNAME_INDEX_SCHEMA = {
+    'IndexName': USERNAME_INDEX,
+    'KeySchema': [
+        {'AttributeName': 'username', 'KeyType': 'HASH'}
+    ],
+    'Projection': {'ProjectionType': 'KEYS_ONLY'}
+}
+
+# Trade history pages are read newest first from timestamp-sorted GSIs:
+# per user, and across all users via a constant record_type partition
+TRADE_RECORD_TYPE = 'TRADE'
+USER_HISTORY_INDEX = 'user_id-timestamp-index'
+ALL_HISTORY_INDEX = 'record_type-timestamp-index'
+HISTORY_INDEX_ATTRIBUTES = [
+    {'AttributeName': 'timestamp', 'AttributeType': 'S'},
+    {'AttributeName': 'record_type', 'AttributeType': 'S'}
+]
+HISTORY_INDEXES = [
+    {
+        'IndexName': USER_HISTORY_INDEX,
+        'KeySchema': [
+            {'AttributeName': 'user_id', 'KeyType': 'HASH'},
+            {'AttributeName': 'timestamp', 'KeyType': 'RANGE'}
+        ],
+        'Projection': {'ProjectionType': 'ALL'}
+    },
+    {
+        'IndexName': ALL_HISTORY_INDEX,
+        'KeySchema': [
+            {'AttributeName': 'record_type', 'KeyType': 'HASH'},
+            {'AttributeName': 'timestamp', 'KeyType': 'RANGE'}
+        ],
+        'Projection': {'ProjectionType': 'ALL'}
+    }
+]
+
+# Admin dashboard counters, kept in one item of the stats table
+STATS_KEY = {'stat_id': 'global'}
+
+# Recent availability answers. Taken names are kept longer than free ones,
+# since a free name can be claimed at any moment by another signup.
+USERNAME_TAKEN_TTL = 300
+USERNAME_FREE_TTL = 5
+
+# dataset -> exported item attributes, in column order
+EXPORT_COLUMNS = {
+    'trades': ('id', 'user_id', 'stock_symbol', 'qty', 'price', 'type', 'timestamp'),
+    'portfolio': ('user_id', 'stock_symbol', 'quantity', 'avg_price', 'timestamp'),
+}
+
+POSITION_ATTRIBUTES = ['user_id', 'stock_symbol', 'quantity', 'avg_price', 'timestamp']
+
+CENT = Decimal('0.01')
+
+
+def to_number(value):
+    """Returns a DynamoDB Decimal as an int when it is whole, else a float."""
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    return value
+
+
+def to_decimal(value):
+    """Converts an int or float amount to a Decimal DynamoDB can store."""
+    return value if isinstance(value, Decimal) else Decimal(str(value))
+
+
+def item_position(item):
+    """Returns a portfolio item as an (owner, symbol, quantity, avg_price) position."""
+    return (item['user_id'], item['stock_symbol'], to_number(item['quantity']), float(item['avg_price']))
+
+
+def _query_pages(table, **kwargs):
+    """Yields every item matching a query, following LastEvaluatedKey across pages."""
+    while True:
+        response = table.query(**kwargs)
+        yield from response['Items']
+        if 'LastEvaluatedKey' not in response:
+            break
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def history_query(index_name, key_name, key_value, filters, newest_first=True):
+    """Builds query kwargs for a timestamp-sorted history GSI restricted to the given filters."""
+    condition = Key(key_name).eq(key_value)
+    lower, upper = timestamp_bounds(filters)
+    filter_expression = None
+    if lower and upper:
+        # between() includes upper, which is exclusive everywhere else, so
+        # the boundary rows are dropped by the filter
+        condition &= Key('timestamp').between(lower, upper)
+        filter_expression = Attr('timestamp').lt(upper)
+    elif lower:
+        condition &= Key('timestamp').gte(lower)
+    elif upper:
+        condition &= Key('timestamp').lt(upper)
+    kwargs = {'IndexName': index_name, 'KeyConditionExpression': condition, 'ScanIndexForward': not newest_first}
+
+    if 'symbol' in filters:
+        symbol_match = Attr('stock_symbol').eq(filters['symbol'])
+        filter_expression = symbol_match if filter_expression is None else filter_expression & symbol_match
+    if 'type' in filters:
+        type_match = Attr('type').eq(filters['type'])
+        filter_expression = type_match if filter_expression is None else filter_expression & type_match
+    if filter_expression is not None:
+        kwargs['FilterExpression'] = filter_expression
+    return kwargs
+
+
+def ensure_global_secondary_index(table, index, attribute_definitions):
+    """Adds a GSI to an existing table if it is missing (tables created by older versions)."""
+    existing = [i['IndexName'] for i in (table.global_secondary_indexes or [])]
+    if index['IndexName'] in existing:
+        return
+    key_names = {k['AttributeName'] for k in index['KeySchema']}
+    table.meta.client.update_table(
+        TableName=table.name,
+        AttributeDefinitions=[a for a in attribute_definitions if a['AttributeName'] in key_names],
+        GlobalSecondaryIndexUpdates=[{'Create': index}]
+    )
+    print(f"Adding index {index['IndexName']} to {table.name}; it is usable once backfilled.")
+
+
+class DynamoStorage(Storage):
+    """Users, portfolios, trades and quotes in DynamoDB tables.
+
+    ``dynamodb`` is a boto3 DynamoDB resource, or a Lazy one so nothing
+    connects until the first request. The table handles are Lazy too, as
+    creating one would create the resource.
+    """
+
+    name = 'dynamodb'
+
+    def __init__(self, dynamodb):
+        self.dynamodb = dynamodb
+        self.users_table = Lazy(lambda: dynamodb.Table(USERS_TABLE))
+        self.stocks_table = Lazy(lambda: dynamodb.Table(STOCKS_TABLE))
+        self.transactions_table = Lazy(lambda: dynamodb.Table(TRANSACTIONS_TABLE))
+        self.portfolio_table = Lazy(lambda: dynamodb.Table(PORTFOLIO_TABLE))
+        self.stats_table = Lazy(lambda: dynamodb.Table(STATS_TABLE))
+        self.username_cache = TTLCache(USERNAME_TAKEN_TTL)
+        self.price_writer = PriceWriter(self.stocks_table)
+
+    def init(self):
+        """Creates the DynamoDB tables that don't exist yet."""
+        try:
+            self._create_table(self.users_table, [
+                {'AttributeName': 'email', 'KeyType': 'HASH'}
+            ], [
+                {'AttributeName': 'email', 'AttributeType': 'S'}
+            ] + USERNAME_INDEX_ATTRIBUTES, [USERNAME_INDEX_SCHEMA], USERNAME_INDEX_ATTRIBUTES)
+            self._create_table(self.stocks_table, [
+                {'AttributeName': 'symbol', 'KeyType': 'HASH'}
+            ], [
+                {'AttributeName': 'symbol', 'AttributeType': 'S'}
+            ])
+            self._create_table(self.transactions_table, [
+                {'AttributeName': 'id', 'KeyType': 'HASH'}
+            ], [
+                {'AttributeName': 'id', 'AttributeType': 'S'},
+                {'AttributeName': 'user_id', 'AttributeType': 'S'}
+            ] + HISTORY_INDEX_ATTRIBUTES, [
+                {
+                    'IndexName': 'user_id-index',
+                    'KeySchema': [
+                        {'AttributeName': 'user_id', 'KeyType': 'HASH'}
+                    ],
+                    'Projection': {'ProjectionType': 'ALL'}
+                }
+            ] + HISTORY_INDEXES, HISTORY_INDEX_ATTRIBUTES)
+            self._create_table(self.portfolio_table, [
+                {'AttributeName': 'user_id', 'KeyType': 'HASH'},
+                {'AttributeName': 'stock_symbol', 'KeyType': 'RANGE'}
+            ], [
+                {'AttributeName': 'user_id', 'AttributeType': 'S'},
+                {'AttributeName': 'stock_symbol', 'AttributeType': 'S'}
+            ])
+            # A single counters item for the admin dashboard
+            if self._create_table(self.stats_table, [
+                {'AttributeName': 'stat_id', 'KeyType': 'HASH'}
+            ], [
+                {'AttributeName': 'stat_id', 'AttributeType': 'S'}
+            ]):
+                self.reconcile_stats()
+            print("All DynamoDB tables are ready!")
+        except Exception as e:
+            print(f"Error creating DynamoDB tables: {e}")
+
+    def _create_table(self, table, key_schema, attributes, indexes=None, index_attributes=None):
+        """Creates ``table`` and waits until it is active; returns False if it already existed.
+
+        An existing table gets any of ``indexes`` it is missing.
+        """
+        try:
+            table.load()
+            print(f"Table {table.name} already exists.")
+            for index in indexes or []:
+                ensure_global_secondary_index(table, index, index_attributes)
+            return False
+        except self.dynamodb.meta.client.exceptions.ResourceNotFoundException:
+            pass
+        kwargs = {'GlobalSecondaryIndexes': indexes} if indexes else {}
+        self.dynamodb.create_table(TableName=table.name, KeySchema=key_schema,
+                                   AttributeDefinitions=attributes, BillingMode='PAY_PER_REQUEST', **kwargs)
+        print(f"Created table: {table.name}")
+        table.wait_until_exists()
+        print(f"Table {table.name} is active.")
+        return True
+
+    def start(self):
+        self.price_writer.start()
+
+    def close(self):
+        self.price_writer.close()
+
+    # Users
+
+    def create_user(self, username, email, password, role):
+        if self.username_exists(username):
+            return False
+        try:
+            self.users_table.put_item(
+                Item={
+                    'email': email,
+                    'username': username,
+                    'password': password,
+                    'role': role,
+                    'created_at': datetime.now().isoformat()
+                },
+                ConditionExpression='attribute_not_exists(email)'
+            )
+        except self.users_table.meta.client.exceptions.ConditionalCheckFailedException:
+            return False
+        self.username_cache.set(username, True)
+        if role == 'Trader':
+            self._increment_stats(traders=1)
+        return True
+
+    def find_user(self, email):
+        item = self.users_table.get_item(Key={'email': email}).get('Item')
+        if item is None:
+            return None
+        return {'id': item['email'], 'username': item['username'], 'email': item['email'],
+                'password': item['password'], 'role': item['role'], 'created_at': item.get('created_at')}
+
+    def set_password(self, email, password):
+        self.users_table.update_item(
+            Key={'email': email},
+            UpdateExpression='SET password = :p',
+            ExpressionAttributeValues={':p': password}
+        )
+
+    def username_exists(self, username):
+        """Looks ``username`` up in the username GSI, through a short-lived cache."""
+        if not username:
+            return False
+        exists = self.username_cache.get(username)
+        if exists is MISSING:
+            response = self.users_table.query(
+                IndexName=USERNAME_INDEX,
+                KeyConditionExpression=Key('username').eq(username),
+                Limit=1
+            )
+            exists = response['Count'] > 0
+            self.username_cache.set(username, exists, None if exists else USERNAME_FREE_TTL)
+        return exists
+
+    def list_traders(self):
+        users = scan_table(self.users_table, ['username', 'email', 'role', 'created_at'])
+        traders = [{'owner': u['email'], 'username': u['username'], 'email': u['email'],
+                    'created_at': u.get('created_at', '')}
+                   for u in users if u.get('role') == 'Trader']
+        return sorted(traders, key=lambda u: u['created_at'], reverse=True)
+
+    # Portfolio
+
+    def positions(self, user_id):
+        return [item_position(item) for item in _query_pages(
+            self.portfolio_table, KeyConditionExpression=Key('user_id').eq(user_id))]
+
+    def all_positions(self):
+        items = scan_table(self.portfolio_table, POSITION_ATTRIBUTES)
+        items.sort(key=lambda p: (p['user_id'], p['stock_symbol']))
+        return [item_position(item) + (item.get('timestamp'),) for item in items]
+
+    # Trades
+
+    def execute_trade(self, user_id, symbol, quantity, price, trade_type):
+        quantity = to_decimal(quantity)
+        price = to_decimal(price).quantize(CENT)
+        _, position, cost_basis_delta = execute_trade(
+            self.transactions_table, self.portfolio_table, user_id,
+            symbol, quantity, price, trade_type, TRADE_RECORD_TYPE)
+        self._increment_stats(trades=1, notional_volume=quantity * price, cost_basis=cost_basis_delta)
+        return item_position(position) if position else None
+
+    def trades_page(self, filters, cursor=None, user_id=None, limit=PAGE_SIZE):
+        if user_id is None:
+            index_name, key_name, key_value = ALL_HISTORY_INDEX, 'record_type', TRADE_RECORD_TYPE
+        else:
+            index_name, key_name, key_value = USER_HISTORY_INDEX, 'user_id', user_id
+        kwargs = history_query(index_name, key_name, key_value, filters)
+        if isinstance(cursor, dict):
+            kwargs['ExclusiveStartKey'] = cursor
+
+        # Filters are applied after Limit, so keep reading until the page is full
+        items = []
+        while len(items) <= limit:
+            kwargs['Limit'] = limit + 1 - len(items)
+            response = self.transactions_table.query(**kwargs)
+            items.extend(response['Items'])
+            if 'LastEvaluatedKey' not in response:
+                break
+            kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+        next_cursor = None
+        if len(items) > limit:
+            items = items[:limit]
+            last = items[-1]
+            next_cursor = encode_cursor({'id': last['id'], key_name: last[key_name], 'timestamp': last['timestamp']})
+        rows = [(to_number(t['qty']), float(t['price']), t['type'], t['timestamp'], t['id']) for t in items]
+        if user_id is None:
+            return [(t['user_id'], t['stock_symbol']) + row for t, row in zip(items, rows)], next_cursor
+        return [(t['stock_symbol'],) + row for t, row in zip(items, rows)], next_cursor
+
+    def export(self, dataset, filters):
+        """Streams the dataset one DynamoDB page at a time."""
+        columns = EXPORT_COLUMNS[dataset]
+        if dataset == 'trades':
+            kwargs = history_query(ALL_HISTORY_INDEX, 'record_type', TRADE_RECORD_TYPE, filters, newest_first=False)
+            items = _query_pages(self.transactions_table, **kwargs)
+        else:
+            items = iter_scan(self.portfolio_table, columns)
+        return columns, (tuple(to_number(item.get(column)) for column in columns) for item in items)
+
+    def backfill_trade_index(self):
+        """Tags trades written before paginated history so the all-users history index sees them."""
+        updated = 0
+        for trade in iter_scan(self.transactions_table, ['id', 'record_type']):
+            if 'record_type' not in trade:
+                self.transactions_table.update_item(
+                    Key={'id': trade['id']},
+                    UpdateExpression='SET record_type = :t',
+                    ExpressionAttributeValues={':t': TRADE_RECORD_TYPE}
+                )
+                updated += 1
+        return updated
+
+    # Admin statistics
+
+    def _increment_stats(self, **deltas):
+        """Atomically adds the given deltas to the admin dashboard counters."""
+        deltas = {name: to_decimal(value) for name, value in deltas.items() if value}
+        if not deltas:
+            return
+        try:
+            self.stats_table.update_item(
+                Key=STATS_KEY,
+                UpdateExpression='ADD ' + ', '.join(f'#{name} :{name}' for name in deltas),
+                ExpressionAttributeNames={f'#{name}': name for name in deltas},
+                ExpressionAttributeValues={f':{name}': value for name, value in deltas.items()}
+            )
+        except Exception as e:
+            print(f"Error updating stats: {e}")
+
+    def read_stats(self):
+        """Returns the admin dashboard counters with a single get_item."""
+        item = self.stats_table.get_item(Key=STATS_KEY).get('Item', {})
+        return {name: to_number(item.get(name, Decimal('0'))) for name in STAT_NAMES}
+
+    def reconcile_stats(self):
+        """Recomputes the admin dashboard counters from full table scans and stores them."""
+        stats = dict.fromkeys(STAT_NAMES, Decimal('0'))
+        for user in scan_table(self.users_table, ['role']):
+            if user.get('role') == 'Trader':
+                stats['traders'] += 1
+        for trade in scan_table(self.transactions_table, ['qty', 'price']):
+            stats['trades'] += 1
+            stats['notional_volume'] += Decimal(str(trade['qty'])) * Decimal(str(trade['price']))
+        for position in scan_table(self.portfolio_table, ['quantity', 'avg_price']):
+            stats['cost_basis'] += Decimal(str(position['quantity'])) * Decimal(str(position['avg_price']))
+        self.stats_table.put_item(Item={**STATS_KEY, **stats})
+        return {name: to_number(value) for name, value in stats.items()}
+
+    # Prices
+
+    def write_prices(self, prices):
+        """Queues one tick for the stocks table; the PriceWriter writes it in the background."""
+        now = datetime.now().isoformat()
+        rejected = self.price_writer.submit(
+            {'symbol': symbol, 'current_price': to_decimal(price).quantize(CENT), 'last_updated': now}
+            for symbol, price in prices.items()
+        )
+        if rejected:
+            print(f"Price writer is full: skipped {rejected} DynamoDB price updates this tick")
@@ -0,0 +1,133 @@
+"""Trade execution for the DynamoDB backend.
+
+The position is read once (consistently) to validate the order and work
+out the new quantity and average price. The trade record and the position
+change are then written together in one TransactWriteItems call. Every
+position write carries a condition on the quantity it was computed from:
+a sell must find at least the shares it sells, and a buy must find the
+quantity and average price it read. If a concurrent trade moved the
+position in between, the transaction is cancelled without writing
+anything and the trade is re-planned from a fresh read. Oversells are
+therefore rejected atomically, and a trade never leaves a record behind
+without its portfolio change.
+"""
+import time
+import uuid
+from datetime import datetime
+from decimal import Decimal
+
+from botocore.exceptions import ClientError
+
+# Re-plans allowed when a concurrent trade changes the position first
+MAX_ATTEMPTS = 5
+RETRY_DELAY = 0.02
+
+CENT = Decimal('0.01')
+
+
+def plan_position(table_name, user_id, symbol, existing, quantity, price, trade_type, now):
+    """Returns (transaction item, position after, cost basis delta) for one position change.
+
+    The position after is the portfolio item as the write leaves it, or
+    None when the position is closed.
+
+    Raises ValueError if a sell exceeds the shares held in ``existing``.
+    """
+    key = {'user_id': user_id, 'stock_symbol': symbol}
+    held = Decimal(str(existing['quantity'])) if existing else Decimal('0')
+    avg = Decimal(str(existing['avg_price'])) if existing else Decimal('0')
+
+    if trade_type == 'SELL':
+        if not existing:
+            raise ValueError(f'You do not own any shares of {symbol} to sell.')
+        if quantity > held:
+            raise ValueError(f'You only own {held} shares of {symbol}. Cannot sell more than you own.')
+        if quantity == held:
+            return {'Delete': {
+                'TableName': table_name,
+                'Key': key,
+                'ConditionExpression': 'quantity = :q',
+                'ExpressionAttributeValues': {':q': quantity},
+            }}, None, -held * avg
+        # Avg price doesn't change on sell
+        return {'Update': {
+            'TableName': table_name,
+            'Key': key,
+            'UpdateExpression': 'SET quantity = quantity - :q, #ts = :now',
+            'ConditionExpression': 'quantity > :q',
+            'ExpressionAttributeNames': {'#ts': 'timestamp'},
+            'ExpressionAttributeValues': {':q': quantity, ':now': now},
+        }}, {**existing, 'quantity': held - quantity, 'timestamp': now}, -quantity * avg
+
+    if not existing:
+        item = {**key, 'quantity': quantity, 'avg_price': price, 'timestamp': now}
+        return {'Put': {
+            'TableName': table_name,
+            'Item': item,
+            'ConditionExpression': 'attribute_not_exists(user_id)',
+        }}, item, quantity * price
+
+    new_qty = held + quantity
+    new_avg = ((held * avg + quantity * price) / new_qty).quantize(CENT)
+    return {'Update': {
+        'TableName': table_name,
+        'Key': key,
+        'UpdateExpression': 'SET quantity = :new_qty, avg_price = :new_avg, #ts = :now',
+        'ConditionExpression': 'quantity = :held AND avg_price = :avg',
+        'ExpressionAttributeNames': {'#ts': 'timestamp'},
+        'ExpressionAttributeValues': {':new_qty': new_qty, ':new_avg': new_avg, ':now': now,
+                                      ':held': existing['quantity'], ':avg': existing['avg_price']},
+    }}, {**existing, 'quantity': new_qty, 'avg_price': new_avg, 'timestamp': now}, new_qty * new_avg - held * avg
+
+
+def _cancelled_by_condition(error):
+    if error.response.get('Error', {}).get('Code') != 'TransactionCanceledException':
+        return False
+    reasons = error.response.get('CancellationReasons', [])
+    return any(r.get('Code') in ('ConditionalCheckFailed', 'TransactionConflict') for r in reasons) or not reasons
+
+
+def execute_trade(transactions_table, portfolio_table, user_id, symbol, quantity, price,
+                  trade_type, record_type):
+    """Records a trade and applies it to the portfolio in one transaction.
+
+    Returns (trade item, position item after the trade or None if closed,
+    cost basis delta).
+    Raises ValueError for an oversell, including one caused by a
+    concurrent trade.
+    """
+    client = portfolio_table.meta.client
+    for attempt in range(MAX_ATTEMPTS):
+        now = datetime.now().isoformat()
+        existing = portfolio_table.get_item(
+            Key={'user_id': user_id, 'stock_symbol': symbol},
+            ConsistentRead=True
+        ).get('Item')
+        write, position, cost_basis_delta = plan_position(
+            portfolio_table.name, user_id, symbol, existing, quantity, price, trade_type, now)
+        trade = {
+            'id': str(uuid.uuid4()),
+            'user_id': user_id,
+            'stock_symbol': symbol,
+            'qty': quantity,
+            'price': price,
+            'type': trade_type,
+            'record_type': record_type,
+            'timestamp': now,
+        }
+        try:
+            client.transact_write_items(TransactItems=[
+                {'Put': {
+                    'TableName': transactions_table.name,
+                    'Item': trade,
+                    'ConditionExpression': 'attribute_not_exists(id)',
+                }},
+                write,
+            ])
+            return trade, position, cost_basis_delta
+        except ClientError as e:
+            if not _cancelled_by_condition(e):
+                raise
+        # The position changed since it was read: re-read and re-plan
+        time.sleep(RETRY_DELAY * (attempt + 1))
+    raise RuntimeError(f'Position for {symbol} kept changing; trade not executed. Please retry.')
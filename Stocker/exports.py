@@ -0,0 +1,129 @@
+"""Streaming CSV and NDJSON exports.
+
+Rows are pulled from the store in fixed-size batches and encoded into
+chunks of a bounded size, so an export holds at most one batch and one
+chunk in memory no matter how many rows it covers. The generators here
+are handed straight to a Flask Response.
+"""
+import csv
+import io
+import json
+from datetime import datetime
+
+from trade_history import filter_clauses
+
+# Rows pulled from SQLite per fetchmany() call
+FETCH_SIZE = 500
+# Encoded bytes buffered before a chunk is yielded to the client
+CHUNK_SIZE = 64 * 1024
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+# dataset -> (columns, query); trades queries accept history filters
+SQLITE_EXPORTS = {
+    'trades': (
+        ('id', 'username', 'stock_symbol', 'qty', 'price', 'type', 'timestamp'),
+        'SELECT t.id, u.username, t.stock_symbol, t.qty, t.price, t.type, t.timestamp '
+        'FROM trades t JOIN users u ON t.user_id = u.id',
+    ),
+    'portfolio': (
+        ('username', 'stock_symbol', 'quantity', 'avg_price'),
+        'SELECT u.username, p.stock_symbol, p.quantity, p.avg_price '
+        'FROM portfolio p JOIN users u ON p.user_id = u.id',
+    ),
+}
+
+SQLITE_ORDER = {
+    'trades': ' ORDER BY t.timestamp, t.id',
+    'portfolio': ' ORDER BY p.id',
+}
+
+
+def export_filename(dataset, fmt):
+    """Returns the download filename for an export, e.g. stocker-trades-20240101.csv."""
+    return f"stocker-{dataset}-{datetime.now().strftime('%Y%m%d')}.{fmt}"
+
+
+def _chunked(lines):
+    parts = []
+    size = 0
+    for line in lines:
+        parts.append(line)
+        size += len(line)
+        if size >= CHUNK_SIZE:
+            yield ''.join(parts)
+            parts = []
+            size = 0
+    if parts:
+        yield ''.join(parts)
+
+
+def _csv_lines(columns, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    yield buffer.getvalue()
+    for row in rows:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow(row)
+        yield buffer.getvalue()
+
+
+def _ndjson_lines(columns, rows, default=None):
+    for row in rows:
+        yield json.dumps(dict(zip(columns, row)), separators=(',', ':'), default=default) + '\n'
+
+
+def encode_rows(fmt, columns, rows, default=None):
+    """Yields ``rows`` (tuples in ``columns`` order) encoded as CSV or NDJSON chunks.
+
+    ``default`` converts values json cannot encode, such as DynamoDB Decimals.
+    """
+    if fmt == 'csv':
+        return _chunked(_csv_lines(columns, rows))
+    return _chunked(_ndjson_lines(columns, rows, default))
+
+
+def iter_rows(cursor, size=FETCH_SIZE):
+    """Yields a cursor's result rows, fetching ``size`` at a time."""
+    while True:
+        rows = cursor.fetchmany(size)
+        if not rows:
+            break
+        yield from rows
+
+
+def sqlite_export(pool, dataset, fmt, filters=None):
+    """Yields an export of ``dataset`` from SQLite, encoded as ``fmt``."""
+    return encode_rows(fmt, SQLITE_EXPORTS[dataset][0], sqlite_rows(pool, dataset, filters))
+
+
+def sqlite_rows(pool, dataset, filters=None):
+    """Yields the rows of ``dataset`` from SQLite.
+
+    The generator borrows its own pool connection rather than the request's,
+    because it keeps running after the request context is torn down.
+    """
+    sql = SQLITE_EXPORTS[dataset][1]
+    params = []
+    if dataset == 'trades' and filters:
+        clauses, params = filter_clauses(filters)
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+    sql += SQLITE_ORDER[dataset]
+
+    with pool.connection() as conn:
+        # A full scan through the memory map would pull up to mmap_size of the
+        # file into this process's RSS; read through the bounded page cache instead
+        mmap_size = conn.execute('PRAGMA mmap_size').fetchone()[0]
+        conn.execute('PRAGMA mmap_size = 0')
+        cursor = conn.execute(sql, params)
+        try:
+            yield from iter_rows(cursor)
+        finally:
+            cursor.close()
+            conn.execute(f'PRAGMA mmap_size = {int(mmap_size)}')
@@ -0,0 +1,212 @@
+"""Open lots and realized P&L for the SQLite backend.
+
+Every fill is applied to the position's open lots in the same transaction
+as its trade. A fill that reduces a position closes lots and realizes
+P&L against their cost. Two methods are supported:
+
+* ``FIFO``: each buy opens a lot and a sell consumes the oldest lots first;
+* ``AVERAGE``: a position is a single lot at its average cost, so a sell
+  realizes against the average price and leaves it unchanged.
+
+Shorts are lots with a negative quantity, closed the same way by buys.
+Realized P&L accumulates per (user, symbol) in ``realized_pnl``. Reports
+therefore read one row per position rather than replaying trade history.
+The portfolio's ``avg_price`` is kept equal to the average cost of the
+open lots. ``rebuild_lots()`` replays the ``trades`` table to recreate
+all of this from scratch.
+"""
+FIFO = 'fifo'
+AVERAGE = 'average'
+LOT_METHODS = (FIFO, AVERAGE)
+
+# Rows fetched per round trip when replaying the trades table
+REPLAY_FETCH_SIZE = 1000
+
+SELECT_LOTS = '''
+    SELECT id, quantity, price FROM lots
+    WHERE user_id = ? AND stock_symbol = ?
+    ORDER BY id
+'''
+
+INSERT_LOT = '''
+    INSERT INTO lots (user_id, stock_symbol, quantity, price)
+    VALUES (?, ?, ?, ?)
+'''
+
+UPSERT_REALIZED = '''
+    INSERT INTO realized_pnl (user_id, stock_symbol, closed_quantity, realized)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT (user_id, stock_symbol) DO UPDATE SET
+        closed_quantity = closed_quantity + excluded.closed_quantity,
+        realized = realized + excluded.realized
+'''
+
+
+def fill_lots(lots, quantity, price, method=FIFO):
+    """Applies a signed fill (positive to buy, negative to sell) to ``lots`` in place.
+
+    ``lots`` is a list of [id, quantity, price] entries, oldest first, all
+    with the same sign. New lots are appended with an id of None.
+
+    Returns (closed quantity, realized P&L).
+    """
+    if method not in LOT_METHODS:
+        raise ValueError(f'Unknown lot method: {method}')
+    closed = 0
+    realized = 0.0
+    # Close lots on the other side of the fill, oldest first
+    while quantity and lots and (lots[0][1] > 0) != (quantity > 0):
+        lot = lots[0]
+        take = min(abs(lot[1]), abs(quantity))
+        sign = 1 if lot[1] > 0 else -1
+        realized += take * (price - lot[2]) * sign
+        closed += take
+        quantity += take * sign
+        lot[1] -= take * sign
+        if not lot[1]:
+            lots.pop(0)
+
+    if quantity:
+        if method == AVERAGE and lots:
+            lot = lots[-1]
+            lot[2] = (lot[1] * lot[2] + quantity * price) / (lot[1] + quantity)
+            lot[1] += quantity
+        else:
+            lots.append([None, quantity, price])
+    return closed, realized
+
+
+def average_cost(lots):
+    """Returns (open quantity, average cost) of ``lots``; the cost is None when flat."""
+    quantity = sum(lot[1] for lot in lots)
+    if not quantity:
+        return 0, None
+    return quantity, sum(lot[1] * lot[2] for lot in lots) / quantity
+
+
+def apply_fills(cursor, user_id, symbol, fills, method=FIFO):
+    """Applies (signed quantity, price) fills to one position's lots in order.
+
+    Runs inside the caller's transaction. Realized P&L is added to
+    ``realized_pnl`` and the portfolio's avg_price is set to the average
+    cost of the remaining lots. Returns that average cost, or None if the
+    position is flat.
+    """
+    before = cursor.execute(SELECT_LOTS, (user_id, symbol)).fetchall()
+    lots = [list(row) for row in before]
+    closed = 0
+    realized = 0.0
+    for quantity, price in fills:
+        fill_closed, fill_realized = fill_lots(lots, quantity, price, method)
+        closed += fill_closed
+        realized += fill_realized
+
+    kept = {lot[0]: lot for lot in lots if lot[0] is not None}
+    gone = [(lot_id,) for lot_id, _, _ in before if lot_id not in kept]
+    if gone:
+        cursor.executemany('DELETE FROM lots WHERE id = ?', gone)
+    changed = [(kept[lot_id][1], kept[lot_id][2], lot_id)
+               for lot_id, lot_qty, lot_price in before
+               if lot_id in kept and (kept[lot_id][1], kept[lot_id][2]) != (lot_qty, lot_price)]
+    if changed:
+        cursor.executemany('UPDATE lots SET quantity = ?, price = ? WHERE id = ?', changed)
+    opened = [(user_id, symbol, lot[1], lot[2]) for lot in lots if lot[0] is None]
+    if opened:
+        cursor.executemany(INSERT_LOT, opened)
+    if closed:
+        cursor.execute(UPSERT_REALIZED, (user_id, symbol, closed, realized))
+
+    quantity, avg_cost = average_cost(lots)
+    if quantity:
+        cursor.execute('''
+            UPDATE portfolio SET avg_price = ?
+            WHERE user_id = ? AND stock_symbol = ? AND avg_price != ?
+        ''', (avg_cost, user_id, symbol, avg_cost))
+    return avg_cost
+
+
+def read_realized(conn, user_id):
+    """Returns {symbol: (closed quantity, realized P&L)} for one user."""
+    rows = conn.execute('''
+        SELECT stock_symbol, closed_quantity, realized
+        FROM realized_pnl
+        WHERE user_id = ?
+    ''', (user_id,)).fetchall()
+    return {symbol: (closed, realized) for symbol, closed, realized in rows}
+
+
+def rebuild_lots(cursor, method=FIFO):
+    """Replays every trade in id order to rebuild lots, realized P&L and the portfolio.
+
+    Runs inside the caller's transaction. Returns (trades replayed, open
+    positions).
+    """
+    books = {}
+    realized = {}
+    replayed = 0
+    trades = cursor.connection.execute('''
+        SELECT user_id, stock_symbol, qty, price, type FROM trades ORDER BY id
+    ''')
+    while True:
+        rows = trades.fetchmany(REPLAY_FETCH_SIZE)
+        if not rows:
+            break
+        for user_id, symbol, qty, price, trade_type in rows:
+            key = (user_id, symbol)
+            closed, pnl = fill_lots(books.setdefault(key, []), qty if trade_type == 'BUY' else -qty,
+                                    price, method)
+            if closed:
+                totals = realized.setdefault(key, [0, 0.0])
+                totals[0] += closed
+                totals[1] += pnl
+        replayed += len(rows)
+
+    cursor.execute('DELETE FROM lots')
+    cursor.execute('DELETE FROM realized_pnl')
+    cursor.executemany(INSERT_LOT, (
+        (user_id, symbol, lot[1], lot[2])
+        for (user_id, symbol), lots in books.items()
+        for lot in lots
+    ))
+    cursor.executemany(UPSERT_REALIZED, (
+        (user_id, symbol, closed, pnl) for (user_id, symbol), (closed, pnl) in realized.items()
+    ))
+
+    # The portfolio is the open lots, summed per position
+    positions = [(user_id, symbol) + average_cost(lots)
+                 for (user_id, symbol), lots in books.items() if lots]
+    cursor.execute('DELETE FROM portfolio')
+    cursor.executemany('''
+        INSERT INTO portfolio (user_id, stock_symbol, quantity, avg_price)
+        VALUES (?, ?, ?, ?)
+    ''', positions)
+    return replayed, len(positions)
+
+
+def pnl_report(positions, realized):
+    """Combines valued open positions with {symbol: (closed quantity, realized P&L)}.
+
+    ``positions`` are the dicts from ``Valuation.positions()``. Returns
+    (one row per symbol held or ever closed, totals).
+    """
+    rows = {}
+    for position in positions:
+        rows[position['symbol']] = {
+            'symbol': position['symbol'],
+            'quantity': position['quantity'],
+            'avg_price': position['avg_price'],
+            'price': position['price'],
+            'unrealized': position['pnl'],
+            'closed_quantity': 0,
+            'realized': 0.0,
+        }
+    for symbol, (closed, pnl) in realized.items():
+        row = rows.setdefault(symbol, {'symbol': symbol, 'quantity': 0, 'avg_price': None,
+                                       'price': None, 'unrealized': 0.0})
+        row['closed_quantity'] = closed
+        row['realized'] = round(pnl, 2)
+    unrealized = round(sum(row['unrealized'] for row in rows.values()), 2)
+    realized_total = round(sum(row['realized'] for row in rows.values()), 2)
+    totals = {'unrealized': unrealized, 'realized': realized_total,
+              'total': round(unrealized + realized_total, 2)}
+    return sorted(rows.values(), key=lambda row: row['symbol']), totals
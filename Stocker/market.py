@@ -0,0 +1,117 @@
+"""The simulated stock market shared by every storage backend.
+
+A ``Market`` owns the price engine, the PriceBoard readers take
+snapshots from, the cached /api/stock_prices payloads and the tick store
+behind the candles. Each tick is also handed to ``on_tick``, which is how
+a backend that keeps quotes (DynamoDB) stores them.
+
+With ``shared`` set to a shared-memory name, this process simulates
+nothing: a separate ``run_publisher()`` process owns the engine and the
+tick store, and the board mirrors its ticks (see shared_prices.py).
+"""
+import os
+import threading
+import time
+
+from app_factory import Lazy
+from metrics import record_tick
+from price_engine import GBMModel, PriceEngine
+from price_snapshot import PriceBoard
+from price_stream import PricePayloadCache
+from shared_prices import SharedPriceBoard, run_publisher
+from tick_store import TickStore
+
+# Worker processes (e.g. `gunicorn -w 4 -k gthread --threads 64`) can share
+# one price simulator: run `flask --app <app> price-publisher` once and
+# start every worker with STOCKER_SHARED_PRICES set to the same
+# shared-memory name. Unset, each process simulates its own prices.
+SHARED_PRICES = os.environ.get('STOCKER_SHARED_PRICES')
+DEFAULT_SHARED_PRICES = 'stocker_prices'
+
+
+class Market:
+    """Simulates prices for ``symbols`` and publishes one snapshot per tick."""
+
+    def __init__(self, symbols, tick_store_dir, seed=None, tick_seconds=10, shared=None, on_tick=None):
+        self.symbols = list(symbols)
+        self.engine = PriceEngine(self.symbols, model=GBMModel(), seed=seed, tick_seconds=tick_seconds)
+        self.tick_store_dir = tick_store_dir
+        self.shared = shared
+        self.on_tick = on_tick
+
+        # Readers take one immutable snapshot per request via board.current()
+        if shared:
+            self.board = SharedPriceBoard(shared, self.symbols, lock_dir=tick_store_dir,
+                                          tick_seconds=tick_seconds)
+        else:
+            self.board = PriceBoard()
+        self.payload = PricePayloadCache(self.board)
+
+        # With shared prices the publisher writes the ticks and workers only read them
+        self.tick_store = Lazy(lambda: TickStore(tick_store_dir, self.engine.symbols, readonly=bool(shared)))
+
+    def record_volume(self, symbol, quantity):
+        """Attaches traded shares to the next tick, in whichever process writes the ticks."""
+        if self.shared:
+            self.board.add_volume(symbol, quantity)
+        else:
+            self.tick_store.add_volume(symbol, quantity)
+
+    def publish(self):
+        """Stores the engine's prices as a tick and publishes them as a new snapshot."""
+        self.tick_store.append(self.engine.rounded())
+        prices = self.engine.as_dict()
+        self.board.publish(prices)
+        if self.on_tick:
+            self.on_tick(prices)
+
+    def run(self):
+        """Advances and publishes prices every tick, forever."""
+        last = None
+        while True:
+            started = time.monotonic()
+            self.engine.step()
+            self.publish()
+            record_tick(time.monotonic() - started, self._lag(started, last))
+            last = started
+            time.sleep(self.engine.tick_seconds)
+
+    def _lag(self, started, last):
+        """How much later than one tick after ``last`` this tick started."""
+        return 0.0 if last is None else started - last - self.engine.tick_seconds
+
+    def start(self):
+        """Publishes the first prices and starts the price updater thread.
+
+        With shared prices it only starts watching the publisher's ticks.
+        """
+        if self.shared:
+            self.board.start()
+            return
+        self.publish()
+        threading.Thread(target=self.run, name='price-updater', daemon=True).start()
+
+    def run_publisher(self, name):
+        """Runs the one price simulator shared by worker processes, until interrupted."""
+        store = TickStore(self.tick_store_dir, self.engine.symbols)
+        last = None
+
+        def tick(volume):
+            nonlocal last
+            started = time.monotonic()
+            for symbol, quantity in volume.items():
+                store.add_volume(symbol, quantity)
+            self.engine.step()
+            prices = self.engine.rounded()
+            store.append(prices)
+            if self.on_tick:
+                self.on_tick(dict(zip(self.engine.symbols, prices.tolist())))
+            record_tick(time.monotonic() - started, self._lag(started, last))
+            last = started
+            return prices
+
+        try:
+            run_publisher(name, self.engine.symbols, tick, self.engine.tick_seconds,
+                          lock_dir=self.tick_store_dir)
+        finally:
+            store.close()
@@ -0,0 +1,44 @@
+"""Stocker with every user, position and trade kept in memory.
+
+No database or AWS is involved, so this is the zero-I/O baseline for
+load tests of app.py and aws_app.py: the routes are the same, only the
+storage differs. Everything is lost on restart.
+"""
+from market import SHARED_PRICES, Market
+from storage import MemoryStorage
+from views import Stocker, create_app as create_stocker_app
+
+SECRET_KEY = 'stocker_secret_key_2024'
+
+STOCK_SYMBOLS = [
+    'AAPL', 'GOOGL', 'MSFT', 'AMZN', 'TSLA', 'NVDA', 'META', 'NFLX',
+    'ADBE', 'CRM', 'ORCL', 'INTC', 'AMD', 'PYPL', 'UBER', 'SPOT',
+    'TWTR', 'SNAP', 'SQ', 'ZOOM', 'SHOP', 'ROKU', 'PINS', 'DOCU'
+]
+
+PRICE_SEED = None
+PRICE_TICK_SECONDS = 10
+TICK_STORE_DIR = 'ticks'
+
+storage = MemoryStorage()
+market = Market(STOCK_SYMBOLS, TICK_STORE_DIR, seed=PRICE_SEED, tick_seconds=PRICE_TICK_SECONDS,
+                shared=SHARED_PRICES)
+stocker = Stocker(storage, market)
+
+
+def start_services():
+    """Starts the background services once per process; returns False if already running."""
+    return stocker.start_services()
+
+
+def create_app(start_services=False):
+    """Builds the Flask app, e.g. ``gunicorn -k gthread --threads 64 'memory_app:create_app(start_services=True)'``."""
+    return create_stocker_app(stocker, SECRET_KEY, start_services=start_services)
+
+
+# For `flask --app memory_app` and WSGI servers
+app = create_app()
+
+if __name__ == '__main__':
+    start_services()
+    app.run(host='0.0.0.0', port=5000)
@@ -0,0 +1,390 @@
+"""Process metrics in the Prometheus text format.
+
+Request latency histograms, the SQLite queries and DynamoDB calls each
+request made, and price tick timings are collected into ``REGISTRY``.
+The ``/metrics`` view renders it. Background components that already
+keep a ``stats()`` dict (notification queue, price writer, portfolio
+cache, password hasher) are read at scrape time through
+``REGISTRY.add_stats()``, so they need no changes.
+
+SQLite queries are timed by the connections db.py opens. DynamoDB calls
+are timed by ``instrument_boto3()`` through botocore's event hooks. Both
+are attributed to the Flask endpoint running in the current thread, or
+to ``background`` outside a request. A streamed body (exports, the price
+stream) is sent after the request has been torn down. ``TrackedStream``
+puts the request back in place while it produces each chunk, so that
+work and time count toward the request too.
+
+With STOCKER_PROFILE_SLOW_MS set, a ``SlowRequestProfiler`` samples the
+stacks of in-flight requests. Requests slower than that many
+milliseconds are written to ``slow_requests.jsonl`` with their sampled
+stacks.
+"""
+import bisect
+import json
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter as StackCounter
+
+# Opt-in slow request profiling; unset, nothing is sampled
+PROFILE_SLOW_MS = os.environ.get('STOCKER_PROFILE_SLOW_MS')
+PROFILE_INTERVAL = 0.01
+SLOW_REQUEST_LOG = 'slow_requests.jsonl'
+
+BACKGROUND = 'background'
+
+# Seconds; covers a cached price poll up to a slow DynamoDB scan
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CALL_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+
+def _labels(names, values):
+    if not names:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for v in values)
+    return '{' + ','.join(f'{n}="{v}"' for n, v in zip(names, escaped)) + '}'
+
+
+def _format(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """One metric family; values are kept per tuple of label values."""
+
+    kind = 'untyped'
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+        with self._lock:
+            items = sorted(self._values.items())
+            lines.extend(self._samples(items))
+        return lines
+
+    def _samples(self, items):
+        return [f'{self.name}{_labels(self.label_names, key)} {_format(value)}' for key, value in items]
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def set(self, *labels, value):
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, *labels, value):
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                # Per-bucket counts (made cumulative when rendered), sum and count
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][bisect.bisect_left(self.buckets, value)] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def _samples(self, items):
+        lines = []
+        names = self.label_names + ('le',)
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float('inf'),), counts):
+                cumulative += n
+                lines.append(f'{self.name}_bucket{_labels(names, key + (_format(bound),))} {cumulative}')
+            lines.append(f'{self.name}_sum{_labels(self.label_names, key)} {_format(total)}')
+            lines.append(f'{self.name}_count{_labels(self.label_names, key)} {count}')
+        return lines
+
+
+class Registry:
+    """The metrics of one process, plus ``stats()`` sources read at scrape time."""
+
+    def __init__(self):
+        self._metrics = []
+        self._stats = {}
+
+    def add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def add_stats(self, prefix, stats):
+        """Exposes each number in the dict ``stats()`` returns as the gauge ``<prefix>_<key>``.
+
+        A later source with the same prefix replaces the earlier one.
+        """
+        self._stats[prefix] = stats
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for prefix, stats in list(self._stats.items()):
+            try:
+                values = stats()
+            except Exception as e:
+                print(f"Error reading {prefix} stats: {e}")
+                continue
+            for key, value in values.items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                lines.append(f'# TYPE {prefix}_{key} gauge')
+                lines.append(f'{prefix}_{key} {_format(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+REQUEST_SECONDS = REGISTRY.add(Histogram(
+    'stocker_request_duration_seconds', 'Time to build a response, per route.', ('endpoint', 'method', 'status')))
+REQUEST_DB_QUERIES = REGISTRY.add(Histogram(
+    'stocker_request_db_queries', 'SQLite statements run per request.', ('endpoint',), CALL_BUCKETS))
+REQUEST_DYNAMODB_CALLS = REGISTRY.add(Histogram(
+    'stocker_request_dynamodb_calls', 'DynamoDB API calls made per request.', ('endpoint',), CALL_BUCKETS))
+DB_QUERIES = REGISTRY.add(Counter(
+    'stocker_db_queries_total', 'SQLite statements run.', ('endpoint',)))
+DB_SECONDS = REGISTRY.add(Counter(
+    'stocker_db_query_seconds_total', 'Time spent running SQLite statements.', ('endpoint',)))
+DYNAMODB_CALLS = REGISTRY.add(Counter(
+    'stocker_dynamodb_calls_total', 'DynamoDB API calls, including failed ones.', ('endpoint', 'operation')))
+DYNAMODB_SECONDS = REGISTRY.add(Counter(
+    'stocker_dynamodb_call_seconds_total', 'Time spent in DynamoDB API calls.', ('endpoint', 'operation')))
+PRICE_TICK_SECONDS = REGISTRY.add(Histogram(
+    'stocker_price_tick_duration_seconds', 'Time to compute, store and publish one price tick.'))
+PRICE_TICK_LAG = REGISTRY.add(Gauge(
+    'stocker_price_tick_lag_seconds', 'How late the latest price tick started, relative to its schedule.'))
+PRICE_TICKS = REGISTRY.add(Counter(
+    'stocker_price_ticks_total', 'Price ticks published.'))
+
+
+class RequestStats:
+    """What one request has spent so far; kept per thread while it runs."""
+
+    __slots__ = ('endpoint', 'started', 'db_queries', 'db_seconds', 'dynamodb_calls', 'dynamodb_seconds')
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.started = time.perf_counter()
+        self.db_queries = 0
+        self.db_seconds = 0.0
+        self.dynamodb_calls = 0
+        self.dynamodb_seconds = 0.0
+
+
+_local = threading.local()
+
+
+def begin_request(endpoint):
+    stats = _local.request = RequestStats(endpoint or 'unknown')
+    return stats
+
+
+def current_request():
+    return getattr(_local, 'request', None)
+
+
+def detach_request():
+    """Takes the current request's RequestStats off this thread, to be finished later."""
+    stats = getattr(_local, 'request', None)
+    _local.request = None
+    return stats
+
+
+def end_request(method, status):
+    """Records the current request's latency and call counts; returns its RequestStats."""
+    stats = detach_request()
+    if stats is None:
+        return None
+    finish_request(stats, method, status)
+    return stats
+
+
+def finish_request(stats, method, status):
+    """Records a detached request's latency, up to now, and its call counts."""
+    REQUEST_SECONDS.observe(stats.endpoint, method, status, value=time.perf_counter() - stats.started)
+    REQUEST_DB_QUERIES.observe(stats.endpoint, value=stats.db_queries)
+    REQUEST_DYNAMODB_CALLS.observe(stats.endpoint, value=stats.dynamodb_calls)
+
+
+class TrackedStream:
+    """A streamed response body whose work counts toward the request that returned it.
+
+    Each chunk is produced with ``stats`` as the thread's current request.
+    ``finish(stats)`` is called once, when the body is exhausted or closed
+    (e.g. the client went away).
+    """
+
+    def __init__(self, body, stats, finish):
+        self._body = iter(body)
+        self._close = getattr(body, 'close', None)
+        self.stats = stats
+        self._finish = finish
+        self._finished = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        _local.request = self.stats
+        try:
+            return next(self._body)
+        except StopIteration:
+            self.close()
+            raise
+        finally:
+            _local.request = None
+
+    def close(self):
+        if self._finished:
+            return
+        self._finished = True
+        # Closing a generator runs its cleanup, e.g. returning a pooled connection
+        _local.request = self.stats
+        try:
+            if self._close is not None:
+                self._close()
+        finally:
+            _local.request = None
+            self._finish(self.stats)
+
+
+def record_db_query(seconds, queries=1):
+    """Adds a SQLite statement, or with ``queries=0`` only time spent fetching its rows."""
+    stats = current_request()
+    if stats is not None:
+        stats.db_queries += queries
+        stats.db_seconds += seconds
+    endpoint = stats.endpoint if stats is not None else BACKGROUND
+    if queries:
+        DB_QUERIES.inc(endpoint, amount=queries)
+    DB_SECONDS.inc(endpoint, amount=seconds)
+
+
+def record_dynamodb_call(operation, seconds):
+    stats = current_request()
+    if stats is not None:
+        stats.dynamodb_calls += 1
+        stats.dynamodb_seconds += seconds
+    endpoint = stats.endpoint if stats is not None else BACKGROUND
+    DYNAMODB_CALLS.inc(endpoint, operation)
+    DYNAMODB_SECONDS.inc(endpoint, operation, amount=seconds)
+
+
+def record_tick(seconds, lag):
+    """Records one price tick that took ``seconds`` and started ``lag`` seconds late."""
+    PRICE_TICKS.inc()
+    PRICE_TICK_SECONDS.observe(value=seconds)
+    PRICE_TICK_LAG.set(value=max(lag, 0.0))
+
+
+def _before_call(model, context, **kwargs):
+    context['stocker_call'] = (model.name, time.perf_counter())
+
+
+def _after_call(context, **kwargs):
+    # after-call-error (connection failures) passes no model, so the name comes from before-call
+    call = context.pop('stocker_call', None)
+    if call is not None:
+        record_dynamodb_call(call[0], time.perf_counter() - call[1])
+
+
+def instrument_boto3(client):
+    """Times every DynamoDB call made through a boto3 client or resource; returns it."""
+    meta = client.meta
+    events = meta.events if hasattr(meta, 'events') else meta.client.meta.events
+    events.register('before-call.dynamodb', _before_call, unique_id='stocker-metrics-before')
+    events.register('after-call.dynamodb', _after_call, unique_id='stocker-metrics-after')
+    events.register('after-call-error.dynamodb', _after_call, unique_id='stocker-metrics-error')
+    return client
+
+
+class SlowRequestProfiler:
+    """Samples in-flight request stacks and logs those of requests slower than ``threshold_ms``."""
+
+    def __init__(self, threshold_ms, interval=PROFILE_INTERVAL, path=SLOW_REQUEST_LOG, max_stacks=20):
+        self.threshold = threshold_ms / 1000
+        self.interval = interval
+        self.path = path
+        self.max_stacks = max_stacks
+        self._lock = threading.Lock()
+        # thread id -> sampled stacks of the request it is serving
+        self._active = {}
+        self._thread = None
+        self.logged = 0
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='slow-request-profiler', daemon=True)
+            self._thread.start()
+        return self
+
+    def begin(self):
+        with self._lock:
+            self._active[threading.get_ident()] = StackCounter()
+
+    def end(self, stats, method, path, status):
+        """Writes the request's sampled stacks if it was slow."""
+        with self._lock:
+            samples = self._active.pop(threading.get_ident(), None)
+        elapsed = time.perf_counter() - stats.started
+        if samples is None or elapsed < self.threshold:
+            return
+        entry = {
+            'time': time.time(), 'endpoint': stats.endpoint, 'method': method, 'path': path,
+            'status': status, 'ms': round(elapsed * 1000, 1),
+            'db_queries': stats.db_queries, 'db_ms': round(stats.db_seconds * 1000, 1),
+            'dynamodb_calls': stats.dynamodb_calls, 'dynamodb_ms': round(stats.dynamodb_seconds * 1000, 1),
+            'samples': sum(samples.values()),
+            'stacks': [[count, stack] for stack, count in samples.most_common(self.max_stacks)],
+        }
+        try:
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(entry) + '\n')
+            self.logged += 1
+        except OSError as e:
+            print(f"Error writing slow request log: {e}")
+
+    def _run(self):
+        own = threading.get_ident()
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                active = list(self._active.items())
+            if not active:
+                continue
+            frames = sys._current_frames()
+            for ident, samples in active:
+                frame = frames.get(ident)
+                if frame is None or ident == own:
+                    continue
+                # Folded, outermost first, as flame graph tools expect
+                stack = ';'.join(f'{f.name} ({os.path.basename(f.filename)}:{f.lineno})'
+                                 for f in traceback.extract_stack(frame))
+                with self._lock:
+                    samples[stack] += 1
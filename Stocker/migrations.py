@@ -0,0 +1,258 @@
+"""Versioned schema migrations for the SQLite database.
+
+The schema version is stored in SQLite's ``user_version`` pragma. Each
+migration runs in its own transaction and bumps the version when it
+commits, so ``migrate()`` is safe to call on every startup.
+
+Migrations spell out their SQL rather than calling the app's helpers.
+A migration must do the same thing on every database it ever upgrades,
+whatever those helpers later become.
+"""
+
+
+def _create_base_tables(cursor):
+    # Users table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL,
+            role TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Portfolio table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS portfolio (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            stock_symbol TEXT NOT NULL,
+            quantity INTEGER NOT NULL,
+            avg_price REAL NOT NULL,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+
+    # Trades table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS trades (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            stock_symbol TEXT NOT NULL,
+            qty INTEGER NOT NULL,
+            price REAL NOT NULL,
+            type TEXT NOT NULL,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+
+
+def _add_lookup_indexes(cursor):
+    # Collapse duplicate positions left by concurrent buys so the unique
+    # index can be built: keep the oldest row with the summed quantity and
+    # the quantity-weighted average price.
+    cursor.execute('''
+        UPDATE portfolio
+        SET quantity = (
+                SELECT SUM(d.quantity) FROM portfolio d
+                WHERE d.user_id IS portfolio.user_id
+                  AND d.stock_symbol = portfolio.stock_symbol
+            ),
+            avg_price = COALESCE((
+                SELECT SUM(d.quantity * d.avg_price) / NULLIF(SUM(d.quantity), 0)
+                FROM portfolio d
+                WHERE d.user_id IS portfolio.user_id
+                  AND d.stock_symbol = portfolio.stock_symbol
+            ), avg_price)
+        WHERE id IN (
+            SELECT MIN(id) FROM portfolio
+            GROUP BY user_id, stock_symbol
+            HAVING COUNT(*) > 1
+        )
+    ''')
+    cursor.execute('''
+        DELETE FROM portfolio
+        WHERE id NOT IN (
+            SELECT MIN(id) FROM portfolio
+            GROUP BY user_id, stock_symbol
+        )
+    ''')
+
+    # trade(): WHERE user_id = ? AND stock_symbol = ?
+    cursor.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_portfolio_user_symbol
+        ON portfolio (user_id, stock_symbol)
+    ''')
+    # history(): WHERE user_id = ? ORDER BY timestamp DESC
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_trades_user_timestamp
+        ON trades (user_id, timestamp)
+    ''')
+    # login(): WHERE email = ? AND role = ?
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_users_email_role
+        ON users (email, role)
+    ''')
+
+
+def _add_stats_counters(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS stats (
+            name TEXT PRIMARY KEY,
+            value REAL NOT NULL DEFAULT 0
+        )
+    ''')
+    # Start each counter from the current contents of the base tables
+    cursor.execute('''
+        INSERT OR REPLACE INTO stats (name, value) VALUES
+            ('traders', (SELECT COUNT(*) FROM users WHERE role = 'Trader')),
+            ('trades', (SELECT COUNT(*) FROM trades)),
+            ('notional_volume', (SELECT COALESCE(SUM(qty * price), 0) FROM trades)),
+            ('cost_basis', (SELECT COALESCE(SUM(quantity * avg_price), 0) FROM portfolio))
+    ''')
+
+    # Signups and account removals
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS stats_users_insert AFTER INSERT ON users
+        WHEN NEW.role = 'Trader'
+        BEGIN
+            UPDATE stats SET value = value + 1 WHERE name = 'traders';
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS stats_users_delete AFTER DELETE ON users
+        WHEN OLD.role = 'Trader'
+        BEGIN
+            UPDATE stats SET value = value - 1 WHERE name = 'traders';
+        END
+    ''')
+
+    # Trade count and notional volume
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS stats_trades_insert AFTER INSERT ON trades
+        BEGIN
+            UPDATE stats SET value = value + 1 WHERE name = 'trades';
+            UPDATE stats SET value = value + NEW.qty * NEW.price WHERE name = 'notional_volume';
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS stats_trades_delete AFTER DELETE ON trades
+        BEGIN
+            UPDATE stats SET value = value - 1 WHERE name = 'trades';
+            UPDATE stats SET value = value - OLD.qty * OLD.price WHERE name = 'notional_volume';
+        END
+    ''')
+
+    # Total cost basis, SUM(quantity * avg_price) over all positions
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS stats_portfolio_insert AFTER INSERT ON portfolio
+        BEGIN
+            UPDATE stats SET value = value + NEW.quantity * NEW.avg_price WHERE name = 'cost_basis';
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS stats_portfolio_update AFTER UPDATE OF quantity, avg_price ON portfolio
+        BEGIN
+            UPDATE stats
+            SET value = value + NEW.quantity * NEW.avg_price - OLD.quantity * OLD.avg_price
+            WHERE name = 'cost_basis';
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS stats_portfolio_delete AFTER DELETE ON portfolio
+        BEGIN
+            UPDATE stats SET value = value - OLD.quantity * OLD.avg_price WHERE name = 'cost_basis';
+        END
+    ''')
+
+
+def _add_history_indexes(cursor):
+    # admin_history(): ORDER BY timestamp DESC, id DESC across all users
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_trades_timestamp
+        ON trades (timestamp)
+    ''')
+    # admin_history(): filtered by symbol
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_trades_symbol_timestamp
+        ON trades (stock_symbol, timestamp)
+    ''')
+
+
+def _add_lots(cursor):
+    # Open lots per position, oldest first; shorts have a negative quantity
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS lots (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            stock_symbol TEXT NOT NULL,
+            quantity INTEGER NOT NULL,
+            price REAL NOT NULL,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_lots_user_symbol
+        ON lots (user_id, stock_symbol, id)
+    ''')
+    # Realized P&L accumulated per position
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS realized_pnl (
+            user_id INTEGER,
+            stock_symbol TEXT NOT NULL,
+            closed_quantity INTEGER NOT NULL DEFAULT 0,
+            realized REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, stock_symbol),
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+    # Each existing position becomes one lot at its average price, and
+    # realized P&L starts empty. The portfolio itself is left as it is;
+    # `flask --app app rebuild-lots` replays the trades table instead, for
+    # operators who want lots and P&L recovered from the full history.
+    cursor.execute('''
+        INSERT INTO lots (user_id, stock_symbol, quantity, price)
+        SELECT user_id, stock_symbol, quantity, avg_price FROM portfolio
+        WHERE quantity != 0
+        ORDER BY id
+    ''')
+
+
+# (version, description, function) in the order they must be applied
+MIGRATIONS = [
+    (1, 'base users, portfolio and trades tables', _create_base_tables),
+    (2, 'lookup indexes for portfolio, trades and users', _add_lookup_indexes),
+    (3, 'incrementally maintained admin statistics', _add_stats_counters),
+    (4, 'timestamp indexes for paginated trade history', _add_history_indexes),
+    (5, 'open lots and realized P&L', _add_lots),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def get_version(conn):
+    """Returns the schema version recorded in the database."""
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def migrate(conn, target=LATEST_VERSION):
+    """Applies every pending migration up to ``target`` and returns the new version."""
+    current = get_version(conn)
+    for version, description, apply in MIGRATIONS:
+        if version <= current or version > target:
+            continue
+        cursor = conn.cursor()
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            apply(cursor)
+            cursor.execute(f'PRAGMA user_version = {version}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        print(f"Applied migration {version}: {description}")
+        current = version
+    return current
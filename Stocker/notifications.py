@@ -0,0 +1,158 @@
+"""Asynchronous SNS notifications.
+
+Request handlers call ``NotificationQueue.enqueue()``, which never blocks:
+the message goes onto a bounded in-process queue, or is counted as
+dropped when the queue is full. A small pool of worker threads drains the
+queue in PublishBatch calls of up to 10 entries. Throttling and other
+retryable failures are retried with exponential backoff and jitter.
+Entries rejected as malformed (a sender fault), or still failing once
+retries are exhausted, are appended to a JSON-lines dead-letter file so
+they can be inspected or replayed.
+"""
+import itertools
+import json
+import queue
+import random
+import threading
+import time
+from datetime import datetime
+
+# SNS PublishBatch limit
+BATCH_SIZE = 10
+
+_STOP = object()
+
+
+class NotificationQueue:
+    """Bounded queue of SNS messages published in batches by background workers."""
+
+    def __init__(self, client, topic_arn, dead_letter_path, workers=2, max_size=1000,
+                 batch_wait=0.1, max_retries=5, backoff=0.2, max_backoff=10.0):
+        self.client = client
+        self.topic_arn = topic_arn
+        self.dead_letter_path = dead_letter_path
+        self.workers = workers
+        self.batch_wait = batch_wait
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+        self._queue = queue.Queue(max_size)
+        self._threads = []
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+        self._counts = dict.fromkeys(
+            ('enqueued', 'dropped', 'published', 'batches', 'retries', 'dead_lettered'), 0)
+
+    def start(self):
+        """Starts the worker threads."""
+        if not self._threads:
+            for n in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f'sns-worker-{n}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        return self
+
+    def enqueue(self, subject, message):
+        """Queues a message without blocking; returns False if it was dropped."""
+        entry = {'Id': str(next(self._ids)), 'Subject': subject, 'Message': message}
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            self._count('dropped')
+            return False
+        self._count('enqueued')
+        return True
+
+    def close(self, timeout=5.0):
+        """Lets the workers publish what is queued, then stops them."""
+        for _ in self._threads:
+            try:
+                self._queue.put(_STOP, timeout=timeout)
+            except queue.Full:
+                break
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def stats(self):
+        """Returns queue depth and delivery counters."""
+        with self._lock:
+            stats = dict(self._counts)
+        stats['queued'] = self._queue.qsize()
+        return stats
+
+    def _count(self, name, n=1):
+        with self._lock:
+            self._counts[name] += n
+
+    def _run(self):
+        while True:
+            entry = self._queue.get()
+            if entry is _STOP:
+                return
+            batch = [entry]
+            stop = False
+            # Give a burst of messages a moment to fill the batch
+            deadline = time.monotonic() + self.batch_wait
+            while len(batch) < BATCH_SIZE:
+                try:
+                    entry = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if entry is _STOP:
+                    stop = True
+                    break
+                batch.append(entry)
+            self._publish(batch)
+            if stop:
+                return
+
+    def _publish(self, batch):
+        attempt = 0
+        while batch:
+            try:
+                response = self.client.publish_batch(
+                    TopicArn=self.topic_arn,
+                    PublishBatchRequestEntries=batch
+                )
+            except Exception as e:
+                print(f"Error publishing SNS batch: {e}")
+                retry = batch
+            else:
+                self._count('batches')
+                self._count('published', len(response.get('Successful', [])))
+                by_id = {entry['Id']: entry for entry in batch}
+                retry = []
+                for failure in response.get('Failed', []):
+                    entry = by_id[failure['Id']]
+                    if failure.get('SenderFault'):
+                        self._dead_letter([entry], failure.get('Code'))
+                    else:
+                        retry.append(entry)
+
+            batch = retry
+            if not batch:
+                return
+            attempt += 1
+            if attempt > self.max_retries:
+                self._dead_letter(batch, 'RetriesExhausted')
+                return
+            self._count('retries', len(batch))
+            delay = min(self.backoff * 2 ** (attempt - 1), self.max_backoff)
+            time.sleep(delay * random.uniform(0.5, 1.0))
+
+    def _dead_letter(self, entries, reason):
+        failed_at = datetime.now().isoformat()
+        lines = ''.join(
+            json.dumps({'failed_at': failed_at, 'reason': reason, 'topic_arn': self.topic_arn,
+                        'subject': entry['Subject'], 'message': entry['Message']}) + '\n'
+            for entry in entries
+        )
+        with self._lock:
+            self._counts['dead_lettered'] += len(entries)
+            try:
+                with open(self.dead_letter_path, 'a', encoding='utf-8') as f:
+                    f.write(lines)
+            except OSError as e:
+                print(f"Error writing SNS dead-letter file: {e}")
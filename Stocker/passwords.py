@@ -0,0 +1,152 @@
+"""Salted scrypt password hashes, computed on a bounded worker pool.
+
+Hashes are stored as ``scrypt$<n>$<r>$<p>$<salt>$<hash>`` with base64
+salt and hash, so each one carries the cost it was made with. Hashes
+from before this module (a bare SHA-256 hex digest) still verify, and
+``check()`` hands back a replacement hash whenever the stored one is
+legacy or was made with other cost parameters. Login stores that
+replacement, so raising the cost upgrades each user at their next login.
+
+scrypt is deliberately slow and memory-hard. It releases the GIL, so it
+runs on a small thread pool, at most ``workers`` at a time. At most
+``max_pending`` more wait behind them. Past that, ``PasswordHasherBusy``
+is raised at once. A burst of logins then gets quick refusals instead of
+taking every CPU away from trade requests. Authenticated requests never
+hash: the signed session cookie carries the user after login.
+"""
+import base64
+import hashlib
+import hmac
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+PREFIX = 'scrypt'
+SALT_BYTES = 16
+HASH_BYTES = 32
+
+# The cost every app hashes with: 2**14 * 8 * 128 bytes = 16 MB of memory
+# per hash. Raising it upgrades each user's hash at their next login.
+SCRYPT_N = 2 ** 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+
+# Passwords hashed at once, and how many more logins may wait before being turned away
+WORKERS = 2
+MAX_PENDING = 32
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when the hashing pool has no room for another request."""
+
+
+def legacy_hash(password):
+    """The original unsalted SHA-256 hex digest."""
+    return hashlib.sha256(password.encode()).hexdigest()
+
+
+def _b64(data):
+    return base64.b64encode(data).decode('ascii')
+
+
+def scrypt_hash(password, salt, n, r, p):
+    # OpenSSL refuses to use more than maxmem; allow what the parameters need
+    maxmem = 128 * r * (n + p + 2) + 1024 * 1024
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=maxmem, dklen=HASH_BYTES)
+
+
+def encode(password, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P, salt=None):
+    """Returns a new encoded scrypt hash of ``password`` with a random salt."""
+    salt = os.urandom(SALT_BYTES) if salt is None else salt
+    return f'{PREFIX}${n}${r}${p}${_b64(salt)}${_b64(scrypt_hash(password, salt, n, r, p))}'
+
+
+def verify(password, stored):
+    """Returns (matches, (n, r, p)) for an encoded hash; the parameters are None for a legacy hash."""
+    if not stored.startswith(PREFIX + '$'):
+        # As bytes: compare_digest() refuses str with non-ASCII characters
+        return hmac.compare_digest(legacy_hash(password).encode(), stored.encode()), None
+    try:
+        _, n, r, p, salt, expected = stored.split('$')
+        params = (int(n), int(r), int(p))
+        salt, expected = base64.b64decode(salt, validate=True), base64.b64decode(expected, validate=True)
+        # hashlib rejects parameters it cannot use, e.g. an n that is not a power of 2
+        computed = scrypt_hash(password, salt, *params)
+    except ValueError:
+        return False, None
+    return hmac.compare_digest(computed, expected), params
+
+
+class PasswordHasher:
+    """Hashes and checks passwords with scrypt cost (n, r, p) on ``workers`` threads."""
+
+    def __init__(self, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P, workers=WORKERS, max_pending=MAX_PENDING,
+                 timeout=10.0):
+        self.params = (n, r, p)
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hasher')
+        # Running plus waiting jobs
+        self._slots = threading.BoundedSemaphore(workers + max_pending)
+        self._lock = threading.Lock()
+        self._counts = dict.fromkeys(('hashed', 'checked', 'rehashed', 'rejected'), 0)
+        self._total_seconds = 0.0
+
+    def hash(self, password):
+        """Returns a new encoded hash of ``password``."""
+        return self._submit(self._hash, password)
+
+    def check(self, password, stored):
+        """Returns (matches, replacement hash or None).
+
+        The replacement is set when the password matches a legacy hash or
+        a hash made with other cost parameters, and should be stored.
+        """
+        return self._submit(self._check, password, stored)
+
+    def stats(self):
+        """Returns job counts and the mean time a job spent hashing."""
+        with self._lock:
+            done = self._counts['hashed'] + self._counts['checked']
+            return dict(self._counts, params=list(self.params),
+                        mean_ms=round(self._total_seconds / done * 1000, 2) if done else 0.0)
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _submit(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            self._count('rejected')
+            raise PasswordHasherBusy('Too many logins in progress. Please try again.')
+        try:
+            future = self._executor.submit(self._timed, fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        # A job that outlives the timeout keeps its slot until it finishes
+        future.add_done_callback(lambda _: self._slots.release())
+        return future.result(self.timeout)
+
+    def _timed(self, fn, *args):
+        started = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self._total_seconds += time.perf_counter() - started
+
+    def _hash(self, password):
+        self._count('hashed')
+        return encode(password, *self.params)
+
+    def _check(self, password, stored):
+        self._count('checked')
+        matches, params = verify(password, stored)
+        if not matches or params == self.params:
+            return matches, None
+        self._count('rehashed')
+        return True, encode(password, *self.params)
+
+    def _count(self, name):
+        with self._lock:
+            self._counts[name] += 1
@@ -0,0 +1,96 @@
+"""Immutable price snapshots published by the price updater.
+
+The updater builds each snapshot off to the side and publishes it by
+swapping a single reference, which is atomic in CPython. Request threads
+call ``PriceBoard.current()`` once and read every price from that one
+snapshot, so a page never mixes two ticks and readers never take a lock.
+Streaming clients block in ``PriceBoard.wait()`` until the next publish.
+"""
+import threading
+import time
+from collections import deque
+from types import MappingProxyType
+
+# Number of past snapshots kept so reconnecting clients can get a delta
+HISTORY_SIZE = 120
+
+
+class PriceSnapshot:
+    """The prices of one tick, tagged with a sequence number and timestamp.
+
+    ``changed`` holds the symbols whose price differs from the previous tick.
+    """
+
+    __slots__ = ('seq', 'timestamp', 'prices', 'changed')
+
+    def __init__(self, seq, timestamp, prices, changed=None):
+        prices = dict(prices)
+        object.__setattr__(self, 'seq', seq)
+        object.__setattr__(self, 'timestamp', timestamp)
+        object.__setattr__(self, 'prices', MappingProxyType(prices))
+        object.__setattr__(self, 'changed', frozenset(prices if changed is None else changed))
+
+    def __setattr__(self, name, value):
+        raise AttributeError('PriceSnapshot is immutable')
+
+    def __repr__(self):
+        return f'<PriceSnapshot seq={self.seq} symbols={len(self.prices)}>'
+
+
+class PriceBoard:
+    """Holds the latest PriceSnapshot. Only the price updater thread publishes."""
+
+    def __init__(self, history_size=HISTORY_SIZE):
+        self._current = PriceSnapshot(0, time.time(), {})
+        self._history = deque([self._current], maxlen=history_size)
+        self._published = threading.Condition()
+
+    def current(self):
+        """Returns the latest snapshot; callers should read it once per request."""
+        return self._current
+
+    def publish(self, prices, timestamp=None, seq=None):
+        """Builds the next snapshot from ``prices`` and makes it current.
+
+        ``seq`` defaults to the previous one plus one; a board mirroring
+        another process's ticks passes that process's sequence number.
+        """
+        previous = self._current
+        changed = [s for s, p in prices.items() if previous.prices.get(s) != p]
+        snapshot = PriceSnapshot(previous.seq + 1 if seq is None else seq,
+                                 time.time() if timestamp is None else timestamp,
+                                 prices, changed)
+        self._history.append(snapshot)
+        self._current = snapshot
+        with self._published:
+            self._published.notify_all()
+        return snapshot
+
+    def wait(self, after_seq, timeout=None):
+        """Blocks until a snapshot newer than ``after_seq`` is published or the timeout expires.
+
+        Returns the current snapshot either way.
+        """
+        with self._published:
+            self._published.wait_for(lambda: self._current.seq > after_seq, timeout)
+        return self._current
+
+    def changes_since(self, seq, snapshot=None):
+        """Returns {symbol: price} for every symbol that changed after tick ``seq``.
+
+        Falls back to the full price map when ``seq`` is older than the kept
+        history (or from a previous process), so the caller can resync.
+        """
+        snapshot = snapshot or self._current
+        if seq == snapshot.seq:
+            return {}
+        changed = set()
+        found = False
+        for past in list(self._history):
+            if past.seq == seq:
+                found = True
+            elif found and past.seq <= snapshot.seq:
+                changed |= past.changed
+        if not found:
+            return dict(snapshot.prices)
+        return {s: snapshot.prices[s] for s in changed if s in snapshot.prices}
@@ -0,0 +1,133 @@
+"""Server-Sent Events stream of price changes.
+
+Each event carries the tick sequence number as its SSE id and only the
+symbols that changed since the client's last event. Browsers send the last
+id back in the Last-Event-ID header when EventSource reconnects, so a
+client that drops for a few ticks resumes with a delta rather than a full
+reload.
+
+Every open stream holds a server thread for as long as the client stays
+connected. Serve the app with a threaded or gevent worker class, e.g.
+``gunicorn -k gthread --threads 64`` or ``gunicorn -k gevent``. Sync
+workers serve one request at a time, so a single open dashboard would
+block every other request. Each process also serves at most
+STOCKER_MAX_PRICE_STREAMS streams at once (32 by default). Further clients
+get a 503, and script.js then polls /api/stock_prices instead. Keep the
+cap below the thread count, so streams always leave threads for other
+requests.
+"""
+import json
+import os
+import threading
+
+# Seconds between keep-alive comments when no tick arrives
+KEEPALIVE_SECONDS = 15
+# Milliseconds the browser waits before reconnecting
+RETRY_MS = 3000
+
+# Streams one process serves at once; past it clients fall back to polling
+MAX_STREAMS = int(os.environ.get('STOCKER_MAX_PRICE_STREAMS', 32))
+
+
+def format_event(seq, prices, encode=None):
+    """Formats one 'prices' SSE event."""
+    if encode is not None:
+        prices = {symbol: encode(price) for symbol, price in prices.items()}
+    data = json.dumps({'seq': seq, 'prices': prices}, separators=(',', ':'))
+    return f'id: {seq}\nevent: prices\ndata: {data}\n\n'
+
+
+def parse_last_seq(value):
+    """Parses a Last-Event-ID / since value, returning None if absent or malformed."""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def price_events(board, last_seq=None, encode=None, keepalive=KEEPALIVE_SECONDS):
+    """Yields SSE frames for ``board``, starting with a full or delta snapshot."""
+    yield f'retry: {RETRY_MS}\n\n'
+
+    snapshot = board.current()
+    if last_seq is None:
+        prices = dict(snapshot.prices)
+    else:
+        prices = board.changes_since(last_seq, snapshot)
+    yield format_event(snapshot.seq, prices, encode)
+    seq = snapshot.seq
+
+    while True:
+        snapshot = board.wait(seq, timeout=keepalive)
+        if snapshot.seq == seq:
+            yield ': keep-alive\n\n'
+            continue
+        changes = board.changes_since(seq, snapshot)
+        seq = snapshot.seq
+        if changes:
+            yield format_event(seq, changes, encode)
+
+
+class StreamLimiter:
+    """Counts open price streams and refuses new ones past ``limit``."""
+
+    def __init__(self, limit=MAX_STREAMS):
+        self.limit = limit
+        self._lock = threading.Lock()
+        self.open = 0
+        self.refused = 0
+
+    def acquire(self):
+        """Takes a stream slot; returns False if all ``limit`` are in use."""
+        with self._lock:
+            if self.open >= self.limit:
+                self.refused += 1
+                return False
+            self.open += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.open -= 1
+
+    def stats(self):
+        with self._lock:
+            return {'open': self.open, 'limit': self.limit, 'refused': self.refused}
+
+
+class PricePayloadCache:
+    """Serializes /api/stock_prices bodies once per tick.
+
+    The full price map is encoded the first time it is requested for a
+    tick and reused until the next publish, together with an ETag derived
+    from the tick, so repeat and conditional requests cost no JSON work.
+    """
+
+    def __init__(self, board, encode=None):
+        self.board = board
+        self.encode = encode
+        self._cached = None
+
+    def _encode(self, prices):
+        if self.encode is None:
+            return dict(prices)
+        return {symbol: self.encode(price) for symbol, price in prices.items()}
+
+    def full(self):
+        """Returns (snapshot, json_body, etag) for the current tick."""
+        snapshot = self.board.current()
+        cached = self._cached
+        if cached is not None and cached[0] is snapshot:
+            return cached
+        body = json.dumps(self._encode(snapshot.prices), separators=(',', ':')).encode()
+        etag = f'{snapshot.seq}-{int(snapshot.timestamp * 1000)}'
+        cached = (snapshot, body, etag)
+        self._cached = cached
+        return cached
+
+    def delta(self, since):
+        """Returns (snapshot, json_body) with the prices changed after tick ``since``."""
+        snapshot = self.board.current()
+        prices = self._encode(self.board.changes_since(since, snapshot))
+        body = json.dumps({'seq': snapshot.seq, 'prices': prices}, separators=(',', ':'))
+        return snapshot, body
@@ -0,0 +1,198 @@
+"""Write-behind persistence of prices to DynamoDB.
+
+The price updater hands each tick's items to ``PriceWriter.submit()`` and
+returns immediately. Pending items are coalesced per key, so a symbol
+that ticks again before it is written only costs one write, with the
+newest price. A background worker drains them in 25-item BatchWriteItem
+requests, retries UnprocessedItems and throttling errors with
+exponential backoff, and puts anything it still cannot write back into
+the pending set unless a newer price has arrived in the meantime.
+
+The pending set is bounded. When it is full, ``submit()`` blocks for up to
+``put_timeout`` seconds and then rejects the items it could not queue.
+``stats()`` reports flush lag: the time from an item first becoming
+pending to its batch being written.
+"""
+import threading
+import time
+
+# DynamoDB's BatchWriteItem limit
+BATCH_SIZE = 25
+
+
+class PriceWriter:
+    """Coalescing write-behind queue feeding ``table`` through BatchWriteItem."""
+
+    def __init__(self, table, key='symbol', max_pending=10000, put_timeout=1.0,
+                 max_retries=5, backoff=0.05, max_backoff=2.0):
+        self.table = table
+        self.key = key
+        self.max_pending = max_pending
+        self.put_timeout = put_timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+        # key -> (item, time the key first became pending)
+        self._pending = {}
+        self._flushing = 0
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopping = False
+
+        self._submitted = 0
+        self._coalesced = 0
+        self._rejected = 0
+        self._written = 0
+        self._batches = 0
+        self._retries = 0
+        self._requeued = 0
+        self._errors = 0
+        self._last_lag = 0.0
+        self._max_lag = 0.0
+        self._total_lag = 0.0
+        self._last_flush = None
+
+    def start(self):
+        """Starts the background worker."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='price-writer', daemon=True)
+            self._thread.start()
+        return self
+
+    def submit(self, items):
+        """Queues ``items`` (full DynamoDB items) for writing; returns how many were rejected."""
+        now = time.monotonic()
+        deadline = now + self.put_timeout
+        submitted = rejected = 0
+        with self._cond:
+            for item in items:
+                submitted += 1
+                key = item[self.key]
+                entry = self._pending.get(key)
+                if entry is not None:
+                    # Newer price replaces the pending one but keeps its lag clock
+                    self._pending[key] = (item, entry[1])
+                    self._coalesced += 1
+                    continue
+                while len(self._pending) >= self.max_pending:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                if len(self._pending) >= self.max_pending:
+                    rejected += 1
+                    continue
+                self._pending[key] = (item, now)
+            self._submitted += submitted - rejected
+            self._rejected += rejected
+            self._cond.notify_all()
+        return rejected
+
+    def flush(self, timeout=None):
+        """Blocks until everything submitted so far is written; returns False on timeout."""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._pending and not self._flushing, timeout)
+
+    def close(self, timeout=5.0):
+        """Flushes pending items and stops the worker."""
+        self.flush(timeout)
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def stats(self):
+        """Returns queue depth, throughput and flush lag counters."""
+        with self._cond:
+            return {
+                'pending': len(self._pending),
+                'submitted': self._submitted,
+                'coalesced': self._coalesced,
+                'rejected': self._rejected,
+                'written': self._written,
+                'batches': self._batches,
+                'retries': self._retries,
+                'requeued': self._requeued,
+                'errors': self._errors,
+                'last_flush_lag': round(self._last_lag, 4),
+                'max_flush_lag': round(self._max_lag, 4),
+                'avg_flush_lag': round(self._total_lag / self._written, 4) if self._written else 0.0,
+                'seconds_since_flush': (round(time.monotonic() - self._last_flush, 3)
+                                        if self._last_flush is not None else None),
+            }
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending or self._stopping)
+                if self._stopping and not self._pending:
+                    return
+                batch = self._pending
+                self._pending = {}
+                self._flushing += 1
+                # Producers blocked on a full queue can continue
+                self._cond.notify_all()
+            try:
+                entries = list(batch.values())
+                for start in range(0, len(entries), BATCH_SIZE):
+                    self._write_batch(entries[start:start + BATCH_SIZE])
+            finally:
+                with self._cond:
+                    self._flushing -= 1
+                    self._cond.notify_all()
+
+    def _write_batch(self, entries):
+        since = {entry[0][self.key]: entry[1] for entry in entries}
+        requests = [{'PutRequest': {'Item': item}} for item, _ in entries]
+        client = self.table.meta.client
+        attempt = 0
+        while requests:
+            try:
+                response = client.batch_write_item(RequestItems={self.table.name: requests})
+                unprocessed = response.get('UnprocessedItems', {}).get(self.table.name, [])
+            except Exception as e:
+                print(f"Error writing price batch to DynamoDB: {e}")
+                with self._cond:
+                    self._errors += 1
+                unprocessed = requests
+
+            self._record_written(requests, unprocessed, since)
+            requests = unprocessed
+            if not requests:
+                return
+            attempt += 1
+            if attempt > self.max_retries:
+                self._requeue(requests, since)
+                return
+            with self._cond:
+                self._retries += 1
+            time.sleep(min(self.backoff * 2 ** (attempt - 1), self.max_backoff))
+
+    def _record_written(self, requests, unprocessed, since):
+        if len(unprocessed) == len(requests):
+            return
+        now = time.monotonic()
+        failed = {r['PutRequest']['Item'][self.key] for r in unprocessed}
+        lags = [now - since[r['PutRequest']['Item'][self.key]]
+                for r in requests if r['PutRequest']['Item'][self.key] not in failed]
+        with self._cond:
+            self._written += len(lags)
+            self._batches += 1
+            self._last_lag = max(lags)
+            self._max_lag = max(self._max_lag, self._last_lag)
+            self._total_lag += sum(lags)
+            self._last_flush = now
+
+    def _requeue(self, requests, since):
+        # Put unwritten items back unless a newer price is already pending
+        with self._cond:
+            for request in requests:
+                item = request['PutRequest']['Item']
+                key = item[self.key]
+                if key not in self._pending:
+                    self._pending[key] = (item, since[key])
+                    self._requeued += 1
+            self._cond.notify_all()
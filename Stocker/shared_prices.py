@@ -0,0 +1,335 @@
+"""One price simulator for many worker processes, via shared memory.
+
+Under a pre-forking server, each worker used to run its own simulator,
+so two requests could see different prices. Instead, a single publisher
+process (``flask --app app price-publisher``) owns the simulator and the
+tick store. It writes every tick into a named shared-memory block.
+Workers started with ``STOCKER_SHARED_PRICES=<name>`` read from that
+block instead of simulating.
+
+Block layout, all 8-byte words:
+
+    [version, seq, timestamp_ms, n_symbols, generation] [prices: float64 * n] [volume: int64 * n]
+
+``version`` is a seqlock. The single writer makes it odd, writes the
+tick, then makes it even again. A reader copies the prices straight out
+of the block and keeps the copy only if the version was even and
+unchanged across the copy, so readers never block the writer or each
+other. Aligned 8-byte loads and stores are atomic, and x86-64 keeps
+them in program order. That is the ordering the seqlock relies on,
+since Python has no memory fences.
+
+Traded volume goes the other way. Workers add shares to the volume words
+under an ``fcntl`` lock on ``<lock dir>/<name>.lock``, and the
+publisher drains them into the tick store each tick.
+
+Sequence numbers start from the epoch second when the publisher starts.
+Ticks are seconds apart, so sequence numbers keep increasing across
+publisher restarts, and workers and streaming clients never see them
+go backwards.
+
+A restarted publisher replaces the block with a new one under the same
+name. Workers attached to the old block would keep reading it, and
+their prices would stop moving. Each block therefore carries a
+``generation`` set when it is created. A worker that sees no new tick for
+``STALE_TICKS`` ticks opens the name again, and it switches to that block
+if the generation differs. Volume traded in between goes to the old block
+and is lost. A block with a different number of symbols, from a publisher
+started with another symbol list, is not attached: the worker logs it,
+keeps serving its last prices and looks again ``STALE_TICKS`` ticks later.
+"""
+import os
+import signal
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from price_snapshot import PriceBoard
+
+VERSION, SEQ, TIMESTAMP, COUNT, GENERATION = range(5)
+HEADER_WORDS = 5
+
+# Reader retries while the writer is mid-tick before giving up on this read
+MAX_READ_ATTEMPTS = 1000
+
+# How often a worker's watcher looks for a new tick
+POLL_INTERVAL = 0.05
+
+# Ticks without a new price after which a worker checks for a restarted publisher
+STALE_TICKS = 3
+
+
+def _attach(name):
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Before Python 3.13 an attaching process registers the block with its
+        # resource tracker, which would unlink it when that worker exits
+        block = shared_memory.SharedMemory(name=name)
+        if os.name == 'posix':
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(block._name, 'shared_memory')
+        return block
+
+
+class SharedPrices:
+    """A view of the shared price block, as its one writer or as a reader."""
+
+    def __init__(self, block, symbols, owner=False, lock_dir=None):
+        self.block = block
+        self.symbols = list(symbols)
+        self.owner = owner
+        n = len(self.symbols)
+        if not owner:
+            # Checked before any view of the block exists, so a caller can still close it
+            count = int(np.ndarray((1,), dtype=np.int64, buffer=block.buf, offset=COUNT * 8)[0])
+            if count != n:
+                raise ValueError(f'Shared price block {block.name} holds {count} symbols, expected {n}')
+        words = np.ndarray((HEADER_WORDS + 2 * n,), dtype=np.int64, buffer=block.buf)
+        self.header = words[:HEADER_WORDS]
+        self.prices = np.ndarray((n,), dtype=np.float64, buffer=block.buf, offset=HEADER_WORDS * 8)
+        self.volume = words[HEADER_WORDS + n:]
+        self.lock_path = os.path.join(lock_dir or os.getcwd(), f'{block.name.lstrip("/")}.lock')
+
+    @classmethod
+    def create(cls, name, symbols, lock_dir=None):
+        """Creates the block for the publisher, replacing one left behind by a crash."""
+        size = (HEADER_WORDS + 2 * len(symbols)) * 8
+        try:
+            block = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            stale = _attach(name)
+            stale.close()
+            stale.unlink()
+            block = shared_memory.SharedMemory(name=name, create=True, size=size)
+        shared = cls(block, symbols, owner=True, lock_dir=lock_dir)
+        shared.header[:] = 0
+        shared.header[COUNT] = len(symbols)
+        shared.header[GENERATION] = time.time_ns()
+        shared.volume[:] = 0
+        return shared
+
+    @classmethod
+    def attach(cls, name, symbols, lock_dir=None):
+        """Attaches a worker to the publisher's block.
+
+        Raises FileNotFoundError if the publisher is not running, and
+        ValueError if its block holds a different number of symbols.
+        """
+        block = _attach(name)
+        try:
+            return cls(block, symbols, lock_dir=lock_dir)
+        except ValueError:
+            block.close()
+            raise
+
+    def publish(self, seq, timestamp, prices):
+        """Writes one tick. Only the publisher calls this."""
+        version = int(self.header[VERSION])
+        self.header[VERSION] = version + 1
+        self.header[SEQ] = seq
+        self.header[TIMESTAMP] = int(timestamp * 1000)
+        self.prices[:] = prices
+        self.header[VERSION] = version + 2
+
+    def read(self):
+        """Returns (seq, timestamp, prices copy) of the latest tick, or None if none is published yet."""
+        header = self.header
+        for _ in range(MAX_READ_ATTEMPTS):
+            version = int(header[VERSION])
+            if version & 1:
+                time.sleep(0)
+                continue
+            seq = int(header[SEQ])
+            timestamp = int(header[TIMESTAMP]) / 1000
+            prices = self.prices.copy()
+            if int(header[VERSION]) == version:
+                return (seq, timestamp, prices) if version else None
+        return None
+
+    def version(self):
+        return int(self.header[VERSION])
+
+    def generation(self):
+        """Identifies this block among the ones publishers created under the same name."""
+        return int(self.header[GENERATION])
+
+    @contextmanager
+    def _volume_lock(self):
+        import fcntl
+        with open(self.lock_path, 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def add_volume(self, symbol, quantity):
+        """Adds traded shares for the publisher to attach to its next tick."""
+        i = self.symbols.index(symbol)
+        with self._volume_lock():
+            self.volume[i] += int(quantity)
+
+    def take_volume(self):
+        """Returns {symbol: shares} traded since the last call and resets the counters."""
+        with self._volume_lock():
+            volume = self.volume.copy()
+            self.volume[:] = 0
+        return {self.symbols[i]: int(volume[i]) for i in np.flatnonzero(volume)}
+
+    def close(self):
+        """Detaches; the publisher also removes the block."""
+        self.header = self.prices = self.volume = None
+        self.block.close()
+        if self.owner:
+            self.block.unlink()
+
+
+def run_publisher(name, symbols, tick, tick_seconds, lock_dir=None):
+    """Creates the shared block and publishes into it until interrupted.
+
+    Every ``tick_seconds``, ``tick(volume)`` is called with {symbol: shares}
+    traded in the workers since the last tick, and must return the new
+    prices aligned with ``symbols``. The block is removed on exit, including
+    on SIGTERM from a process manager.
+    """
+    if threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    shared = SharedPrices.create(name, symbols, lock_dir)
+    seq = int(time.time())
+    print(f"Publishing {len(symbols)} prices to shared memory '{name}' every {tick_seconds}s")
+    try:
+        while True:
+            prices = tick(shared.take_volume())
+            seq += 1
+            shared.publish(seq, time.time(), prices)
+            time.sleep(tick_seconds)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        shared.close()
+
+
+class SharedPriceBoard(PriceBoard):
+    """A PriceBoard that mirrors the publisher's shared block instead of being published to.
+
+    ``current()`` picks up a new tick as soon as it is written, and a
+    watcher thread (``start()``) wakes streaming clients blocked in
+    ``wait()``. Sequence numbers are the publisher's, so they match
+    across workers. ``convert`` turns each float price into the type the
+    app uses. ``tick_seconds`` is the publisher's tick interval, which sets
+    how soon a restarted publisher is noticed.
+    """
+
+    def __init__(self, name, symbols, convert=float, lock_dir=None, tick_seconds=10):
+        super().__init__()
+        self.name = name
+        self.symbols = list(symbols)
+        self.convert = convert
+        self.lock_dir = lock_dir
+        self.stale_after = STALE_TICKS * tick_seconds
+        self._shared = None
+        # The block replaced by the last reattach, closed at the next one
+        self._retired = None
+        self._seen = 0
+        self._changed = time.monotonic()
+        # When to try attaching again after finding a block for other symbols
+        self._retry_at = 0.0
+        self._refresh_lock = threading.Lock()
+        self._thread = None
+
+    def current(self):
+        self.refresh()
+        return super().current()
+
+    def refresh(self):
+        """Copies in the latest shared tick if it is newer than the current snapshot."""
+        shared = self._attached()
+        if shared is None:
+            return
+        if shared.version() == self._seen:
+            if time.monotonic() - self._changed >= self.stale_after:
+                self._reattach(shared)
+            return
+        with self._refresh_lock:
+            version = shared.version()
+            if version == self._seen:
+                return
+            tick = shared.read()
+            if tick is None:
+                return
+            seq, timestamp, prices = tick
+            # Otherwise the board runs ahead of the publisher, e.g. one restarted with a clock set back
+            self.publish({s: self.convert(p) for s, p in zip(self.symbols, prices.tolist())},
+                         timestamp, seq=seq if seq > super().current().seq else None)
+            self._seen = version
+            self._changed = time.monotonic()
+
+    def add_volume(self, symbol, quantity):
+        """Passes traded shares on to the publisher's tick store."""
+        shared = self._attached()
+        if shared is not None:
+            shared.add_volume(symbol, quantity)
+
+    def start(self):
+        """Starts the watcher thread."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._watch, name='shared-price-watcher', daemon=True)
+            self._thread.start()
+        return self
+
+    def _attached(self):
+        if self._shared is None:
+            if time.monotonic() < self._retry_at:
+                return None
+            try:
+                self._shared = SharedPrices.attach(self.name, self.symbols, self.lock_dir)
+            except FileNotFoundError:
+                return None
+            except ValueError as e:
+                self._mismatched(e)
+                return None
+        return self._shared
+
+    def _mismatched(self, error):
+        self._retry_at = time.monotonic() + self.stale_after
+        print(f"Ignoring shared prices '{self.name}', keeping the last prices: {error}")
+
+    def _reattach(self, shared):
+        """Switches to the block now under our name if a restarted publisher replaced ``shared``."""
+        with self._refresh_lock:
+            if self._shared is not shared or time.monotonic() - self._changed < self.stale_after:
+                return
+            # Look again after another stale_after, not on every request
+            self._changed = time.monotonic()
+            try:
+                fresh = SharedPrices.attach(self.name, self.symbols, self.lock_dir)
+            except FileNotFoundError:
+                # The publisher is down; keep serving its last prices
+                return
+            except ValueError as e:
+                self._mismatched(e)
+                return
+            if fresh.generation() == shared.generation():
+                fresh.close()
+                return
+            # Readers may still hold views of the old block for a moment
+            if self._retired is not None:
+                self._retired.close()
+            self._retired = shared
+            self._shared = fresh
+            self._seen = -1
+        print(f"Shared prices '{self.name}' were replaced by a restarted publisher; reattached")
+        self.refresh()
+
+    def _watch(self):
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Error reading shared prices: {e}")
+            time.sleep(POLL_INTERVAL)
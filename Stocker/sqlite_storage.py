@@ -0,0 +1,139 @@
+"""SQLite storage backend.
+
+Connections come from a ConnectionPool, one borrowed per call.
+Trades, lots, history pages, exports and admin counters are handled by
+trading.py, lots.py, trade_history.py, exports.py and stats.py.
+"""
+import sqlite3
+
+from db import ConnectionPool
+from exports import SQLITE_EXPORTS, sqlite_rows
+from lots import FIFO, read_realized, rebuild_lots
+from migrations import migrate
+from stats import read_stats, reconcile_stats
+from storage import Storage
+from trade_history import PAGE_SIZE, fetch_trades_page
+from trading import execute_batch, execute_trade
+
+
+class SQLiteStorage(Storage):
+    """Users, portfolios and trades in one SQLite database."""
+
+    name = 'sqlite'
+
+    def __init__(self, database, method=FIFO, pool_size=8):
+        self.database = database
+        # How sells are matched against open lots for realized P&L: FIFO or AVERAGE.
+        # Changing it requires rebuild_lots() with the new method.
+        self.method = method
+        self.pool = ConnectionPool(database, size=pool_size)
+
+    def init(self):
+        with self.pool.connection() as conn:
+            migrate(conn)
+
+    def close(self):
+        self.pool.close()
+
+    def create_user(self, username, email, password, role):
+        with self.pool.connection() as conn:
+            try:
+                conn.execute('INSERT INTO users (username, email, password, role) VALUES (?, ?, ?, ?)',
+                             (username, email, password, role))
+                conn.commit()
+            except sqlite3.IntegrityError:
+                # username and email are both UNIQUE
+                return False
+        return True
+
+    def find_user(self, email):
+        with self.pool.connection() as conn:
+            row = conn.execute('''
+                SELECT id, username, email, password, role, created_at
+                FROM users WHERE email = ?
+            ''', (email,)).fetchone()
+        if row is None:
+            return None
+        return dict(zip(('id', 'username', 'email', 'password', 'role', 'created_at'), row))
+
+    def set_password(self, email, password):
+        with self.pool.connection() as conn:
+            conn.execute('UPDATE users SET password = ? WHERE email = ?', (password, email))
+            conn.commit()
+
+    def username_exists(self, username):
+        with self.pool.connection() as conn:
+            return conn.execute('SELECT 1 FROM users WHERE username = ?', (username,)).fetchone() is not None
+
+    def list_traders(self):
+        with self.pool.connection() as conn:
+            rows = conn.execute('''
+                SELECT username, email, created_at FROM users
+                WHERE role = 'Trader'
+                ORDER BY created_at DESC
+            ''').fetchall()
+        return [{'owner': username, 'username': username, 'email': email, 'created_at': created_at}
+                for username, email, created_at in rows]
+
+    def positions(self, user_id):
+        with self.pool.connection() as conn:
+            rows = conn.execute('''
+                SELECT stock_symbol, quantity, avg_price
+                FROM portfolio
+                WHERE user_id = ?
+            ''', (user_id,)).fetchall()
+        return [(user_id, symbol, quantity, avg_price) for symbol, quantity, avg_price in rows]
+
+    def all_positions(self):
+        with self.pool.connection() as conn:
+            return [row + (None,) for row in conn.execute('''
+                SELECT u.username, p.stock_symbol, p.quantity, p.avg_price
+                FROM portfolio p
+                JOIN users u ON p.user_id = u.id
+                ORDER BY u.username, p.stock_symbol
+            ''')]
+
+    def realized(self, user_id):
+        with self.pool.connection() as conn:
+            return read_realized(conn, user_id)
+
+    def execute_trade(self, user_id, symbol, quantity, price, trade_type):
+        with self.pool.connection() as conn:
+            held, avg_price = execute_trade(conn, user_id, symbol, quantity, price, trade_type, self.method)
+        return (user_id, symbol, held, avg_price) if held else None
+
+    def execute_batch(self, user_id, orders, prices):
+        # All fills in one transaction, positions netted per symbol
+        with self.pool.connection() as conn:
+            return execute_batch(conn, user_id, orders, prices, self.method)
+
+    def trades_page(self, filters, cursor=None, user_id=None, limit=PAGE_SIZE):
+        if not (isinstance(cursor, list) and len(cursor) == 2):
+            cursor = None
+        with self.pool.connection() as conn:
+            return fetch_trades_page(conn, filters, cursor, user_id=user_id, limit=limit)
+
+    def export(self, dataset, filters):
+        columns = SQLITE_EXPORTS[dataset][0]
+        return columns, sqlite_rows(self.pool, dataset, filters)
+
+    def read_stats(self):
+        with self.pool.connection() as conn:
+            return read_stats(conn)
+
+    def reconcile_stats(self):
+        with self.pool.connection() as conn:
+            return reconcile_stats(conn)
+
+    def rebuild_lots(self, method):
+        """Replays the trades table into lots, realized P&L and positions; returns (trades, positions)."""
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('BEGIN IMMEDIATE')
+            try:
+                replayed, positions = rebuild_lots(cursor, method)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        return replayed, positions
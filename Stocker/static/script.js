@@ -63,6 +63,22 @@ function showContent(contentId) {
 }
 
 // Username availability check
+const USERNAME_CHECK_DELAY_MS = 300;
+let usernameCheckTimer = null;
+let usernameCheckController = null;
+const usernameResults = {};
+
+function showUsernameStatus(statusDiv, exists) {
+    if (exists) {
+        statusDiv.textContent = '❌ Username already taken';
+        statusDiv.className = 'username-status username-taken';
+    } else {
+        statusDiv.textContent = '✅ Username available';
+        statusDiv.className = 'username-status username-available';
+    }
+}
+
+// Waits until typing pauses, then checks once; a newer keystroke cancels the pending request
 function checkUsernameAvailability() {
     const usernameInput = document.getElementById('username');
     const statusDiv = document.getElementById('username-status');
@@ -71,62 +87,91 @@ function checkUsernameAvailability() {
     
     const username = usernameInput.value.trim();
     
+    clearTimeout(usernameCheckTimer);
+    if (usernameCheckController) {
+        usernameCheckController.abort();
+        usernameCheckController = null;
+    }
+    
     if (username.length < 3) {
         statusDiv.textContent = '';
         return;
     }
     
-    fetch(`/check_username?username=${encodeURIComponent(username)}`)
-        .then(response => response.json())
-        .then(data => {
-            if (data.exists) {
-                statusDiv.textContent = '❌ Username already taken';
-                statusDiv.className = 'username-status username-taken';
-            } else {
-                statusDiv.textContent = '✅ Username available';
-                statusDiv.className = 'username-status username-available';
-            }
-        })
-        .catch(error => {
-            console.error('Error checking username:', error);
-            statusDiv.textContent = '';
-        });
+    // A name seen taken stays taken; free names are rechecked
+    if (usernameResults[username]) {
+        showUsernameStatus(statusDiv, true);
+        return;
+    }
+    
+    usernameCheckTimer = setTimeout(() => {
+        const controller = new AbortController();
+        usernameCheckController = controller;
+        fetch(`/check_username?username=${encodeURIComponent(username)}`, { signal: controller.signal })
+            .then(response => response.json())
+            .then(data => {
+                usernameResults[username] = data.exists;
+                showUsernameStatus(statusDiv, data.exists);
+            })
+            .catch(error => {
+                if (error.name === 'AbortError') return;
+                console.error('Error checking username:', error);
+                statusDiv.textContent = '';
+            });
+    }, USERNAME_CHECK_DELAY_MS);
 }
 
 // Stock price updates
-async function updateStockPrices() {
-    try {
-        const response = await fetch('/api/stock_prices');
-        const newPrices = await response.json();
-        
-        // Store previous prices for change calculation
-        previousPrices = { ...stockPrices };
-        stockPrices = newPrices;
+let priceSeq = 0;
+let priceStreamStarted = false;
+
+// Merges a full or partial {symbol: price} map into stockPrices and refreshes the page
+function applyStockPrices(changedPrices) {
+    // Store previous prices for change calculation
+    previousPrices = { ...stockPrices };
+    
+    Object.entries(changedPrices).forEach(([symbol, price]) => {
+        price = Number(price);
+        stockPrices[symbol] = price;
         
-        console.log('Stock prices updated:', stockPrices);
+        const priceElement = document.getElementById(`price-${symbol}`);
+        const changeElement = document.getElementById(`change-${symbol}`);
         
-        // Update stock cards
-        Object.entries(newPrices).forEach(([symbol, price]) => {
-            const priceElement = document.getElementById(`price-${symbol}`);
-            const changeElement = document.getElementById(`change-${symbol}`);
+        if (priceElement) {
+            priceElement.textContent = formatCurrency(price);
             
-            if (priceElement) {
-                priceElement.textContent = formatCurrency(price);
-                
-                // Add price change animation
-                priceElement.classList.add('price-updated');
-                setTimeout(() => priceElement.classList.remove('price-updated'), 500);
-            }
-            
-            if (changeElement && previousPrices[symbol]) {
-                const change = ((price - previousPrices[symbol]) / previousPrices[symbol]) * 100;
-                changeElement.textContent = formatPercentage(change);
-                changeElement.className = `stock-change ${change >= 0 ? 'profit' : 'loss'}`;
-            }
-        });
+            // Add price change animation
+            priceElement.classList.add('price-updated');
+            setTimeout(() => priceElement.classList.remove('price-updated'), 500);
+        }
         
-        // Update portfolio values
-        updatePortfolioValues();
+        if (changeElement && previousPrices[symbol]) {
+            const change = ((price - previousPrices[symbol]) / previousPrices[symbol]) * 100;
+            changeElement.textContent = formatPercentage(change);
+            changeElement.className = `stock-change ${change >= 0 ? 'profit' : 'loss'}`;
+        }
+    });
+    
+    // Update portfolio values and trade page market data
+    updatePortfolioValues();
+    updateMarketData();
+}
+
+async function updateStockPrices() {
+    try {
+        // After the first load ask only for symbols changed since the last tick seen;
+        // the full map is served with an ETag so the browser can revalidate it cheaply
+        const url = priceSeq ? `/api/stock_prices?since=${priceSeq}` : '/api/stock_prices';
+        const response = await fetch(url);
+        const data = await response.json();
+        
+        if (priceSeq) {
+            priceSeq = data.seq;
+            applyStockPrices(data.prices);
+        } else {
+            priceSeq = Number(response.headers.get('X-Price-Seq')) || 0;
+            applyStockPrices(data);
+        }
         
         return stockPrices;
         
@@ -136,119 +181,126 @@ async function updateStockPrices() {
     }
 }
 
-// Portfolio value updates
-function updatePortfolioValues() {
-    // Update portfolio table
-    const portfolioRows = document.querySelectorAll('tbody tr');
-    portfolioRows.forEach(row => {
-        const symbolElement = row.querySelector('.stock-symbol');
-        if (!symbolElement) return;
-        
-        const symbol = symbolElement.textContent.trim();
-        if (stockPrices[symbol]) {
-            const currentPrice = stockPrices[symbol];
+// Live prices: subscribe to the SSE stream, falling back to polling
+function startPriceStream(pollInterval = 10000) {
+    if (priceStreamStarted) return;
+    priceStreamStarted = true;
+    
+    function startPolling() {
+        updateStockPrices();
+        setInterval(updateStockPrices, pollInterval);
+    }
+    
+    if (!window.EventSource) {
+        startPolling();
+        return;
+    }
+    
+    const source = new EventSource('/api/stock_prices/stream');
+    let received = false;
+    
+    source.addEventListener('prices', event => {
+        received = true;
+        const data = JSON.parse(event.data);
+        priceSeq = data.seq;
+        applyStockPrices(data.prices);
+    });
+    
+    source.onerror = () => {
+        // EventSource reconnects on its own (resuming from the last event id);
+        // give up on the stream only if it never worked or was closed for good
+        if (!received || source.readyState === EventSource.CLOSED) {
+            source.close();
+            startPolling();
+        }
+    };
+}
+
+// Portfolio value updates: valuation and P&L are computed server-side against
+// one price snapshot, so the page only patches the numbers it is sent
+let valuationInFlight = false;
+let valuationQueued = false;
+
+function formatSignedCurrency(amount) {
+    return (amount >= 0 ? '+' : '-') + formatCurrency(Math.abs(amount));
+}
+
+function setProfitLoss(element, text, value) {
+    if (!element) return;
+    element.textContent = text;
+    element.classList.toggle('profit', value >= 0);
+    element.classList.toggle('loss', value < 0);
+}
+
+async function updatePortfolioValues() {
+    const table = document.querySelector('[data-valuation]');
+    if (!table) return;
+    
+    // The page was rendered at this tick, or a newer valuation is already shown
+    if (priceSeq && priceSeq <= Number(table.dataset.valuationSeq)) return;
+    
+    // One request at a time; ticks arriving meanwhile collapse into one follow-up
+    if (valuationInFlight) {
+        valuationQueued = true;
+        return;
+    }
+    valuationInFlight = true;
+    
+    try {
+        const response = await fetch(table.dataset.valuation);
+        if (response.ok) {
+            applyValuation(table, await response.json());
+        }
+    } catch (error) {
+        console.error('Error updating portfolio values:', error);
+    } finally {
+        valuationInFlight = false;
+        if (valuationQueued) {
+            valuationQueued = false;
+            updatePortfolioValues();
+        }
+    }
+}
+
+function applyValuation(table, data) {
+    table.dataset.valuationSeq = data.seq;
+    
+    const positions = {};
+    (data.positions || []).forEach(position => {
+        positions[`${position.owner}/${position.symbol}`] = position;
+    });
+    
+    table.querySelectorAll('tbody tr[data-owner]').forEach(row => {
+        if (row.dataset.symbol) {
+            const position = positions[`${row.dataset.owner}/${row.dataset.symbol}`];
+            if (!position) return;
             
-            // Update current price displays
             const currentPriceElement = row.querySelector('.current-price');
-            if (currentPriceElement) {
-                currentPriceElement.textContent = formatCurrency(currentPrice);
-            }
-            
-            // Update all current price elements with this symbol
-            const allCurrentPriceElements = document.querySelectorAll(`[id*="current-${symbol}"]`);
-            allCurrentPriceElements.forEach(el => {
-                el.textContent = formatCurrency(currentPrice);
-            });
-            
-            // Update total value
-            const quantityElement = row.querySelector('.quantity');
-            if (quantityElement) {
-                const quantity = parseInt(quantityElement.textContent);
-                const totalValue = quantity * currentPrice;
-                
-                const totalValueElement = row.querySelector('.total-value');
-                if (totalValueElement) {
-                    totalValueElement.textContent = formatCurrency(Math.abs(totalValue));
-                }
-                
-                // Update all total value elements with this symbol
-                const allTotalValueElements = document.querySelectorAll(`[id*="total-${symbol}"]`);
-                allTotalValueElements.forEach(el => {
-                    el.textContent = formatCurrency(totalValue);
-                });
-            }
-            
-            // Update P&L
-            const avgPriceElement = row.querySelector('.avg-price');
-            if (avgPriceElement && quantityElement) {
-                const avgPrice = parseFloat(avgPriceElement.textContent.replace('$', ''));
-                const quantity = parseInt(quantityElement.textContent);
-                const pnlAmount = (currentPrice - avgPrice) * quantity;
-                const pnlPercent = ((currentPrice - avgPrice) / avgPrice) * 100;
-                
-                const pnlAmountElement = row.querySelector('.pnl-amount');
-                if (pnlAmountElement) {
-                    pnlAmountElement.textContent = (pnlAmount >= 0 ? '+' : '') + formatCurrency(Math.abs(pnlAmount));
-                    pnlAmountElement.className = pnlAmountElement.className.replace(/profit|loss/g, '') + (pnlAmount >= 0 ? ' profit' : ' loss');
-                }
-                
-                // Update all P&L elements with this symbol
-                const allPnlAmountElements = document.querySelectorAll(`[id*="pnl-${symbol}"]`);
-                allPnlAmountElements.forEach(el => {
-                    el.textContent = (pnlAmount >= 0 ? '+' : '') + formatCurrency(Math.abs(pnlAmount));
-                    el.className = el.className.replace(/profit|loss/g, '') + (pnlAmount >= 0 ? ' profit' : ' loss');
-                });
-                
-                const pnlPercentElement = row.querySelector('.pnl-percent');
-                if (pnlPercentElement) {
-                    pnlPercentElement.textContent = formatPercentage(pnlPercent);
-                    pnlPercentElement.className = pnlPercentElement.className.replace(/profit|loss/g, '') + (pnlPercent >= 0 ? ' profit' : ' loss');
-                }
-                
-                const pnlPercentElements = document.querySelectorAll(`.pnl-percent`);
-                pnlPercentElements.forEach(el => {
-                    if (el.closest('tr') === row) {
-                        el.textContent = formatPercentage(pnlPercent);
-                        el.className = el.className.replace(/profit|loss/g, '') + (pnlPercent >= 0 ? ' profit' : ' loss');
-                    }
-                });
-            }
+            if (currentPriceElement) currentPriceElement.textContent = formatCurrency(position.price);
+            const totalValueElement = row.querySelector('.total-value');
+            if (totalValueElement) totalValueElement.textContent = formatCurrency(position.market_value);
+            setProfitLoss(row.querySelector('.pnl-amount'), formatSignedCurrency(position.pnl), position.pnl);
+            setProfitLoss(row.querySelector('.pnl-percent'), formatPercentage(position.pnl_percent), position.pnl_percent);
+        } else if (data.users) {
+            // Per-trader totals
+            const totals = data.users[row.dataset.owner];
+            const valueElement = row.querySelector('.portfolio-value');
+            if (valueElement) valueElement.textContent = formatCurrency(totals ? totals.market_value : 0);
         }
     });
     
-    // Update total portfolio stats
-    updateTotalPortfolioStats();
+    updateTotalPortfolioStats(data.total);
 }
 
 // Update total portfolio statistics
-function updateTotalPortfolioStats() {
+function updateTotalPortfolioStats(total) {
     const totalValueElement = document.getElementById('totalValue');
     const totalPnLElement = document.getElementById('totalPnL');
     
-    if (!totalValueElement || !totalPnLElement) return;
+    if (!total || !totalValueElement || !totalPnLElement) return;
     
-    let totalValue = 0;
-    let totalPnL = 0;
-    
-    const portfolioRows = document.querySelectorAll('tbody tr');
-    portfolioRows.forEach(row => {
-        const totalValueCell = row.querySelector('.total-value');
-        const pnlAmountCell = row.querySelector('.pnl-amount');
-        
-        if (totalValueCell) {
-            const value = parseFloat(totalValueCell.textContent.replace(/[$,]/g, ''));
-            if (!isNaN(value)) totalValue += value;
-        }
-        
-        if (pnlAmountCell) {
-            const pnl = parseFloat(pnlAmountCell.textContent.replace(/[$,+]/g, ''));
-            if (!isNaN(pnl)) totalPnL += pnl;
-        }
-    });
-    
-    totalValueElement.textContent = formatCurrency(totalValue);
-    totalPnLElement.textContent = (totalPnL >= 0 ? '+' : '') + formatCurrency(Math.abs(totalPnL));
-    totalPnLElement.className = 'stat-value ' + (totalPnL >= 0 ? 'profit' : 'loss');
+    totalValueElement.textContent = formatCurrency(total.market_value);
+    setProfitLoss(totalPnLElement, formatSignedCurrency(total.pnl), total.pnl);
 }
 
 // Market data updates for trade page
@@ -415,34 +467,6 @@ function selectStock(symbol) {
     }
 }
 
-// History filters
-function initializeHistoryFilters() {
-    const typeFilter = document.getElementById('typeFilter');
-    const stockFilter = document.getElementById('stockFilter');
-    const historyTable = document.getElementById('historyTable');
-    
-    if (!typeFilter || !stockFilter || !historyTable) return;
-    
-    function filterHistory() {
-        const selectedType = typeFilter.value;
-        const selectedStock = stockFilter.value;
-        const rows = historyTable.querySelectorAll('tbody tr');
-        
-        rows.forEach(row => {
-            const rowType = row.dataset.type;
-            const rowStock = row.dataset.stock;
-            
-            const typeMatch = !selectedType || rowType === selectedType;
-            const stockMatch = !selectedStock || rowStock === selectedStock;
-            
-            row.style.display = (typeMatch && stockMatch) ? '' : 'none';
-        });
-    }
-    
-    typeFilter.addEventListener('change', filterHistory);
-    stockFilter.addEventListener('change', filterHistory);
-}
-
 // FAQ toggle functionality
 function toggleFaq(questionElement) {
     const answer = questionElement.nextElementSibling;
@@ -642,8 +666,10 @@ document.addEventListener('DOMContentLoaded', function() {
     }
     window.stockerInitialized = true;
     
-    // Load initial stock prices
-    updateStockPrices();
+    // Load initial stock prices unless the page already subscribed to the stream
+    if (!priceStreamStarted) {
+        updateStockPrices();
+    }
     
     // Username availability check
     const usernameInput = document.getElementById('username');
@@ -664,11 +690,6 @@ document.addEventListener('DOMContentLoaded', function() {
         initializeQuickTrade();
     }
     
-    // Initialize history filters
-    if (document.getElementById('typeFilter')) {
-        initializeHistoryFilters();
-    }
-    
     // Modal close functionality
     window.addEventListener('click', function(event) {
         const modals = document.querySelectorAll('.modal');
@@ -714,6 +735,7 @@ document.addEventListener('DOMContentLoaded', function() {
 // Export functions for global use
 window.showContent = showContent;
 window.updateStockPrices = updateStockPrices;
+window.startPriceStream = startPriceStream;
 window.updatePortfolioValues = updatePortfolioValues;
 window.updateMarketData = updateMarketData;
 window.selectStock = selectStock;
@@ -725,4 +747,3 @@ window.initializeTradeForm = initializeTradeForm;
 window.initializeAdminPortfolio = initializeAdminPortfolio;
 window.initializeAdminHistory = initializeAdminHistory;
 window.initializeAdminManage = initializeAdminManage;
-window.initializeHistoryFilters = initializeHistoryFilters;
\ No newline at end of file
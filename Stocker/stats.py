@@ -0,0 +1,50 @@
+"""Platform statistics for the admin dashboard (SQLite backend).
+
+The ``stats`` table holds one row per counter. Triggers added by
+migration 3 keep it current in the same transaction as every signup and
+trade, so reading the dashboard is a single-row-per-stat lookup instead
+of COUNT/SUM over whole tables. ``reconcile_stats()`` recomputes every
+counter from scratch, e.g. after a bulk import or to clear float drift.
+"""
+
+# stat name -> query that recomputes it from the base tables
+RECOMPUTE_QUERIES = {
+    'traders': "SELECT COUNT(*) FROM users WHERE role = 'Trader'",
+    'trades': 'SELECT COUNT(*) FROM trades',
+    'notional_volume': 'SELECT COALESCE(SUM(qty * price), 0) FROM trades',
+    'cost_basis': 'SELECT COALESCE(SUM(quantity * avg_price), 0) FROM portfolio',
+}
+
+STAT_NAMES = tuple(RECOMPUTE_QUERIES)
+
+UPSERT_STAT = '''
+    INSERT INTO stats (name, value) VALUES (?, ?)
+    ON CONFLICT (name) DO UPDATE SET value = excluded.value
+'''
+
+
+def read_stats(conn):
+    """Returns {stat name: value}, with 0 for any counter not yet recorded."""
+    stats = dict.fromkeys(STAT_NAMES, 0)
+    stats.update(conn.execute('SELECT name, value FROM stats').fetchall())
+    return stats
+
+
+def write_recomputed_stats(cursor):
+    """Recomputes every counter and stores it using ``cursor``'s open transaction."""
+    stats = {name: cursor.execute(sql).fetchone()[0] for name, sql in RECOMPUTE_QUERIES.items()}
+    cursor.executemany(UPSERT_STAT, stats.items())
+    return stats
+
+
+def reconcile_stats(conn):
+    """Recomputes every counter from the base tables and returns the new values."""
+    cursor = conn.cursor()
+    cursor.execute('BEGIN IMMEDIATE')
+    try:
+        stats = write_recomputed_stats(cursor)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return stats
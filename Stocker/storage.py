@@ -0,0 +1,327 @@
+"""Storage backends for the web app.
+
+The views in views.py read and write everything through one Storage
+object. The same routes therefore run against SQLite
+(sqlite_storage.py), DynamoDB (dynamo_storage.py) or ``MemoryStorage``
+below. The in-memory backend does no I/O at all, which makes it the
+baseline when load testing the other two.
+
+Every backend returns the same shapes, holding plain ints, floats and
+strings:
+
+* a user is a dict with ``id``, ``username``, ``email``, ``password``,
+  ``role`` and ``created_at``. ``id`` is what the session keeps and what
+  a user's positions and trades are keyed by;
+* a position is an (owner, symbol, quantity, avg_price) tuple, as
+  valuation.py expects;
+* a page of one user's trades holds (symbol, qty, price, type, timestamp,
+  id) rows. A page across all users holds (user, symbol, qty, price, type,
+  timestamp, id) rows.
+
+Every backend rejects sells of shares the user does not hold. SQLite and
+memory also track open lots and realized P&L.
+"""
+import bisect
+import itertools
+import threading
+from datetime import datetime, timezone
+
+from lots import FIFO, average_cost, fill_lots
+from stats import STAT_NAMES
+from trade_history import PAGE_SIZE, encode_cursor, timestamp_bounds
+from trading import parse_order, validate_order, validate_sell
+
+# dataset -> exported columns, for backends without their own layout
+EXPORT_COLUMNS = {
+    'trades': ('id', 'username', 'stock_symbol', 'qty', 'price', 'type', 'timestamp'),
+    'portfolio': ('username', 'stock_symbol', 'quantity', 'avg_price'),
+}
+
+
+class Storage:
+    """What the views need from a backend. Subclasses implement every method that raises."""
+
+    # Name shown by the load-test benchmark
+    name = 'storage'
+
+    def init(self):
+        """Creates or migrates the schema."""
+
+    def start(self):
+        """Starts background workers, once per process."""
+
+    def close(self):
+        """Stops background workers and releases connections."""
+
+    # Users
+
+    def create_user(self, username, email, password, role):
+        """Adds a user with an already hashed password; returns False if the username or email is taken."""
+        raise NotImplementedError
+
+    def find_user(self, email):
+        """Returns the user with ``email``, or None."""
+        raise NotImplementedError
+
+    def set_password(self, email, password):
+        """Replaces the user's stored password hash, e.g. after a rehash at login."""
+        raise NotImplementedError
+
+    def username_exists(self, username):
+        raise NotImplementedError
+
+    def list_traders(self):
+        """Returns every trader, newest first, as dicts with owner, username, email and created_at.
+
+        ``owner`` matches the owner of the trader's positions in ``all_positions()``.
+        """
+        raise NotImplementedError
+
+    # Portfolio
+
+    def positions(self, user_id):
+        """Returns the user's positions."""
+        raise NotImplementedError
+
+    def all_positions(self):
+        """Returns every user's positions ordered by owner and symbol.
+
+        Each position has a fifth element: when it last changed, or None
+        if the backend does not record that.
+        """
+        raise NotImplementedError
+
+    def realized(self, user_id):
+        """Returns {symbol: (closed quantity, realized P&L)}, or None if the backend does not track it."""
+        return None
+
+    # Trades
+
+    def execute_trade(self, user_id, symbol, quantity, price, trade_type):
+        """Records a trade and applies it to the user's position atomically.
+
+        Returns the position after the trade, or None if it was closed.
+        Raises ValueError if the backend rejects the order.
+        """
+        raise NotImplementedError
+
+    def execute_batch(self, user_id, orders, prices):
+        """Executes JSON orders against one {symbol: price} map.
+
+        Returns one result dict per order, in submission order. By
+        default each order is executed on its own; backends that can
+        write a batch in one transaction override this. An order the
+        backend fails to write, e.g. a DynamoDB trade that runs out of
+        re-plans, gets status 'error' and the batch carries on, since
+        the orders before it are already written.
+        """
+        results = []
+        for index, order in enumerate(orders):
+            try:
+                symbol, quantity, trade_type = parse_order(order)
+                validate_order(symbol, quantity, trade_type, prices)
+                self.execute_trade(user_id, symbol, quantity, prices[symbol], trade_type)
+            except ValueError as e:
+                results.append({'index': index, 'status': 'rejected', 'error': str(e)})
+                continue
+            except Exception as e:
+                print(f"Error executing batch order {index}: {e}")
+                results.append({'index': index, 'status': 'error', 'error': str(e)})
+                continue
+            results.append({'index': index, 'status': 'filled', 'stock_symbol': symbol,
+                            'trade_type': trade_type, 'quantity': quantity, 'price': prices[symbol]})
+        return results
+
+    def trades_page(self, filters, cursor=None, user_id=None, limit=PAGE_SIZE):
+        """Returns (rows, next_cursor) for one newest-first page of trades.
+
+        ``cursor`` is a decoded cursor from a previous page; with
+        ``user_id`` only that user's trades are returned. Rows end with
+        the timestamp and the trade id, as described at the top of this
+        module.
+        """
+        raise NotImplementedError
+
+    def export(self, dataset, filters):
+        """Returns (columns, rows) of the 'trades' or 'portfolio' dataset.
+
+        ``rows`` is an iterator of tuples. The trades are oldest first
+        and restricted to the history ``filters``.
+        """
+        raise NotImplementedError
+
+    # Admin statistics
+
+    def read_stats(self):
+        """Returns {stat name: value} for the admin dashboard."""
+        raise NotImplementedError
+
+    def reconcile_stats(self):
+        """Recomputes the admin dashboard counters from scratch and returns them."""
+        raise NotImplementedError
+
+    # Prices
+
+    def write_prices(self, prices):
+        """Stores one tick of {symbol: price}; a no-op for backends that keep no quotes."""
+
+
+def utc_timestamp():
+    """Returns the current UTC time the way SQLite's CURRENT_TIMESTAMP writes it."""
+    return datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _matches(trade, filters, lower, upper):
+    return (trade['stock_symbol'] == filters.get('symbol', trade['stock_symbol'])
+            and trade['type'] == filters.get('type', trade['type'])
+            and (lower is None or trade['timestamp'] >= lower)
+            and (upper is None or trade['timestamp'] < upper))
+
+
+class MemoryStorage(Storage):
+    """Keeps everything in dicts and lists, with the same trading rules as SQLite.
+
+    Positions follow their open lots (see lots.py), so realized P&L is
+    available as with SQLite. One lock serializes writes. Nothing
+    survives a restart.
+    """
+
+    name = 'memory'
+
+    def __init__(self, method=FIFO):
+        self.method = method
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._users = {}        # email -> user
+        self._usernames = {}    # username -> user
+        self._by_id = {}        # id -> user
+        self._lots = {}         # user id -> {symbol: [[id, quantity, price], ...]}
+        self._realized = {}     # user id -> {symbol: (closed quantity, realized)}
+        self._trades = []       # oldest first; ids increase with time
+        self._user_trades = {}  # user id -> that user's trades, oldest first
+        self._stats = dict.fromkeys(STAT_NAMES, 0)
+
+    def create_user(self, username, email, password, role):
+        with self._lock:
+            if email in self._users or username in self._usernames:
+                return False
+            user = {'id': next(self._ids), 'username': username, 'email': email, 'password': password,
+                    'role': role, 'created_at': utc_timestamp()}
+            self._users[email] = self._usernames[username] = self._by_id[user['id']] = user
+            if role == 'Trader':
+                self._stats['traders'] += 1
+        return True
+
+    def find_user(self, email):
+        user = self._users.get(email)
+        return dict(user) if user else None
+
+    def set_password(self, email, password):
+        with self._lock:
+            self._users[email]['password'] = password
+
+    def username_exists(self, username):
+        return username in self._usernames
+
+    def list_traders(self):
+        traders = [u for u in list(self._users.values()) if u['role'] == 'Trader']
+        return [{'owner': u['username'], 'username': u['username'], 'email': u['email'],
+                 'created_at': u['created_at']}
+                for u in sorted(traders, key=lambda u: u['id'], reverse=True)]
+
+    def positions(self, user_id):
+        with self._lock:
+            book = self._lots.get(user_id, {})
+            return [(user_id, symbol, *average_cost(book[symbol])) for symbol in sorted(book)]
+
+    def all_positions(self):
+        with self._lock:
+            rows = [(self._by_id[owner]['username'], symbol, *average_cost(lots), None)
+                    for owner, book in self._lots.items() for symbol, lots in book.items()]
+        return sorted(rows, key=lambda p: (p[0], p[1]))
+
+    def realized(self, user_id):
+        with self._lock:
+            return dict(self._realized.get(user_id, {}))
+
+    def execute_trade(self, user_id, symbol, quantity, price, trade_type):
+        with self._lock:
+            if trade_type == 'SELL':
+                lots = self._lots.get(user_id, {}).get(symbol, [])
+                validate_sell(symbol, quantity, sum(q for _, q, _ in lots))
+            trade = self._record(user_id, symbol, quantity, price, trade_type)
+            return self._fill(user_id, symbol, quantity if trade_type == 'BUY' else -quantity,
+                              trade['price'])
+
+    def trades_page(self, filters, cursor=None, user_id=None, limit=PAGE_SIZE):
+        trades = self._trades if user_id is None else self._user_trades.get(user_id, [])
+        end = len(trades)
+        if isinstance(cursor, list) and len(cursor) == 2:
+            end = bisect.bisect_left(trades, cursor[1], hi=end, key=lambda t: t['id'])
+        lower, upper = timestamp_bounds(filters)
+        rows = []
+        for i in range(end - 1, -1, -1):
+            trade = trades[i]
+            if _matches(trade, filters, lower, upper):
+                rows.append(trade)
+                if len(rows) > limit:
+                    break
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor([rows[-1]['timestamp'], rows[-1]['id']])
+        if user_id is None:
+            return [(self._by_id[t['user_id']]['username'], t['stock_symbol'], t['qty'], t['price'],
+                     t['type'], t['timestamp'], t['id']) for t in rows], next_cursor
+        return [(t['stock_symbol'], t['qty'], t['price'], t['type'], t['timestamp'], t['id'])
+                for t in rows], next_cursor
+
+    def export(self, dataset, filters):
+        columns = EXPORT_COLUMNS[dataset]
+        if dataset == 'portfolio':
+            return columns, (p[:4] for p in self.all_positions())
+        lower, upper = timestamp_bounds(filters)
+        rows = ((t['id'], self._by_id[t['user_id']]['username'], t['stock_symbol'], t['qty'], t['price'],
+                 t['type'], t['timestamp'])
+                for t in list(self._trades) if _matches(t, filters, lower, upper))
+        return columns, rows
+
+    def read_stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+    def reconcile_stats(self):
+        with self._lock:
+            self._stats = {
+                'traders': sum(1 for u in self._users.values() if u['role'] == 'Trader'),
+                'trades': len(self._trades),
+                'notional_volume': sum(t['qty'] * t['price'] for t in self._trades),
+                'cost_basis': sum(q * p for book in self._lots.values() for lots in book.values()
+                                  for _, q, p in lots),
+            }
+            return dict(self._stats)
+
+    def _record(self, user_id, symbol, quantity, price, trade_type):
+        trade = {'id': len(self._trades) + 1, 'user_id': user_id, 'stock_symbol': symbol, 'qty': quantity,
+                 'price': price, 'type': trade_type, 'timestamp': utc_timestamp()}
+        self._trades.append(trade)
+        self._user_trades.setdefault(user_id, []).append(trade)
+        self._stats['trades'] += 1
+        self._stats['notional_volume'] += quantity * price
+        return trade
+
+    def _fill(self, user_id, symbol, delta, price):
+        book = self._lots.setdefault(user_id, {})
+        lots = book.setdefault(symbol, [])
+        cost_before = sum(q * p for _, q, p in lots)
+        closed, realized = fill_lots(lots, delta, price, self.method)
+        self._stats['cost_basis'] += sum(q * p for _, q, p in lots) - cost_before
+        if closed:
+            totals = self._realized.setdefault(user_id, {})
+            before = totals.get(symbol, (0, 0.0))
+            totals[symbol] = (before[0] + closed, before[1] + realized)
+        if not lots:
+            del book[symbol]
+            return None
+        return (user_id, symbol, *average_cost(lots))
@@ -0,0 +1,71 @@
+"""Shared test setup.
+
+The app modules live flat in the package directory, as the apps import
+them. Run the suite from there:
+
+    pip install -r requirements-dev.txt
+    python -m pytest -q
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import pytest  # noqa: E402
+
+from market import Market  # noqa: E402
+from passwords import PasswordHasher  # noqa: E402
+from storage import MemoryStorage  # noqa: E402
+from views import Stocker, create_app  # noqa: E402
+
+SYMBOLS = ['AAPL', 'MSFT', 'TSLA']
+
+
+@pytest.fixture
+def make_app(tmp_path):
+    """Returns a function building a Flask app over ``storage`` (in memory by default) with seeded prices."""
+    def make(storage=None, **stocker_args):
+        storage = MemoryStorage() if storage is None else storage
+        market = Market(SYMBOLS, str(tmp_path / f'ticks-{storage.name}'), seed=1)
+        storage.init()
+        market.publish()
+        # The cheapest scrypt cost, so signups and logins stay fast
+        stocker_args.setdefault('passwords', PasswordHasher(n=2, r=1, p=1))
+        return create_app(Stocker(storage, market, **stocker_args), 'test')
+    return make
+
+
+@pytest.fixture
+def dynamodb(monkeypatch):
+    """Returns a boto3 DynamoDB resource backed by moto's in-process mock."""
+    boto3 = pytest.importorskip('boto3')
+    moto = pytest.importorskip('moto')
+    for name in ('AWS_ACCESS_KEY_ID', 'AWS_SECRET_ACCESS_KEY', 'AWS_SESSION_TOKEN'):
+        monkeypatch.setenv(name, 'testing')
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+    with moto.mock_aws():
+        yield boto3.resource('dynamodb', region_name='us-east-1')
+
+
+@pytest.fixture
+def dynamo_storage(dynamodb):
+    """Returns a DynamoStorage on the mocked ``dynamodb``, with its tables created."""
+    from dynamo_storage import DynamoStorage
+    storage = DynamoStorage(dynamodb)
+    storage.init()
+    return storage
+
+
+def count_calls(table, operation):
+    """Returns a list that grows by one on every ``operation`` (e.g. 'Query') ``table``'s client makes."""
+    calls = []
+    table.meta.client.meta.events.register(f'before-call.dynamodb.{operation}', lambda **kwargs: calls.append(1))
+    return calls
+
+
+def login(client, name='trader', role='Trader', password='pw'):
+    """Signs ``name`` up and logs them in on ``client``; returns the client."""
+    email = f'{name}@example.com'
+    client.post('/signup', data={'username': name, 'email': email, 'password': password, 'role': role})
+    client.post('/login', data={'email': email, 'password': password, 'role': role})
+    return client
@@ -0,0 +1,84 @@
+import os
+import subprocess
+import sys
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from app_factory import Lazy, Services
+from conftest import SYMBOLS
+from market import Market
+from passwords import PasswordHasher
+from storage import MemoryStorage
+from views import Stocker, create_app
+
+PACKAGE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+def test_services_start_once_across_threads():
+    calls = []
+    services = Services(lambda: calls.append('storage'), lambda: calls.append('market'))
+    ready = threading.Barrier(8)
+    results = []
+
+    def start():
+        ready.wait()
+        results.append(services.start())
+
+    threads = [threading.Thread(target=start) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert calls == ['storage', 'market']
+    assert sorted(results) == [False] * 7 + [True]
+    assert services.started
+
+
+def test_app_factory_starts_services_once_per_process(tmp_path):
+    storage = MemoryStorage()
+    market = Market(SYMBOLS, str(tmp_path / 'ticks'))
+    started = []
+    storage.start = lambda: started.append('storage')
+    market.start = lambda: started.append('market')
+    stocker = Stocker(storage, market, passwords=PasswordHasher(n=2, r=1, p=1))
+
+    create_app(stocker, 'test')
+    assert started == []
+
+    # e.g. a WSGI server building the app per worker thread, or a reloader
+    create_app(stocker, 'test', start_services=True)
+    create_app(stocker, 'test', start_services=True)
+    assert not stocker.start_services()
+    assert started == ['storage', 'market']
+
+
+def test_lazy_creates_its_object_once_on_first_use():
+    created = []
+    lazy = Lazy(lambda: created.append(1) or SimpleNamespace(name='table'))
+    assert not lazy.created
+    assert repr(lazy) == '<Lazy (not created)>'
+
+    assert lazy.name == 'table'
+    assert lazy.get() is lazy.get()
+    assert created == [1]
+
+
+@pytest.mark.parametrize('module', ['app', 'aws_app'])
+def test_importing_an_app_starts_nothing(tmp_path, module):
+    if module == 'aws_app':
+        pytest.importorskip('boto3')
+    script = (f'import threading, {module}; '
+              f'assert {module}.app.name; '
+              'print(threading.active_count())')
+    env = dict(os.environ, PYTHONPATH=PACKAGE_DIR, AWS_DEFAULT_REGION='us-east-1')
+
+    result = subprocess.run([sys.executable, '-c', script], cwd=tmp_path, env=env,
+                            capture_output=True, text=True, timeout=60)
+
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.split()[-1] == '1'
+    # No database file, tick store or other state on disk
+    assert os.listdir(tmp_path) == []
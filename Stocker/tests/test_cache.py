@@ -0,0 +1,85 @@
+import pytest
+
+import cache
+from cache import PortfolioCache
+
+USER = 1
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(cache, 'time', clock)
+    return clock
+
+
+class Positions:
+    """Stands in for storage another process also trades against; counts loads."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.loads = 0
+
+    def load(self):
+        self.loads += 1
+        return list(self.rows)
+
+
+def test_entries_are_reloaded_once_the_ttl_passes(clock):
+    portfolio = PortfolioCache(symbol_of=lambda row: row[0], ttl=2.0)
+    storage = Positions([('AAPL', 10)])
+    assert portfolio.get(USER, storage.load) == [('AAPL', 10)]
+
+    # Another worker trades; this one serves its cached rows until the TTL is up
+    storage.rows = [('AAPL', 15)]
+    clock.now += 1.9
+    assert portfolio.get(USER, storage.load) == [('AAPL', 10)]
+    clock.now += 0.1
+    assert portfolio.get(USER, storage.load) == [('AAPL', 15)]
+
+    assert storage.loads == 2
+    assert portfolio.stats()['expirations'] == 1
+
+
+def test_write_through_does_not_extend_the_ttl(clock):
+    portfolio = PortfolioCache(symbol_of=lambda row: row[0], ttl=2.0)
+    storage = Positions([('AAPL', 10)])
+    portfolio.get(USER, storage.load)
+
+    clock.now += 1.5
+    with portfolio.writing(USER):
+        portfolio.set_position(USER, 'MSFT', ('MSFT', 5))
+    assert portfolio.get(USER, storage.load) == [('AAPL', 10), ('MSFT', 5)]
+
+    clock.now += 0.5
+    assert portfolio.get(USER, storage.load) == [('AAPL', 10)]
+    assert storage.loads == 2
+
+
+def test_entries_never_expire_without_a_ttl(clock):
+    portfolio = PortfolioCache(symbol_of=lambda row: row[0])
+    storage = Positions([('AAPL', 10)])
+    portfolio.get(USER, storage.load)
+
+    clock.now += 10 ** 6
+
+    assert portfolio.get(USER, storage.load) == [('AAPL', 10)]
+    assert storage.loads == 1
+    assert portfolio.stats()['expirations'] == 0
+
+
+def test_expired_entries_are_dropped_with_the_lru_ones(clock):
+    portfolio = PortfolioCache(maxsize=1, symbol_of=lambda row: row[0], ttl=2.0)
+    portfolio.get(1, Positions([('AAPL', 1)]).load)
+    portfolio.get(2, Positions([('MSFT', 2)]).load)
+
+    assert portfolio.stats()['evictions'] == 1
+    assert portfolio._expires.keys() == {2}
@@ -0,0 +1,56 @@
+import queue
+import threading
+
+import pytest
+
+from db import ConnectionPool
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = ConnectionPool(str(tmp_path / 'pool.db'), size=2)
+    yield pool
+    pool.close()
+
+
+def test_connections_are_tuned(pool):
+    with pool.connection() as conn:
+        assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+        assert conn.execute('PRAGMA busy_timeout').fetchone()[0] == 5000
+
+
+def test_pool_never_opens_more_than_its_size(pool):
+    first, second = pool.acquire(), pool.acquire()
+    with pytest.raises(queue.Empty):
+        pool.acquire(timeout=0.05)
+
+    pool.release(first)
+    assert pool.acquire(timeout=0.05) is first
+    pool.release(first)
+    pool.release(second)
+
+
+def test_waiting_thread_gets_the_released_connection(pool):
+    held = [pool.acquire(), pool.acquire()]
+    got = []
+    waiter = threading.Thread(target=lambda: got.append(pool.acquire(timeout=2)))
+    waiter.start()
+    pool.release(held[0])
+    waiter.join()
+
+    assert got == [held[0]]
+    pool.release(held[0])
+    pool.release(held[1])
+
+
+def test_release_rolls_back_an_unfinished_transaction(pool):
+    with pool.connection() as conn:
+        conn.execute('CREATE TABLE t (x INTEGER)')
+        conn.commit()
+    with pool.connection() as conn:
+        conn.execute('INSERT INTO t VALUES (1)')
+        assert conn.in_transaction
+
+    with pool.connection() as conn:
+        assert not conn.in_transaction
+        assert conn.execute('SELECT COUNT(*) FROM t').fetchone()[0] == 0
@@ -0,0 +1,46 @@
+import pytest
+
+boto3 = pytest.importorskip('boto3')
+moto = pytest.importorskip('moto')
+
+from dynamo_scan import iter_scan, scan_table  # noqa: E402
+
+ITEMS = 500
+
+
+@pytest.fixture
+def table(monkeypatch):
+    for name in ('AWS_ACCESS_KEY_ID', 'AWS_SECRET_ACCESS_KEY', 'AWS_SESSION_TOKEN'):
+        monkeypatch.setenv(name, 'testing')
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+    with moto.mock_aws():
+        dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
+        table = dynamodb.create_table(
+            TableName='scan_test',
+            KeySchema=[{'AttributeName': 'id', 'KeyType': 'HASH'}],
+            AttributeDefinitions=[{'AttributeName': 'id', 'AttributeType': 'S'}],
+            BillingMode='PAY_PER_REQUEST',
+        )
+        with table.batch_writer() as batch:
+            for i in range(ITEMS):
+                batch.put_item(Item={'id': f'item-{i:04d}', 'n': i, 'timestamp': 'x' * 20, 'extra': 'y'})
+        yield table
+
+
+def test_iter_scan_follows_pagination(table):
+    calls = []
+    table.meta.client.meta.events.register('before-call.dynamodb.Scan', lambda **kwargs: calls.append(1))
+
+    items = list(iter_scan(table, Limit=13))
+
+    assert sorted(item['n'] for item in items) == list(range(ITEMS))
+    assert len(calls) >= ITEMS // 13
+
+
+@pytest.mark.parametrize('segments', [1, 4, 7])
+def test_scan_table_reads_every_segment(table, segments):
+    items = scan_table(table, ['id', 'timestamp'], segments=segments, Limit=13)
+
+    assert sorted(item['id'] for item in items) == [f'item-{i:04d}' for i in range(ITEMS)]
+    # Only the projected attributes, including the reserved word ``timestamp``
+    assert all(set(item) == {'id', 'timestamp'} for item in items)
@@ -0,0 +1,130 @@
+import threading
+from decimal import Decimal
+
+import pytest
+
+boto3 = pytest.importorskip('boto3')
+moto = pytest.importorskip('moto')
+
+import dynamo_trading  # noqa: E402
+from conftest import count_calls  # noqa: E402
+from dynamo_storage import TRADE_RECORD_TYPE  # noqa: E402
+from dynamo_trading import MAX_ATTEMPTS, execute_trade  # noqa: E402
+
+USER = 'trader@example.com'
+
+
+class RacingTable:
+    """Wraps the portfolio table, calling ``on_read(reads)`` after each read of a position.
+
+    Its client serializes TransactWriteItems as DynamoDB does, since moto's
+    in-process backend does not.
+    """
+
+    def __init__(self, table, on_read):
+        self.table = table
+        self.on_read = on_read
+        self.name = table.name
+        self.reads = 0
+        self._lock = threading.Lock()
+        self.meta = type('Meta', (), {'client': LockedClient(table.meta.client)})()
+
+    def get_item(self, **kwargs):
+        response = self.table.get_item(**kwargs)
+        with self._lock:
+            self.reads += 1
+            reads = self.reads
+        self.on_read(reads)
+        return response
+
+
+class LockedClient:
+    def __init__(self, client):
+        self.client = client
+        self.lock = threading.Lock()
+
+    def transact_write_items(self, **kwargs):
+        with self.lock:
+            return self.client.transact_write_items(**kwargs)
+
+
+@pytest.fixture
+def tables(dynamo_storage, monkeypatch):
+    monkeypatch.setattr(dynamo_trading, 'RETRY_DELAY', 0)
+    return dynamo_storage.transactions_table.get(), dynamo_storage.portfolio_table.get()
+
+
+def trade(tables, portfolio, quantity, price, trade_type, symbol='AAPL'):
+    return execute_trade(tables[0], portfolio, USER, symbol, Decimal(quantity), Decimal(price),
+                         trade_type, TRADE_RECORD_TYPE)
+
+
+def position(tables, symbol='AAPL'):
+    return tables[1].get_item(Key={'user_id': USER, 'stock_symbol': symbol}, ConsistentRead=True).get('Item')
+
+
+def trade_records(tables):
+    return tables[0].scan()['Items']
+
+
+def test_concurrent_oversells_fill_exactly_one(tables):
+    trade(tables, tables[1], 10, '100.00', 'BUY')
+    # Both sells read the 10 shares before either writes
+    both_read = threading.Barrier(2, timeout=5)
+    portfolio = RacingTable(tables[1], lambda reads: both_read.wait() if reads <= 2 else None)
+    outcomes = []
+
+    def sell():
+        try:
+            trade(tables, portfolio, 7, '110.00', 'SELL')
+            outcomes.append('filled')
+        except ValueError as e:
+            outcomes.append(str(e))
+
+    threads = [threading.Thread(target=sell) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert outcomes.count('filled') == 1
+    assert outcomes.count('You only own 3 shares of AAPL. Cannot sell more than you own.') == 1
+    assert position(tables)['quantity'] == 3
+    assert sorted(t['type'] for t in trade_records(tables)) == ['BUY', 'SELL']
+
+
+def test_buy_replans_when_the_position_changes_under_it(tables):
+    trade(tables, tables[1], 10, '100.00', 'BUY')
+
+    def interleave(reads):
+        # Another buy lands between this trade's read and its write
+        if reads == 1:
+            trade(tables, tables[1], 10, '200.00', 'BUY')
+
+    portfolio = RacingTable(tables[1], interleave)
+    transactions = count_calls(tables[1], 'TransactWriteItems')
+
+    _, after, cost_basis_delta = trade(tables, portfolio, 20, '50.00', 'BUY')
+
+    # The other buy, the cancelled write planned from the stale read, and
+    # the write re-planned from a fresh one
+    assert portfolio.reads == 2
+    assert len(transactions) == 3
+    assert position(tables)['quantity'] == after['quantity'] == 40
+    assert position(tables)['avg_price'] == after['avg_price'] == Decimal('100.00')
+    assert cost_basis_delta == Decimal('1000.00')
+    assert len(trade_records(tables)) == 3
+
+
+def test_trade_gives_up_once_replans_run_out(tables):
+    trade(tables, tables[1], 10, '100.00', 'BUY')
+    # Every read is followed by a competing buy, so every write is cancelled
+    portfolio = RacingTable(tables[1], lambda reads: trade(tables, tables[1], 1, '100.00', 'BUY'))
+
+    with pytest.raises(RuntimeError, match='kept changing'):
+        trade(tables, portfolio, 5, '100.00', 'BUY')
+
+    assert portfolio.reads == MAX_ATTEMPTS
+    assert position(tables)['quantity'] == 10 + MAX_ATTEMPTS
+    assert [t['type'] for t in trade_records(tables)] == ['BUY'] * (1 + MAX_ATTEMPTS)
+
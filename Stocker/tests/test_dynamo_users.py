@@ -0,0 +1,59 @@
+import pytest
+
+boto3 = pytest.importorskip('boto3')
+moto = pytest.importorskip('moto')
+
+import dynamo_storage as dynamo_module  # noqa: E402
+from conftest import count_calls  # noqa: E402
+from dynamo_storage import USERNAME_INDEX, USERS_TABLE, DynamoStorage  # noqa: E402
+
+
+def test_username_lookups_query_the_index_once(dynamo_storage):
+    queries = count_calls(dynamo_storage.users_table, 'Query')
+    scans = count_calls(dynamo_storage.users_table, 'Scan')
+    assert dynamo_storage.create_user('alice', 'alice@example.com', 'x', 'Trader')
+
+    assert dynamo_storage.username_exists('alice')
+    assert dynamo_storage.username_exists('alice')
+
+    # The signup's own check missed; the created name is then cached as taken
+    assert len(queries) == 1
+    assert scans == []
+
+
+def test_taken_username_is_rejected_for_another_email(dynamo_storage):
+    assert dynamo_storage.create_user('alice', 'alice@example.com', 'x', 'Trader')
+    dynamo_storage.username_cache.clear()
+
+    assert not dynamo_storage.create_user('alice', 'other@example.com', 'x', 'Trader')
+    assert dynamo_storage.find_user('other@example.com') is None
+
+
+def test_free_username_is_cached_briefly(dynamo_storage):
+    queries = count_calls(dynamo_storage.users_table, 'Query')
+
+    assert not dynamo_storage.username_exists('bob')
+    assert not dynamo_storage.username_exists('bob')
+    assert len(queries) == 1
+
+
+def test_free_username_is_rechecked_once_its_ttl_passes(dynamo_storage, monkeypatch):
+    monkeypatch.setattr(dynamo_module, 'USERNAME_FREE_TTL', 0)
+    assert not dynamo_storage.username_exists('bob')
+
+    # Claimed through another process, which this one's cache never saw
+    dynamo_storage.users_table.put_item(Item={'email': 'bob@example.com', 'username': 'bob',
+                                              'password': 'x', 'role': 'Trader'})
+
+    assert dynamo_storage.username_exists('bob')
+
+
+def test_init_adds_the_username_index_to_an_old_table(dynamodb):
+    dynamodb.create_table(TableName=USERS_TABLE, BillingMode='PAY_PER_REQUEST',
+                          KeySchema=[{'AttributeName': 'email', 'KeyType': 'HASH'}],
+                          AttributeDefinitions=[{'AttributeName': 'email', 'AttributeType': 'S'}])
+
+    DynamoStorage(dynamodb).init()
+
+    indexes = dynamodb.Table(USERS_TABLE).global_secondary_indexes or []
+    assert USERNAME_INDEX in [index['IndexName'] for index in indexes]
@@ -0,0 +1,88 @@
+import csv
+import io
+import json
+import sqlite3
+import tracemalloc
+
+import pytest
+
+import exports
+from db import ConnectionPool
+from exports import CHUNK_SIZE, FETCH_SIZE, iter_rows, sqlite_export
+from migrations import migrate
+
+ROWS = 20_000
+# Python heap an export may allocate while streaming, whatever the row
+# count; fetchall() of ROWS trades alone allocates over 7 MB
+PEAK_LIMIT = 2 * 1024 * 1024
+
+
+@pytest.fixture
+def pool(tmp_path):
+    path = str(tmp_path / 'export.db')
+    conn = sqlite3.connect(path)
+    migrate(conn)
+    conn.execute("INSERT INTO users (username, email, password, role) VALUES ('trader', 't@x', 'p', 'Trader')")
+    conn.executemany('''
+        INSERT INTO trades (user_id, stock_symbol, qty, price, type, timestamp)
+        VALUES (1, ?, ?, 101.25, ?, ?)
+    ''', ((('AAPL', 'MSFT')[i % 2], i % 100 + 1, ('BUY', 'SELL')[i % 2], f'2024-01-01 00:00:{i:08d}')
+          for i in range(ROWS)))
+    conn.commit()
+    conn.close()
+    pool = ConnectionPool(path, size=1)
+    yield pool
+    pool.close()
+
+
+class RecordingCursor:
+    def __init__(self, rows):
+        self.rows = rows
+        self.sizes = []
+
+    def fetchmany(self, size):
+        self.sizes.append(size)
+        batch, self.rows = self.rows[:size], self.rows[size:]
+        return batch
+
+    def fetchall(self):
+        raise AssertionError('exports must not fetch every row at once')
+
+
+def test_iter_rows_fetches_in_batches():
+    cursor = RecordingCursor([(i,) for i in range(FETCH_SIZE * 2 + 1)])
+
+    assert list(iter_rows(cursor)) == [(i,) for i in range(FETCH_SIZE * 2 + 1)]
+    assert cursor.sizes == [FETCH_SIZE] * 4
+
+
+@pytest.mark.parametrize('fmt', ['csv', 'ndjson'])
+def test_streaming_export_peak_memory_is_bounded(pool, fmt):
+    size = 0
+    chunks = 0
+    tracemalloc.start()
+    try:
+        for chunk in sqlite_export(pool, 'trades', fmt):
+            assert len(chunk) < CHUNK_SIZE + 1024
+            size += len(chunk)
+            chunks += 1
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert size > ROWS * 40
+    assert chunks > size // CHUNK_SIZE
+    assert peak < PEAK_LIMIT, f'{fmt} export peaked at {peak / 1e6:.1f} MB'
+
+
+def test_export_rows_match_the_table(pool, monkeypatch):
+    monkeypatch.setattr(exports, 'CHUNK_SIZE', 1024)
+    csv_rows = list(csv.reader(io.StringIO(''.join(sqlite_export(pool, 'trades', 'csv',
+                                                                 {'symbol': 'AAPL', 'type': 'BUY'})))))
+    ndjson = [json.loads(line) for line in ''.join(sqlite_export(pool, 'trades', 'ndjson')).splitlines()]
+
+    assert csv_rows[0] == list(exports.SQLITE_EXPORTS['trades'][0])
+    assert len(csv_rows) == ROWS // 2 + 1
+    assert {(row[2], row[5]) for row in csv_rows[1:]} == {('AAPL', 'BUY')}
+    assert len(ndjson) == ROWS
+    assert [row['id'] for row in ndjson] == list(range(1, ROWS + 1))
@@ -0,0 +1,62 @@
+import json
+
+from conftest import login
+from metrics import (SlowRequestProfiler, TrackedStream, begin_request, current_request, detach_request,
+                     record_db_query)
+
+
+def test_streamed_body_counts_toward_its_request():
+    def body():
+        for chunk in ('a', 'b'):
+            record_db_query(0.001)
+            yield chunk
+
+    begin_request('export')
+    stats = detach_request()
+    finished = []
+    stream = TrackedStream(body(), stats, finished.append)
+
+    assert list(stream) == ['a', 'b']
+    assert stats.db_queries == 2
+    assert finished == [stats]
+    # Nothing is left attached to the thread between or after chunks
+    assert current_request() is None
+
+
+def test_closing_an_unread_stream_finishes_its_request_once():
+    closed = []
+
+    def body():
+        try:
+            yield 'a'
+        finally:
+            closed.append(current_request())
+
+    stats = begin_request('stream')
+    detach_request()
+    finished = []
+    stream = TrackedStream(body(), stats, finished.append)
+
+    assert next(stream) == 'a'
+    stream.close()
+    stream.close()
+    assert closed == [stats]
+    assert finished == [stats]
+
+
+def test_slow_request_profiler_skips_price_streams(make_app, tmp_path):
+    app = make_app()
+    # Every profiled request counts as slow
+    profiler = app.extensions['stocker'].profiler = SlowRequestProfiler(0, path=str(tmp_path / 'slow.jsonl'))
+    client = login(app.test_client())
+
+    stream = client.get('/api/stock_prices/stream', buffered=False)
+    assert next(iter(stream.response)) == b'retry: 3000\n\n'
+    assert profiler._active == {}
+    stream.close()
+    client.get('/api/stock_prices')
+    assert client.get('/api/portfolio/valuation').status_code == 200
+
+    logged = [json.loads(line)['endpoint'] for line in (tmp_path / 'slow.jsonl').read_text().splitlines()]
+    assert 'stock_price_stream' not in logged
+    assert {'api_stock_prices', 'portfolio_valuation'} <= set(logged)
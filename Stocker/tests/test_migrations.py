@@ -0,0 +1,38 @@
+import sqlite3
+
+from migrations import LATEST_VERSION, get_version, migrate
+
+
+def test_lots_migration_keeps_the_portfolio(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / 'stocker.db'))
+    migrate(conn, target=4)
+    conn.execute("INSERT INTO users (username, email, password, role) VALUES ('u', 'u@x', 'p', 'Trader')")
+    # The row BUY 10 then SELL 15 left behind was deleted, and MSFT's
+    # average price does not match a FIFO replay of its trades
+    conn.executemany('INSERT INTO trades (user_id, stock_symbol, qty, price, type) VALUES (1, ?, ?, ?, ?)', [
+        ('AAPL', 10, 100.0, 'BUY'), ('AAPL', 15, 110.0, 'SELL'),
+        ('MSFT', 10, 10.0, 'BUY'), ('MSFT', 10, 20.0, 'BUY'), ('MSFT', 5, 30.0, 'SELL'),
+    ])
+    conn.execute("INSERT INTO portfolio (user_id, stock_symbol, quantity, avg_price) VALUES (1, 'MSFT', 15, 15.0)")
+    conn.commit()
+    portfolio = conn.execute('SELECT * FROM portfolio').fetchall()
+
+    assert migrate(conn) == get_version(conn) == LATEST_VERSION
+    assert conn.execute('SELECT * FROM portfolio').fetchall() == portfolio
+    assert conn.execute('SELECT user_id, stock_symbol, quantity, price FROM lots').fetchall() == [
+        (1, 'MSFT', 15, 15.0)]
+    assert conn.execute('SELECT COUNT(*) FROM realized_pnl').fetchone()[0] == 0
+
+
+def test_stats_migration_counts_existing_rows(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / 'stocker.db'))
+    migrate(conn, target=2)
+    conn.execute("INSERT INTO users (username, email, password, role) VALUES ('u', 'u@x', 'p', 'Trader')")
+    conn.execute("INSERT INTO trades (user_id, stock_symbol, qty, price, type) VALUES (1, 'AAPL', 4, 2.5, 'BUY')")
+    conn.execute("INSERT INTO portfolio (user_id, stock_symbol, quantity, avg_price) VALUES (1, 'AAPL', 4, 2.5)")
+    conn.commit()
+
+    migrate(conn)
+
+    assert dict(conn.execute('SELECT name, value FROM stats')) == {
+        'traders': 1, 'trades': 1, 'notional_volume': 10.0, 'cost_basis': 10.0}
@@ -0,0 +1,120 @@
+import json
+import threading
+
+from notifications import NotificationQueue
+
+TOPIC = 'arn:aws:sns:us-east-1:123456789012:stocker'
+
+
+class FakeSNS:
+    """Stands in for the boto3 SNS client; ``fail(entry, call)`` returns a failure dict or None."""
+
+    def __init__(self, fail=lambda entry, call: None):
+        self.fail = fail
+        self.calls = []
+        self.published = []
+        self._lock = threading.Lock()
+
+    def publish_batch(self, TopicArn, PublishBatchRequestEntries):
+        with self._lock:
+            call = len(self.calls)
+            self.calls.append([entry['Id'] for entry in PublishBatchRequestEntries])
+        successful, failed = [], []
+        for entry in PublishBatchRequestEntries:
+            failure = self.fail(entry, call)
+            if failure:
+                failed.append({'Id': entry['Id'], **failure})
+            else:
+                successful.append({'Id': entry['Id'], 'MessageId': f'm-{entry["Id"]}'})
+                with self._lock:
+                    self.published.append(entry['Message'])
+        return {'Successful': successful, 'Failed': failed}
+
+
+def deliver(client, messages, tmp_path, **kwargs):
+    notifications = NotificationQueue(client, TOPIC, str(tmp_path / 'dead.jsonl'), workers=1,
+                                      batch_wait=0.05, backoff=0, **kwargs)
+    for message in messages:
+        notifications.enqueue('Trade', message)
+    notifications.start()
+    notifications.close()
+    return notifications
+
+
+def dead_letters(tmp_path):
+    path = tmp_path / 'dead.jsonl'
+    return [json.loads(line) for line in path.read_text().splitlines()] if path.exists() else []
+
+
+def test_messages_are_published_in_batches(tmp_path):
+    client = FakeSNS()
+    notifications = deliver(client, [f'msg {i}' for i in range(25)], tmp_path)
+
+    assert sorted(client.published) == sorted(f'msg {i}' for i in range(25))
+    assert all(len(ids) <= 10 for ids in client.calls)
+    assert notifications.stats()['published'] == 25
+    assert dead_letters(tmp_path) == []
+
+
+def test_throttled_entries_are_retried(tmp_path):
+    # Every other entry is throttled on the first two attempts
+    def throttle(entry, call):
+        if int(entry['Id']) % 2 and call < 2:
+            return {'Code': 'Throttling', 'SenderFault': False}
+
+    client = FakeSNS(throttle)
+    notifications = deliver(client, [f'msg {i}' for i in range(6)], tmp_path)
+
+    assert sorted(client.published) == [f'msg {i}' for i in range(6)]
+    assert client.calls[1] == ['1', '3', '5']
+    stats = notifications.stats()
+    assert stats['retries'] == 6
+    assert stats['dead_lettered'] == 0
+
+
+def test_sender_faults_are_dead_lettered_without_retry(tmp_path):
+    def reject(entry, call):
+        if entry['Message'] == 'bad':
+            return {'Code': 'InvalidParameter', 'SenderFault': True}
+
+    client = FakeSNS(reject)
+    notifications = deliver(client, ['good', 'bad'], tmp_path)
+
+    assert client.published == ['good']
+    assert len(client.calls) == 1
+    [letter] = dead_letters(tmp_path)
+    assert (letter['reason'], letter['message'], letter['topic_arn']) == ('InvalidParameter', 'bad', TOPIC)
+    assert notifications.stats()['dead_lettered'] == 1
+
+
+def test_entries_are_dead_lettered_once_retries_run_out(tmp_path):
+    client = FakeSNS(lambda entry, call: {'Code': 'Throttling', 'SenderFault': False})
+    notifications = deliver(client, ['stuck'], tmp_path, max_retries=3)
+
+    # The first attempt plus three retries
+    assert len(client.calls) == 4
+    [letter] = dead_letters(tmp_path)
+    assert (letter['reason'], letter['message']) == ('RetriesExhausted', 'stuck')
+    assert notifications.stats()['retries'] == 3
+
+
+def test_client_errors_are_retried(tmp_path):
+    class FlakySNS(FakeSNS):
+        def publish_batch(self, **kwargs):
+            if not self.calls:
+                self.calls.append(None)
+                raise ConnectionError('connection reset')
+            return super().publish_batch(**kwargs)
+
+    client = FlakySNS()
+    notifications = deliver(client, ['msg'], tmp_path)
+
+    assert client.published == ['msg']
+    assert notifications.stats()['retries'] == 1
+
+
+def test_enqueue_drops_when_full(tmp_path):
+    notifications = NotificationQueue(FakeSNS(), TOPIC, str(tmp_path / 'dead.jsonl'), max_size=2)
+
+    assert [notifications.enqueue('Trade', f'msg {i}') for i in range(3)] == [True, True, False]
+    assert notifications.stats()['dropped'] == 1
@@ -0,0 +1,117 @@
+import threading
+
+import pytest
+
+from conftest import login
+from passwords import PasswordHasher, PasswordHasherBusy, encode, legacy_hash, verify
+
+# Cheap costs, so the tests hash quickly
+CURRENT = (4, 1, 1)
+OLD = (2, 1, 1)
+
+
+@pytest.fixture
+def hasher():
+    hasher = PasswordHasher(*CURRENT, workers=1, max_pending=0)
+    yield hasher
+    hasher.close()
+
+
+def test_hashes_are_salted_and_carry_their_cost():
+    first, second = encode('pw', *CURRENT), encode('pw', *CURRENT)
+
+    assert first != second
+    assert first.startswith('scrypt$4$1$1$')
+    assert verify('pw', first) == (True, CURRENT)
+    assert verify('other', first) == (False, CURRENT)
+
+
+@pytest.mark.parametrize('stored', [
+    'scrypt$4$1$1$c2FsdA==',                  # missing the hash
+    'scrypt$four$1$1$c2FsdA==$aGFzaA==',      # cost is not a number
+    'scrypt$4$1$1$not base64!$aGFzaA==',
+    'scrypt$3$1$1$c2FsdA==$aGFzaA==',         # n is not a power of 2
+    'scrypt$4$1$1$c2FsdA==$aGFzaA==$extra',
+    '',
+    'pâsswörd',                               # neither a digest nor ASCII
+])
+def test_malformed_hashes_never_match(hasher, stored):
+    assert not verify('pw', stored)[0]
+    assert hasher.check('pw', stored) == (False, None)
+
+
+def test_legacy_hash_is_replaced_on_match(hasher):
+    matches, replacement = hasher.check('pw', legacy_hash('pw'))
+
+    assert matches
+    assert verify('pw', replacement) == (True, CURRENT)
+    assert hasher.check('wrong', legacy_hash('pw')) == (False, None)
+    assert hasher.stats()['rehashed'] == 1
+
+
+def test_hash_with_an_old_cost_is_upgraded(hasher):
+    matches, replacement = hasher.check('pw', encode('pw', *OLD))
+
+    assert matches
+    assert replacement.startswith('scrypt$4$1$1$')
+    # Already at the current cost: nothing to store
+    assert hasher.check('pw', replacement) == (True, None)
+    assert hasher.check('wrong', encode('pw', *OLD)) == (False, None)
+
+
+def test_full_pool_refuses_at_once(hasher):
+    release = threading.Event()
+    started = threading.Event()
+    blocker = threading.Thread(target=hasher._submit, args=(lambda: (started.set(), release.wait(5)),))
+    blocker.start()
+    try:
+        assert started.wait(5)
+        with pytest.raises(PasswordHasherBusy):
+            hasher.hash('pw')
+        assert hasher.stats()['rejected'] == 1
+    finally:
+        release.set()
+        blocker.join()
+    assert hasher.hash('pw').startswith('scrypt$')
+
+
+def test_login_upgrades_a_legacy_password(make_app):
+    app = make_app()
+    storage = app.extensions['stocker'].storage
+    storage.create_user('trader', 'trader@example.com', legacy_hash('pw'), 'Trader')
+    client = app.test_client()
+
+    response = client.post('/login', data={'email': 'trader@example.com', 'password': 'pw', 'role': 'Trader'})
+
+    assert response.status_code == 302
+    stored = storage.find_user('trader@example.com')['password']
+    assert stored.startswith('scrypt$2$1$1$')
+    # The upgraded hash keeps working, and is not replaced again
+    client.get('/logout')
+    login(client)
+    assert storage.find_user('trader@example.com')['password'] == stored
+
+
+class BusyHasher:
+    def hash(self, password):
+        raise PasswordHasherBusy('Too many logins in progress. Please try again.')
+
+    def check(self, password, stored):
+        return self.hash(password)
+
+    def stats(self):
+        return {}
+
+
+def test_busy_hasher_turns_logins_and_signups_away_with_503(make_app):
+    app = make_app(passwords=BusyHasher())
+    app.extensions['stocker'].storage.create_user('trader', 'trader@example.com', legacy_hash('pw'), 'Trader')
+    client = app.test_client()
+
+    response = client.post('/login', data={'email': 'trader@example.com', 'password': 'pw', 'role': 'Trader'})
+    assert response.status_code == 503
+    assert b'Too many logins in progress' in response.data
+
+    response = client.post('/signup', data={'username': 'new', 'email': 'new@example.com', 'password': 'pw',
+                                            'role': 'Trader'})
+    assert response.status_code == 503
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from price_engine import GBMModel, JumpDiffusionModel, PriceEngine, SectorModel
+
+SYMBOLS = [f'S{i}' for i in range(2000)]
+
+
+def test_seeded_engines_repeat_the_same_path():
+    a, b = PriceEngine(SYMBOLS, seed=7), PriceEngine(SYMBOLS, seed=7)
+    for _ in range(5):
+        assert np.array_equal(a.step(), b.step())
+    assert not np.array_equal(a.prices, PriceEngine(SYMBOLS, seed=8).step())
+
+
+def test_initial_prices_fall_in_the_range():
+    engine = PriceEngine(SYMBOLS, seed=1, low=10, high=20)
+    assert ((engine.prices >= 10) & (engine.prices < 20)).all()
+    fixed = PriceEngine(['A', 'B'], initial_prices=[1.5, 2.5])
+    assert fixed.as_dict() == {'A': 1.5, 'B': 2.5}
+
+
+def test_gbm_step_has_the_model_volatility():
+    engine = PriceEngine(SYMBOLS, model=GBMModel(sigma=0.02), seed=3)
+    before = engine.prices.copy()
+    returns = np.log(engine.step() / before)
+
+    assert returns.std() == pytest.approx(0.02, rel=0.1)
+    assert abs(returns.mean()) < 0.002
+    assert engine.ticks == 1
+
+
+def test_prices_never_fall_below_a_cent():
+    engine = PriceEngine(['A'], model=GBMModel(mu=-50.0), initial_prices=[1.0])
+    engine.step()
+    assert engine.prices[0] == 0.01
+
+
+def test_sector_shocks_are_correlated_within_a_sector():
+    sectors = ['tech' if i % 2 else 'energy' for i in range(len(SYMBOLS))]
+    model = SectorModel(sectors, correlation=0.8)
+    rng = np.random.default_rng(5)
+    shocks = np.array([model.shocks(rng, len(SYMBOLS), 1.0) for _ in range(200)])
+
+    same = np.corrcoef(shocks[:, 0], shocks[:, 2])[0, 1]
+    other = np.corrcoef(shocks[:, 0], shocks[:, 1])[0, 1]
+    assert same == pytest.approx(0.8, abs=0.15)
+    assert abs(other) < 0.25
+
+
+def test_jumps_fatten_the_tails():
+    rng = np.random.default_rng(9)
+    plain = GBMModel().log_returns(rng, 100_000, 1.0)
+    jumpy = JumpDiffusionModel(jump_rate=0.05, jump_std=0.2).log_returns(rng, 100_000, 1.0)
+    assert (np.abs(jumpy) > 0.15).sum() > 10 * max((np.abs(plain) > 0.15).sum(), 1)
+
+
+def test_rounded_prices_are_in_cents():
+    engine = PriceEngine(['A', 'B'], initial_prices=[1.234, 5.678])
+    assert engine.rounded().tolist() == [1.23, 5.68]
+    assert engine.as_dict() == {'A': 1.23, 'B': 5.68}
@@ -0,0 +1,83 @@
+import threading
+
+import pytest
+
+from price_snapshot import PriceBoard, PriceSnapshot
+
+
+def test_snapshots_are_immutable():
+    snapshot = PriceSnapshot(1, 0.0, {'AAPL': 1.0})
+    with pytest.raises(AttributeError):
+        snapshot.seq = 2
+    with pytest.raises(TypeError):
+        snapshot.prices['AAPL'] = 2.0
+
+
+def test_publish_records_what_changed():
+    board = PriceBoard()
+    first = board.publish({'AAPL': 1.0, 'MSFT': 2.0})
+    second = board.publish({'AAPL': 1.0, 'MSFT': 2.5})
+
+    assert (first.seq, second.seq) == (1, 2)
+    assert first.changed == {'AAPL', 'MSFT'}
+    assert second.changed == {'MSFT'}
+    assert board.current() is second
+    assert board.publish({'AAPL': 1.0, 'MSFT': 2.5}, seq=40).seq == 40
+
+
+def test_changes_since_returns_the_delta():
+    board = PriceBoard()
+    board.publish({'AAPL': 1.0, 'MSFT': 2.0, 'TSLA': 3.0})
+    board.publish({'AAPL': 1.1, 'MSFT': 2.0, 'TSLA': 3.0})
+    board.publish({'AAPL': 1.1, 'MSFT': 2.2, 'TSLA': 3.0})
+
+    assert board.changes_since(1) == {'AAPL': 1.1, 'MSFT': 2.2}
+    assert board.changes_since(2) == {'MSFT': 2.2}
+    assert board.changes_since(3) == {}
+    # Deltas are relative to the snapshot the caller holds, not a newer one
+    held = board.current()
+    board.publish({'AAPL': 9.0, 'MSFT': 2.2, 'TSLA': 3.0})
+    assert board.changes_since(2, held) == {'MSFT': 2.2}
+
+
+def test_changes_since_an_unknown_tick_is_the_full_map():
+    board = PriceBoard(history_size=3)
+    for i in range(5):
+        board.publish({'AAPL': float(i), 'MSFT': 2.0})
+
+    assert board.changes_since(1) == {'AAPL': 4.0, 'MSFT': 2.0}
+    assert board.changes_since(999) == {'AAPL': 4.0, 'MSFT': 2.0}
+    assert board.changes_since(3) == {'AAPL': 4.0}
+
+
+def test_wait_returns_on_publish_or_timeout():
+    board = PriceBoard()
+    board.publish({'AAPL': 1.0})
+    assert board.wait(1, timeout=0.01).seq == 1
+
+    publisher = threading.Timer(0.05, board.publish, [{'AAPL': 2.0}])
+    publisher.start()
+    assert board.wait(1, timeout=5).prices == {'AAPL': 2.0}
+    publisher.join()
+
+
+def test_readers_never_see_a_mixed_snapshot():
+    board = PriceBoard()
+    board.publish({s: 0.0 for s in 'ABCDEFGH'})
+    stop = threading.Event()
+    mixed = []
+
+    def read():
+        while not stop.is_set():
+            if len(set(board.current().prices.values())) != 1:
+                mixed.append(True)
+
+    readers = [threading.Thread(target=read) for _ in range(4)]
+    for reader in readers:
+        reader.start()
+    for i in range(1, 2000):
+        board.publish({s: float(i) for s in 'ABCDEFGH'})
+    stop.set()
+    for reader in readers:
+        reader.join()
+    assert not mixed
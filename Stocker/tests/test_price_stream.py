@@ -0,0 +1,112 @@
+import json
+
+from conftest import login
+from price_snapshot import PriceBoard
+from price_stream import PricePayloadCache, StreamLimiter, format_event, parse_last_seq, price_events
+
+
+def event(frame):
+    fields = dict(line.split(': ', 1) for line in frame.strip().splitlines())
+    return int(fields['id']), json.loads(fields['data'])['prices']
+
+
+def test_stream_starts_with_the_full_map_then_sends_changes():
+    board = PriceBoard()
+    board.publish({'AAPL': 1.0, 'MSFT': 2.0})
+    events = price_events(board, keepalive=0.01)
+
+    assert next(events) == 'retry: 3000\n\n'
+    assert event(next(events)) == (1, {'AAPL': 1.0, 'MSFT': 2.0})
+    board.publish({'AAPL': 1.5, 'MSFT': 2.0})
+    assert event(next(events)) == (2, {'AAPL': 1.5})
+    # No tick within the keep-alive interval
+    assert next(events) == ': keep-alive\n\n'
+
+
+def test_reconnecting_client_gets_a_delta():
+    board = PriceBoard()
+    for prices in ({'AAPL': 1.0, 'MSFT': 2.0}, {'AAPL': 1.0, 'MSFT': 2.5}, {'AAPL': 1.0, 'MSFT': 3.0}):
+        board.publish(prices)
+
+    events = price_events(board, last_seq=1)
+    next(events)
+    assert event(next(events)) == (3, {'MSFT': 3.0})
+
+
+def test_event_format_and_last_id_parsing():
+    assert format_event(7, {'A': 1}, encode=str) == 'id: 7\nevent: prices\ndata: {"seq":7,"prices":{"A":"1"}}\n\n'
+    assert parse_last_seq('12') == 12
+    assert parse_last_seq('x') is None and parse_last_seq(None) is None
+
+
+def test_limiter_refuses_past_its_limit():
+    limiter = StreamLimiter(2)
+    assert [limiter.acquire() for _ in range(3)] == [True, True, False]
+    limiter.release()
+    assert limiter.acquire()
+    assert limiter.stats() == {'open': 2, 'limit': 2, 'refused': 1}
+
+
+def test_stream_endpoint_is_capped_and_frees_its_slot_on_close(make_app):
+    app = make_app(max_price_streams=1)
+    client = login(app.test_client())
+
+    first = client.get('/api/stock_prices/stream', buffered=False)
+    assert first.status_code == 200
+    assert first.mimetype == 'text/event-stream'
+    assert next(iter(first.response)) == b'retry: 3000\n\n'
+
+    refused = client.get('/api/stock_prices/stream')
+    assert refused.status_code == 503
+
+    first.close()
+    again = client.get('/api/stock_prices/stream', buffered=False)
+    assert again.status_code == 200
+    again.close()
+    assert app.extensions['stocker'].price_streams.stats()['open'] == 0
+
+
+def test_payload_is_encoded_once_per_tick():
+    board = PriceBoard()
+    board.publish({'AAPL': 1.0})
+    payload = PricePayloadCache(board)
+
+    first = payload.full()
+    assert payload.full() is first
+    board.publish({'AAPL': 2.0})
+    snapshot, body, etag = payload.full()
+    assert json.loads(body) == {'AAPL': 2.0}
+    assert etag != first[2]
+    assert json.loads(payload.delta(1)[1]) == {'seq': 2, 'prices': {'AAPL': 2.0}}
+
+
+def test_prices_endpoint_revalidates_with_etags(make_app):
+    app = make_app()
+    market = app.extensions['stocker'].market
+    client = app.test_client()
+
+    full = client.get('/api/stock_prices')
+    assert full.status_code == 200
+    assert set(full.get_json()) == set(market.symbols)
+    assert full.headers['X-Price-Seq'] == '1'
+    etag = full.headers['ETag']
+
+    assert client.get('/api/stock_prices', headers={'If-None-Match': etag}).status_code == 304
+    market.engine.step()
+    market.publish()
+    fresh = client.get('/api/stock_prices', headers={'If-None-Match': etag})
+    assert fresh.status_code == 200
+    assert fresh.headers['ETag'] != etag
+
+
+def test_prices_endpoint_serves_deltas_since_a_tick(make_app):
+    app = make_app()
+    market = app.extensions['stocker'].market
+    client = app.test_client()
+    market.board.publish({**market.board.current().prices, 'AAPL': 1.0})
+
+    delta = client.get('/api/stock_prices?since=1').get_json()
+    assert delta == {'seq': 2, 'prices': {'AAPL': 1.0}}
+    assert client.get('/api/stock_prices?since=2').get_json() == {'seq': 2, 'prices': {}}
+    # A tick the board no longer knows gets every price, to resync
+    assert len(client.get('/api/stock_prices?since=999').get_json()['prices']) == len(market.symbols)
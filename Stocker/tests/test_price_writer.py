@@ -0,0 +1,127 @@
+import threading
+
+from price_writer import BATCH_SIZE, PriceWriter
+
+TABLE = 'stocker_stocks'
+
+
+class FakeClient:
+    """Stands in for the boto3 DynamoDB client; ``fail(item, call)`` leaves an item unprocessed if true.
+
+    ``fail`` may also raise, as a throttled request would.
+    """
+
+    def __init__(self, fail=lambda item, call: False):
+        self.fail = fail
+        self.calls = []
+        self.written = []
+        self._lock = threading.Lock()
+
+    def batch_write_item(self, RequestItems):
+        requests = RequestItems[TABLE]
+        with self._lock:
+            call = len(self.calls)
+            self.calls.append([r['PutRequest']['Item']['symbol'] for r in requests])
+        unprocessed = []
+        for request in requests:
+            if self.fail(request['PutRequest']['Item'], call):
+                unprocessed.append(request)
+            else:
+                with self._lock:
+                    self.written.append(request['PutRequest']['Item'])
+        return {'UnprocessedItems': {TABLE: unprocessed} if unprocessed else {}}
+
+
+class FakeTable:
+    name = TABLE
+
+    def __init__(self, client):
+        self.meta = type('Meta', (), {'client': client})()
+
+
+def quote(symbol, price):
+    return {'symbol': symbol, 'price': price}
+
+
+def write(client, ticks, **kwargs):
+    """Submits every tick before starting the writer, then drains it."""
+    writer = PriceWriter(FakeTable(client), backoff=0, **kwargs)
+    for tick in ticks:
+        writer.submit(tick)
+    writer.start()
+    assert writer.flush(timeout=5)
+    writer.close()
+    return writer
+
+
+def test_repeated_symbols_are_coalesced_to_the_newest_price():
+    client = FakeClient()
+    writer = write(client, [[quote('AAPL', p), quote('MSFT', p)] for p in (1, 2, 3)])
+
+    assert sorted(client.written, key=lambda item: item['symbol']) == [quote('AAPL', 3), quote('MSFT', 3)]
+    stats = writer.stats()
+    assert (stats['submitted'], stats['coalesced'], stats['written']) == (6, 4, 2)
+
+
+def test_items_are_written_in_batches_of_25():
+    client = FakeClient()
+    write(client, [[quote(f'S{i:03d}', 1) for i in range(60)]])
+
+    assert [len(call) for call in client.calls] == [BATCH_SIZE, BATCH_SIZE, 10]
+    assert len(client.written) == 60
+
+
+def test_unprocessed_items_are_retried():
+    # Every other symbol comes back unprocessed on the first two attempts
+    client = FakeClient(lambda item, call: call < 2 and int(item['symbol'][1:]) % 2 == 0)
+    writer = write(client, [[quote(f'S{i}', 1) for i in range(10)]])
+
+    assert sorted(item['symbol'] for item in client.written) == sorted(f'S{i}' for i in range(10))
+    assert [len(call) for call in client.calls] == [10, 5, 5]
+    stats = writer.stats()
+    assert (stats['retries'], stats['requeued'], stats['written']) == (2, 0, 10)
+
+
+def test_failed_requests_are_retried():
+    def fail(item, call):
+        if call == 0:
+            raise RuntimeError('ProvisionedThroughputExceededException')
+        return False
+
+    client = FakeClient(fail)
+    writer = write(client, [[quote('AAPL', 1)]])
+
+    assert client.written == [quote('AAPL', 1)]
+    assert writer.stats()['errors'] == 1
+
+
+def test_items_are_requeued_once_retries_run_out():
+    # TSLA is unprocessed on the first attempt and its one retry
+    client = FakeClient(lambda item, call: call < 2 and item['symbol'] == 'TSLA')
+    writer = write(client, [[quote('AAPL', 1), quote('TSLA', 1)]], max_retries=1)
+
+    assert client.calls == [['AAPL', 'TSLA'], ['TSLA'], ['TSLA']]
+    assert client.written == [quote('AAPL', 1), quote('TSLA', 1)]
+    stats = writer.stats()
+    assert (stats['retries'], stats['requeued'], stats['written'], stats['pending']) == (1, 1, 2, 0)
+
+
+def test_requeue_keeps_a_newer_pending_price():
+    writer = PriceWriter(FakeTable(FakeClient()))
+    writer.submit([quote('AAPL', 2)])
+
+    writer._requeue([{'PutRequest': {'Item': quote('AAPL', 1)}},
+                     {'PutRequest': {'Item': quote('MSFT', 1)}}], {'AAPL': 0.0, 'MSFT': 0.0})
+
+    assert {key: item for key, (item, _) in writer._pending.items()} == {'AAPL': quote('AAPL', 2),
+                                                                       'MSFT': quote('MSFT', 1)}
+    assert writer.stats()['requeued'] == 1
+
+
+def test_submit_rejects_items_once_the_queue_is_full():
+    writer = PriceWriter(FakeTable(FakeClient()), max_pending=2, put_timeout=0)
+
+    assert writer.submit([quote('AAPL', 1), quote('MSFT', 1), quote('TSLA', 1)]) == 1
+    # A symbol already pending still takes its newer price
+    assert writer.submit([quote('AAPL', 2)]) == 0
+    assert writer.stats()['rejected'] == 1
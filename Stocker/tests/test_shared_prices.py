@@ -0,0 +1,100 @@
+import os
+import time
+
+import numpy as np
+
+from shared_prices import SharedPriceBoard, SharedPrices
+
+SYMBOLS = ['AAPL', 'MSFT']
+TICK = 0.05
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.01)
+
+
+def test_board_reattaches_after_publisher_restart(tmp_path):
+    name = f'stocker_test_{os.getpid()}'
+    publisher = SharedPrices.create(name, SYMBOLS, str(tmp_path))
+    board = SharedPriceBoard(name, SYMBOLS, lock_dir=str(tmp_path), tick_seconds=TICK)
+    try:
+        publisher.publish(100, time.time(), np.array([1.0, 2.0]))
+        assert board.current().prices == {'AAPL': 1.0, 'MSFT': 2.0}
+
+        # A restart unlinks the old block and creates a new one under the same name
+        publisher.close()
+        publisher = SharedPrices.create(name, SYMBOLS, str(tmp_path))
+        publisher.publish(200, time.time(), np.array([3.0, 4.0]))
+
+        wait_for(lambda: board.current().prices == {'AAPL': 3.0, 'MSFT': 4.0})
+        assert board.current().seq == 200
+
+        # Trades now reach the new publisher
+        board.add_volume('MSFT', 7)
+        assert publisher.take_volume() == {'MSFT': 7}
+    finally:
+        publisher.close()
+
+
+def test_board_keeps_its_block_while_ticks_arrive(tmp_path):
+    name = f'stocker_test_{os.getpid()}_live'
+    publisher = SharedPrices.create(name, SYMBOLS, str(tmp_path))
+    board = SharedPriceBoard(name, SYMBOLS, lock_dir=str(tmp_path), tick_seconds=TICK)
+    try:
+        for seq in range(1, 6):
+            publisher.publish(seq, time.time(), np.array([seq, seq], dtype=float))
+            assert board.current().seq == seq
+            time.sleep(TICK)
+        attached = board._shared
+        # A stalled publisher is checked for a restart, but the block is kept
+        time.sleep(4 * TICK)
+        board.current()
+        assert board._shared is attached
+    finally:
+        publisher.close()
+
+
+def test_board_keeps_its_prices_when_a_publisher_has_other_symbols(tmp_path, capsys):
+    name = f'stocker_test_{os.getpid()}_resized'
+    publisher = SharedPrices.create(name, SYMBOLS, str(tmp_path))
+    board = SharedPriceBoard(name, SYMBOLS, lock_dir=str(tmp_path), tick_seconds=TICK)
+    try:
+        publisher.publish(100, time.time(), np.array([1.0, 2.0]))
+        assert board.current().prices == {'AAPL': 1.0, 'MSFT': 2.0}
+
+        # Restarted with a third symbol: the block no longer matches this worker
+        publisher.close()
+        publisher = SharedPrices.create(name, SYMBOLS + ['TSLA'], str(tmp_path))
+        publisher.publish(200, time.time(), np.array([3.0, 4.0, 5.0]))
+        time.sleep(4 * TICK)
+        assert board.current().prices == {'AAPL': 1.0, 'MSFT': 2.0}
+        assert 'holds 3 symbols, expected 2' in capsys.readouterr().out
+
+        # Back on the worker's symbols, it reattaches
+        publisher.close()
+        publisher = SharedPrices.create(name, SYMBOLS, str(tmp_path))
+        publisher.publish(300, time.time(), np.array([6.0, 7.0]))
+        wait_for(lambda: board.current().seq == 300)
+        assert board.current().prices == {'AAPL': 6.0, 'MSFT': 7.0}
+    finally:
+        publisher.close()
+
+
+def test_board_starts_empty_against_a_block_for_other_symbols(tmp_path, capsys):
+    name = f'stocker_test_{os.getpid()}_other'
+    publisher = SharedPrices.create(name, SYMBOLS + ['TSLA'], str(tmp_path))
+    board = SharedPriceBoard(name, SYMBOLS, lock_dir=str(tmp_path), tick_seconds=TICK)
+    try:
+        publisher.publish(1, time.time(), np.array([1.0, 2.0, 3.0]))
+
+        assert board.current().prices == {}
+        board.add_volume('AAPL', 5)
+        assert publisher.take_volume() == {}
+        # Not retried on every request
+        board.current()
+        assert capsys.readouterr().out.count('Ignoring shared prices') == 1
+    finally:
+        publisher.close()
@@ -0,0 +1,74 @@
+import pytest
+
+from sqlite_storage import SQLiteStorage
+from stats import STAT_NAMES
+from storage import MemoryStorage
+from trade_history import decode_cursor
+
+TRADES = [('AAPL', 3, 10.5, 'BUY'), ('MSFT', 2, 20.0, 'BUY'), ('AAPL', 1, 11.0, 'SELL')]
+
+
+@pytest.fixture(params=['memory', 'sqlite', 'dynamodb'])
+def storage(request, tmp_path):
+    """Each backend with one trader who made TRADES, as (storage, user_id)."""
+    if request.param == 'memory':
+        storage = MemoryStorage()
+        storage.init()
+    elif request.param == 'sqlite':
+        storage = SQLiteStorage(str(tmp_path / 'stocker.db'))
+        storage.init()
+    else:
+        storage = request.getfixturevalue('dynamo_storage')
+    storage.create_user('trader', 'trader@example.com', 'x', 'Trader')
+    user_id = storage.find_user('trader@example.com')['id']
+    for symbol, quantity, price, trade_type in TRADES:
+        storage.execute_trade(user_id, symbol, quantity, price, trade_type)
+    yield storage, user_id
+    storage.close()
+
+
+def pages(storage, **kwargs):
+    rows, cursor = storage.trades_page({}, limit=1, **kwargs)
+    while cursor is not None:
+        page, cursor = storage.trades_page({}, decode_cursor(cursor), limit=1, **kwargs)
+        rows += page
+    return rows
+
+
+def test_user_trade_pages_have_the_same_rows_on_every_backend(storage):
+    storage, user_id = storage
+
+    rows, cursor = storage.trades_page({}, user_id=user_id)
+
+    assert cursor is None
+    assert [tuple(row[:4]) for row in rows] == TRADES[::-1]
+    assert all(len(row) == 6 for row in rows)
+    for symbol, qty, price, trade_type, timestamp, trade_id in rows:
+        assert (type(qty), type(price), type(timestamp)) == (int, float, str)
+    assert len({row[-1] for row in rows}) == len(TRADES)
+    assert [tuple(row) for row in pages(storage, user_id=user_id)] == [tuple(row) for row in rows]
+
+
+def test_admin_trade_pages_have_the_same_rows_on_every_backend(storage):
+    storage, user_id = storage
+
+    rows, _ = storage.trades_page({})
+
+    assert [tuple(row[1:5]) for row in rows] == TRADES[::-1]
+    assert all(len(row) == 7 for row in rows)
+    # The user column is what each backend shows admins: a username, or DynamoDB's email
+    assert {row[0] for row in rows} <= {'trader', 'trader@example.com'}
+    assert [row[-1] for row in rows] == [row[-1] for row in storage.trades_page({}, user_id=user_id)[0]]
+    assert [tuple(row) for row in pages(storage)] == [tuple(row) for row in rows]
+
+
+def test_stats_have_the_same_names_on_every_backend(storage):
+    storage, _ = storage
+
+    stats = storage.read_stats()
+
+    assert tuple(stats) == STAT_NAMES
+    assert stats['traders'] == 1
+    assert stats['trades'] == len(TRADES)
+    assert stats['notional_volume'] == pytest.approx(3 * 10.5 + 2 * 20.0 + 11.0)
+    assert stats['cost_basis'] == pytest.approx(2 * 10.5 + 2 * 20.0)
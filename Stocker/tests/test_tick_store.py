@@ -0,0 +1,130 @@
+import os
+
+import pytest
+
+import tick_store
+from conftest import login
+from tick_store import TickStore, parse_candle_query
+
+SYMBOLS = ['AAPL', 'MSFT']
+# Midnight UTC, 14 Nov 2023
+DAY = 1_699_920_000
+
+
+def open_store(tmp_path, **kwargs):
+    return TickStore(str(tmp_path / 'ticks'), SYMBOLS, **kwargs)
+
+
+def segment_count(tmp_path):
+    return sum(name.endswith('.json') for name in os.listdir(tmp_path / 'ticks'))
+
+
+def minute_ticks(store, count, step=60):
+    """Appends ``count`` ticks ``step`` seconds apart, AAPL at 100 + i and MSFT at 50 - i."""
+    for i in range(count):
+        store.append([100 + i, 50 - i], DAY + i * step)
+
+
+def test_ticks_roll_up_into_ohlcv_bars(tmp_path):
+    store = open_store(tmp_path)
+    store.append([100.0, 50.0], DAY)
+    store.add_volume('AAPL', 5)
+    store.append([102.5, 50.0], DAY + 10)
+    store.append([99.0, 51.0], DAY + 30)
+    store.append([101.0, 51.0], DAY + 59)
+    store.add_volume('AAPL', 7)
+    store.add_volume('MSFT', 3)
+    store.append([103.0, 52.0], DAY + 60)
+
+    assert store.candles('AAPL', '1m', DAY, DAY + 120) == [
+        [DAY, 100.0, 102.5, 99.0, 101.0, 5],
+        [DAY + 60, 103.0, 103.0, 103.0, 103.0, 7],
+    ]
+    assert store.candles('MSFT', '5m', DAY, DAY + 300) == [[DAY, 50.0, 52.0, 50.0, 52.0, 3]]
+    # Newest bars are kept when the range holds more than the limit
+    assert [bar[0] for bar in store.candles('AAPL', '1m', DAY, DAY + 120, limit=1)] == [DAY + 60]
+
+
+def test_bars_spanning_segments_are_merged(tmp_path):
+    rolled = open_store(tmp_path / 'small', segment_ticks=4)
+    single = open_store(tmp_path / 'large')
+    for store in (rolled, single):
+        minute_ticks(store, 18, step=10)
+
+    assert segment_count(tmp_path / 'small') == 5
+    assert segment_count(tmp_path / 'large') == 1
+    for interval in ('1m', '5m'):
+        candles = rolled.candles('AAPL', interval, DAY, DAY + 600)
+        assert candles == single.candles('AAPL', interval, DAY, DAY + 600)
+    assert rolled.candles('AAPL', '1m', DAY, DAY + 600)[1] == [DAY + 60, 106.0, 111.0, 106.0, 111.0, 0]
+
+
+def test_a_new_day_starts_a_new_segment(tmp_path):
+    store = open_store(tmp_path)
+    store.append([100.0, 50.0], DAY + 86_390)
+    store.append([101.0, 51.0], DAY + 86_400)
+
+    assert segment_count(tmp_path) == 2
+    assert [bar[1] for bar in store.candles('AAPL', '1h', DAY, DAY + 2 * 86_400)] == [100.0, 101.0]
+
+
+def test_restarted_writer_and_reader_see_every_tick(tmp_path):
+    writer = open_store(tmp_path, segment_ticks=4)
+    minute_ticks(writer, 3)
+    writer.close()
+
+    writer = open_store(tmp_path, segment_ticks=4)
+    reader = open_store(tmp_path, readonly=True)
+    writer.append([200.0, 10.0], DAY + 180)
+    # Past the restored segment's capacity, into a new one
+    writer.append([201.0, 11.0], DAY + 240)
+
+    assert segment_count(tmp_path) == 2
+    closes = [bar[4] for bar in reader.candles('AAPL', '1m', DAY, DAY + 300)]
+    assert closes == [100.0, 101.0, 102.0, 200.0, 201.0]
+    with pytest.raises(RuntimeError):
+        reader.append([1.0, 1.0], DAY + 300)
+
+
+def test_sealed_segment_bars_are_cached(tmp_path, monkeypatch):
+    rollups = []
+    rollup = tick_store.rollup
+    monkeypatch.setattr(tick_store, 'rollup', lambda *args: rollups.append(1) or rollup(*args))
+    # Four segments of two one-minute ticks; the last is still being written
+    store = open_store(tmp_path, segment_ticks=2, cache_size=2)
+    minute_ticks(store, 8)
+
+    everything = store.candles('AAPL', '1m', DAY, DAY + 480)
+    assert len(rollups) == 4
+    assert len(store._bars) == 2
+
+    # The two newest sealed segments are cached; only the active one is rolled up again
+    recent = store.candles('AAPL', '1m', DAY + 240, DAY + 480)
+    assert len(rollups) == 5
+    assert recent == everything[4:]
+    assert [bar[4] for bar in everything] == [100.0 + i for i in range(8)]
+
+
+@pytest.mark.parametrize('args', [{'start': 'nan'}, {'end': 'inf'}, {'start': '-inf'}, {'end': 'NaN'}])
+def test_non_finite_bounds_are_rejected(args):
+    with pytest.raises(ValueError, match='epoch seconds'):
+        parse_candle_query(args)
+
+
+def test_candle_query_defaults_and_limits():
+    assert parse_candle_query({}) == ('1m', None, None, tick_store.DEFAULT_CANDLES)
+    assert parse_candle_query({'interval': '1h', 'start': '1.5', 'limit': '3'}) == ('1h', 1.5, None, 3)
+    for args in ({'interval': '2m'}, {'limit': '0'}, {'limit': str(tick_store.MAX_CANDLES + 1)}, {'end': 'x'}):
+        with pytest.raises(ValueError):
+            parse_candle_query(args)
+
+
+@pytest.mark.parametrize('query', ['start=nan', 'end=inf', 'interval=2m'])
+def test_bad_candle_queries_are_a_bad_request(make_app, query):
+    client = login(make_app().test_client())
+
+    response = client.get(f'/api/candles/AAPL?{query}')
+
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+    assert client.get('/api/candles/AAPL').status_code == 200
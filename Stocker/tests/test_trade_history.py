@@ -0,0 +1,107 @@
+import pytest
+
+import storage as storage_module
+from conftest import login
+from sqlite_storage import SQLiteStorage
+from storage import MemoryStorage
+from trade_history import decode_cursor, encode_cursor
+
+# Four trades share each timestamp, so pages have to split ties by id
+TIMES = ['2024-01-01 09:00:00', '2024-01-01 10:00:00', '2024-01-02 09:00:00']
+TRADES = 12
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def storage(request, tmp_path, monkeypatch):
+    if request.param == 'memory':
+        storage = MemoryStorage()
+    else:
+        storage = SQLiteStorage(str(tmp_path / 'history.db'))
+    storage.init()
+    storage.create_user('trader', 'trader@example.com', 'x', 'Trader')
+    user_id = storage.find_user('trader@example.com')['id']
+
+    times = iter(TIMES[i // 4] for i in range(TRADES))
+    monkeypatch.setattr(storage_module, 'utc_timestamp', lambda: next(times))
+    for i in range(TRADES):
+        symbol = 'AAPL' if i % 2 == 0 else 'MSFT'
+        if i % 3 == 2:
+            storage.execute_trade(user_id, symbol, 1, 10.0, 'SELL')
+        else:
+            storage.execute_trade(user_id, symbol, 2, 10.0, 'BUY')
+    if request.param == 'sqlite':
+        with storage.pool.connection() as conn:
+            ids = [row[0] for row in conn.execute('SELECT id FROM trades ORDER BY id')]
+            conn.executemany('UPDATE trades SET timestamp = ? WHERE id = ?',
+                             [(TIMES[i // 4], trade_id) for i, trade_id in enumerate(ids)])
+            conn.commit()
+    storage.user_id = user_id
+    yield storage
+    storage.close()
+
+
+def all_pages(storage, filters, limit, **kwargs):
+    rows, cursor = storage.trades_page(filters, limit=limit, **kwargs)
+    pages = [rows]
+    while cursor is not None:
+        rows, cursor = storage.trades_page(filters, decode_cursor(cursor), limit=limit, **kwargs)
+        pages.append(rows)
+    return pages
+
+
+def newest_first(rows):
+    return sorted(rows, key=lambda row: (row[-2], row[-1]), reverse=True)
+
+
+@pytest.mark.parametrize('limit', [1, 3, 4, 5, TRADES])
+def test_pages_cover_tied_timestamps_without_gaps_or_duplicates(storage, limit):
+    expected, _ = storage.trades_page({}, user_id=storage.user_id, limit=TRADES)
+    assert len(expected) == TRADES
+    assert expected == newest_first(expected)
+
+    pages = all_pages(storage, {}, limit, user_id=storage.user_id)
+
+    assert all(0 < len(page) <= limit for page in pages)
+    assert [row for page in pages for row in page] == expected
+
+
+def test_filters_hold_across_cursor_pages(storage):
+    filters = {'symbol': 'AAPL', 'type': 'BUY', 'end': '2024-01-01'}
+    expected = [row for row in storage.trades_page({}, user_id=storage.user_id, limit=TRADES)[0]
+                if row[0] == 'AAPL' and row[3] == 'BUY' and row[4] < '2024-01-02']
+    assert len(expected) > 2
+
+    pages = all_pages(storage, filters, 2, user_id=storage.user_id)
+
+    assert [row for page in pages for row in page] == expected
+
+
+def test_admin_pages_span_users(storage):
+    pages = all_pages(storage, {'type': 'SELL'}, 1)
+
+    rows = [row for page in pages for row in page]
+    assert len(rows) == TRADES // 3
+    assert {row[0] for row in rows} == {'trader'}
+    assert rows == newest_first(rows)
+
+
+@pytest.mark.parametrize('cursor', ['not a cursor!', encode_cursor(None), encode_cursor(5)])
+def test_malformed_cursor_is_a_bad_request(make_app, cursor):
+    client = login(make_app().test_client())
+
+    assert client.get('/history', query_string={'cursor': cursor}).status_code == 400
+    assert client.get('/history').status_code == 200
+
+
+def test_dynamodb_end_date_excludes_the_next_day(dynamo_storage):
+    from dynamo_storage import TRADE_RECORD_TYPE
+
+    for i, timestamp in enumerate(['2024-01-01T23:59:59', '2024-01-02', '2024-01-02T00:00:01']):
+        dynamo_storage.transactions_table.put_item(Item={
+            'id': f't{i}', 'user_id': 'trader@example.com', 'stock_symbol': 'AAPL', 'qty': 1,
+            'price': 10, 'type': 'BUY', 'record_type': TRADE_RECORD_TYPE, 'timestamp': timestamp})
+
+    rows, _ = dynamo_storage.trades_page({'start': '2024-01-01', 'end': '2024-01-01'},
+                                         user_id='trader@example.com')
+
+    assert [row[4] for row in rows] == ['2024-01-01T23:59:59']
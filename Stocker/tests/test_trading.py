@@ -0,0 +1,256 @@
+import random
+import threading
+
+import pytest
+
+import trading
+from conftest import login
+from db import ConnectionPool
+from lots import apply_fills
+from migrations import migrate
+from stats import read_stats
+from storage import MemoryStorage
+from trading import execute_batch, execute_trade
+
+THREADS = 8
+SYMBOLS = ['AAPL', 'MSFT']
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = ConnectionPool(str(tmp_path / 'trades.db'), size=THREADS)
+    with pool.connection() as conn:
+        migrate(conn)
+        conn.executemany("INSERT INTO users (username, email, password, role) VALUES (?, ?, 'p', 'Trader')",
+                         [(f'u{i}', f'u{i}@x') for i in (1, 2)])
+        conn.commit()
+    yield pool
+    pool.close()
+
+
+def hammer(pool, orders_for):
+    """Runs ``orders_for(rng)`` orders on every thread at once; returns (filled, rejected) counts."""
+    counts = {'filled': 0, 'rejected': 0}
+    lock = threading.Lock()
+    start = threading.Barrier(THREADS)
+
+    def worker(seed):
+        rng = random.Random(seed)
+        with pool.connection() as conn:
+            start.wait()
+            for order in orders_for(rng):
+                try:
+                    execute_trade(conn, *order)
+                    outcome = 'filled'
+                except ValueError:
+                    outcome = 'rejected'
+                with lock:
+                    counts[outcome] += 1
+
+    threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return counts['filled'], counts['rejected']
+
+
+def book(pool):
+    """Returns ({(user, symbol): (quantity, avg_price)}, {(user, symbol): open lot quantity}, stats)."""
+    with pool.connection() as conn:
+        positions = {(u, s): (q, a) for u, s, q, a in conn.execute(
+            'SELECT user_id, stock_symbol, quantity, avg_price FROM portfolio')}
+        lots = {(u, s): q for u, s, q in conn.execute(
+            'SELECT user_id, stock_symbol, SUM(quantity) FROM lots GROUP BY user_id, stock_symbol')}
+        return positions, lots, read_stats(conn)
+
+
+def test_concurrent_buys_lose_no_updates(pool):
+    filled, _ = hammer(pool, lambda rng: [
+        (rng.choice((1, 2)), rng.choice(SYMBOLS), rng.randint(1, 10), round(rng.uniform(50, 500), 2), 'BUY')
+        for _ in range(50)])
+    assert filled == THREADS * 50
+
+    positions, lots, stats = book(pool)
+    with pool.connection() as conn:
+        expected = conn.execute('''
+            SELECT user_id, stock_symbol, SUM(qty), SUM(qty * price) / SUM(qty)
+            FROM trades GROUP BY user_id, stock_symbol
+        ''').fetchall()
+    assert len(positions) == len(expected)
+    for user_id, symbol, quantity, avg_price in expected:
+        assert positions[user_id, symbol][0] == quantity == lots[user_id, symbol]
+        assert positions[user_id, symbol][1] == pytest.approx(avg_price)
+    assert stats['cost_basis'] == pytest.approx(sum(q * a for q, a in positions.values()))
+
+
+def test_concurrent_sells_never_oversell(pool):
+    with pool.connection() as conn:
+        execute_trade(conn, 1, 'AAPL', 100, 10.0, 'BUY')
+
+    filled, rejected = hammer(pool, lambda rng: [(1, 'AAPL', 1, 12.0, 'SELL')] * 25)
+
+    assert (filled, rejected) == (100, THREADS * 25 - 100)
+    positions, lots, stats = book(pool)
+    assert positions == {} and lots == {}
+    assert stats['cost_basis'] == pytest.approx(0)
+    with pool.connection() as conn:
+        assert conn.execute('SELECT closed_quantity, realized FROM realized_pnl').fetchall() == [
+            (100, pytest.approx(200.0))]
+
+
+def test_concurrent_mixed_orders_match_the_trades_table(pool):
+    hammer(pool, lambda rng: [
+        (rng.choice((1, 2)), rng.choice(SYMBOLS), rng.randint(1, 10), round(rng.uniform(50, 500), 2),
+         rng.choice(('BUY', 'SELL')))
+        for _ in range(50)])
+
+    positions, lots, stats = book(pool)
+    with pool.connection() as conn:
+        held = {(u, s): q for u, s, q in conn.execute('''
+            SELECT user_id, stock_symbol, SUM(CASE type WHEN 'BUY' THEN qty ELSE -qty END)
+            FROM trades GROUP BY user_id, stock_symbol
+        ''') if q}
+    assert {key: q for key, (q, _) in positions.items()} == held == lots
+    assert all(q > 0 for q in held.values())
+    assert stats['cost_basis'] == pytest.approx(sum(q * a for q, a in positions.values()))
+
+
+def order(symbol, quantity, trade_type):
+    return {'stock_symbol': symbol, 'quantity': quantity, 'trade_type': trade_type}
+
+
+PRICES = {'AAPL': 10.0, 'MSFT': 20.0}
+
+
+def test_batch_nets_each_symbol_into_one_position_update(pool, monkeypatch):
+    updates = []
+    apply_position = trading.apply_position
+    monkeypatch.setattr(trading, 'apply_position', lambda cursor, params: (
+        updates.append(params['symbol']), apply_position(cursor, params))[1])
+
+    with pool.connection() as conn:
+        results = execute_batch(conn, 1, [order('AAPL', 10, 'BUY'), order('MSFT', 2, 'BUY'),
+                                          order('AAPL', 5, 'buy'), order('AAPL', 3, 'SELL')], PRICES)
+
+    assert [r['status'] for r in results] == ['filled'] * 4
+    assert sorted(updates) == ['AAPL', 'MSFT']
+    positions, lots, _ = book(pool)
+    assert positions == {(1, 'AAPL'): (12, 10.0), (1, 'MSFT'): (2, 20.0)}
+    with pool.connection() as conn:
+        # FIFO: the sell closed 3 shares of the first buy
+        assert conn.execute("SELECT quantity FROM lots WHERE stock_symbol = 'AAPL' ORDER BY id").fetchall() == [
+            (7,), (5,)]
+        assert conn.execute('SELECT COUNT(*) FROM trades').fetchone()[0] == 4
+
+
+def test_batch_rejects_sells_against_what_earlier_orders_left(pool):
+    with pool.connection() as conn:
+        results = execute_batch(conn, 1, [
+            order('AAPL', 5, 'SELL'),   # nothing held yet
+            order('AAPL', 5, 'BUY'),
+            order('AAPL', 4, 'SELL'),
+            order('AAPL', 2, 'SELL'),   # only 1 left
+            order('AAPL', 1, 'SELL'),
+            order('TSLA', 1, 'BUY'),    # no price in the snapshot
+            order('AAPL', 'ten', 'BUY'),
+        ], PRICES)
+
+    assert [r['status'] for r in results] == [
+        'rejected', 'filled', 'filled', 'rejected', 'filled', 'rejected', 'rejected']
+    assert [r['index'] for r in results] == list(range(7))
+    assert 'do not own any shares' in results[0]['error']
+    assert 'only own 1 shares' in results[3]['error']
+    positions, lots, _ = book(pool)
+    assert positions == {} and lots == {}
+
+
+def test_batch_is_one_transaction(pool, monkeypatch):
+    with pool.connection() as conn:
+        execute_trade(conn, 1, 'AAPL', 5, 10.0, 'BUY')
+    before = book(pool)
+
+    def fail_on_msft(cursor, user_id, symbol, fills, method):
+        if symbol == 'MSFT':
+            raise RuntimeError('disk full')
+        return apply_fills(cursor, user_id, symbol, fills, method)
+
+    monkeypatch.setattr(trading, 'apply_fills', fail_on_msft)
+    with pool.connection() as conn:
+        with pytest.raises(RuntimeError):
+            execute_batch(conn, 1, [order('AAPL', 5, 'SELL'), order('MSFT', 1, 'BUY')], PRICES)
+        assert conn.execute('SELECT COUNT(*) FROM trades').fetchone()[0] == 1
+
+    assert book(pool) == before
+
+
+def test_batch_endpoint(make_app):
+    client = make_app().test_client()
+    assert client.post('/api/orders/batch', json={'orders': [order('AAPL', 1, 'BUY')]}).status_code == 401
+
+    login(client)
+    assert client.post('/api/orders/batch', json={}).status_code == 400
+    assert client.post('/api/orders/batch', json={'orders': [order('AAPL', 1, 'BUY')] * 1001}).status_code == 413
+
+    response = client.post('/api/orders/batch', json={'orders': [
+        order('AAPL', 3, 'BUY'), order('AAPL', 4, 'SELL'), order('AAPL', 10 ** 30, 'BUY')]})
+    assert response.status_code == 200
+    body = response.get_json()
+    assert (body['filled'], body['rejected']) == (1, 2)
+    assert client.get('/api/portfolio/valuation').get_json()['positions'][0]['quantity'] == 3
+
+
+class FlakyStorage(MemoryStorage):
+    """Memory storage whose writes fail for some symbols, as DynamoDB's can."""
+
+    def __init__(self, failures):
+        super().__init__()
+        self.failures = failures
+
+    def execute_trade(self, user_id, symbol, quantity, price, trade_type):
+        if symbol in self.failures:
+            raise self.failures[symbol]
+        return super().execute_trade(user_id, symbol, quantity, price, trade_type)
+
+
+def test_batch_reports_backend_errors_per_order(make_app):
+    storage = FlakyStorage({'MSFT': RuntimeError('Position for MSFT kept changing; trade not executed.'),
+                            'TSLA': OSError('connection reset')})
+    app = make_app(storage)
+    stocker = app.extensions['stocker']
+    volume = []
+    stocker.market.record_volume = lambda symbol, quantity: volume.append((symbol, quantity))
+    client = login(app.test_client())
+    # Cache the empty portfolio
+    assert client.get('/api/portfolio/valuation').get_json()['positions'] == []
+
+    response = client.post('/api/orders/batch', json={'orders': [
+        order('AAPL', 3, 'BUY'), order('MSFT', 1, 'BUY'), order('TSLA', 1, 'BUY'), order('AAPL', 1, 'SELL')]})
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert [r['status'] for r in body['orders']] == ['filled', 'error', 'error', 'filled']
+    assert 'kept changing' in body['orders'][1]['error']
+    assert (body['filled'], body['rejected']) == (2, 2)
+    assert volume == [('AAPL', 3), ('AAPL', 1)]
+    positions = client.get('/api/portfolio/valuation').get_json()['positions']
+    assert [(p['symbol'], p['quantity']) for p in positions] == [('AAPL', 2)]
+
+
+def test_failed_batch_still_invalidates_the_cached_portfolio(make_app):
+    app = make_app()
+    stocker = app.extensions['stocker']
+    storage = stocker.storage
+    storage.create_user('trader', 'trader@example.com', 'x', 'Trader')
+    user_id = storage.find_user('trader@example.com')['id']
+    assert stocker.positions(user_id) == []
+
+    def write_one_then_fail(user_id, orders, prices):
+        storage.execute_trade(user_id, 'AAPL', 2, prices['AAPL'], 'BUY')
+        raise RuntimeError('connection lost')
+
+    storage.execute_batch = write_one_then_fail
+    with pytest.raises(RuntimeError):
+        stocker.execute_batch(user_id, [order('AAPL', 2, 'BUY')] * 2, stocker.market.board.current().prices)
+
+    assert [p[1:3] for p in stocker.positions(user_id)] == [('AAPL', 2)]
@@ -0,0 +1,60 @@
+import pytest
+
+from valuation import value_positions
+
+PRICES = {'AAPL': 110.0, 'MSFT': 90.0}
+
+
+def position(valuation, symbol):
+    return next(p for p in valuation.positions() if p['symbol'] == symbol)
+
+
+def test_long_position_pnl():
+    valuation = value_positions([('u1', 'AAPL', 10, 100.0)], PRICES)
+
+    assert position(valuation, 'AAPL') == {
+        'owner': 'u1', 'symbol': 'AAPL', 'quantity': 10, 'avg_price': 100.0, 'price': 110.0,
+        'market_value': 1100.0, 'cost_basis': 1000.0, 'pnl': 100.0, 'pnl_percent': 10.0,
+    }
+
+
+@pytest.mark.parametrize('symbol, pnl, pnl_percent', [
+    # Shorted at 100: a rise to 110 loses money, a fall to 90 makes it
+    ('AAPL', -100.0, -10.0),
+    ('MSFT', 100.0, 10.0),
+])
+def test_short_position_pnl_percent_has_the_sign_of_its_pnl(symbol, pnl, pnl_percent):
+    valuation = value_positions([('u1', symbol, -10, 100.0)], PRICES)
+
+    p = position(valuation, symbol)
+    assert (p['pnl'], p['pnl_percent']) == (pnl, pnl_percent)
+    assert valuation.total()['pnl_percent'] == pnl_percent
+
+
+def test_totals_divide_by_gross_cost_when_longs_and_shorts_offset():
+    # The net cost basis is 10, which would inflate the total P&L % to 2000%
+    valuation = value_positions([('u1', 'AAPL', 10, 100.0), ('u1', 'MSFT', -11, 90.0)], PRICES)
+
+    total = valuation.total()
+    assert (total['cost_basis'], total['pnl']) == (10.0, 100.0)
+    assert total['pnl_percent'] == round(100 / 1990 * 100, 2)
+    assert valuation.totals() == {'u1': total}
+
+
+def test_totals_are_per_owner_and_unquoted_symbols_are_marked_at_cost():
+    valuation = value_positions([('u1', 'AAPL', 10, 100.0), ('u2', 'MSFT', -10, 100.0),
+                                 ('u2', 'TSLA', 5, 200.0)], PRICES)
+
+    totals = valuation.totals()
+    assert totals['u1']['pnl_percent'] == 10.0
+    assert totals['u2']['pnl'] == 100.0
+    assert totals['u2']['pnl_percent'] == 5.0
+    assert position(valuation, 'TSLA')['pnl'] == 0.0
+
+
+def test_no_positions():
+    valuation = value_positions([], PRICES)
+
+    assert valuation.positions() == []
+    assert valuation.totals() == {}
+    assert valuation.total()['pnl_percent'] == 0.0
@@ -0,0 +1,302 @@
+"""Append-only price tick store with OHLCV rollups.
+
+Ticks are stored on disk in columnar segments, one directory entry per
+segment:
+
+* ``<start>.json``: the symbols of the segment, in column order, and its capacity;
+* ``<start>.ts.npy``: int64 tick timestamps in epoch milliseconds;
+* ``<start>.px.npy``: int32 prices in cents, one row per symbol;
+* ``<start>.vol.npy``: int32 shares traded since the previous tick, one row per symbol.
+
+Each ``.npy`` file is preallocated at the segment's capacity and
+memory-mapped. Appending a tick writes one column, and reading a symbol
+reads one contiguous row. Unused capacity is left sparse on disk. A
+segment covers at most one UTC day, so no bar of up to a day ever spans
+two segments except when a day overflows a segment. Such bars are
+merged when the segments are stitched together.
+
+Bars of a sealed segment never change, so they are computed once per
+(segment, symbol, interval) and kept in an LRU cache. A range query over
+months of ticks therefore concatenates cached bars and only rolls up the
+ticks of the segment still being written.
+
+A store opened with ``readonly=True`` reads segments another process is
+writing, e.g. a web worker reading the shared price publisher's store.
+Each query first picks up new segments and ticks from disk.
+"""
+import json
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+# Interval name -> bar length in milliseconds
+INTERVALS = {'1m': 60_000, '5m': 300_000, '1h': 3_600_000}
+
+DAY_MS = 86_400_000
+
+# One day of 10-second ticks
+SEGMENT_TICKS = 8640
+
+# (segment, symbol, interval) entries of sealed-segment bars kept in memory
+BAR_CACHE_SIZE = 4096
+
+COLUMNS = ('ts', 'px', 'vol')
+
+# Bars returned by default and at most per request
+DEFAULT_CANDLES = 500
+MAX_CANDLES = 5000
+
+
+def parse_candle_query(args):
+    """Returns (interval, start, end, limit) from request args.
+
+    Raises ValueError with a message for the client on bad input.
+    """
+    interval = args.get('interval', '1m')
+    if interval not in INTERVALS:
+        raise ValueError(f"interval must be one of {', '.join(INTERVALS)}")
+    try:
+        start = float(args['start']) if args.get('start') else None
+        end = float(args['end']) if args.get('end') else None
+        limit = int(args.get('limit', DEFAULT_CANDLES))
+    except ValueError:
+        raise ValueError('start and end must be epoch seconds and limit an integer')
+    # float() also accepts 'nan' and 'inf', which no tick timestamp can match
+    if not all(math.isfinite(value) for value in (start, end) if value is not None):
+        raise ValueError('start and end must be epoch seconds and limit an integer')
+    if not 0 < limit <= MAX_CANDLES:
+        raise ValueError(f'limit must be between 1 and {MAX_CANDLES}')
+    return interval, start, end, limit
+
+
+class Segment:
+    """One memory-mapped block of ticks for a fixed list of symbols."""
+
+    def __init__(self, directory, start, symbols, capacity, mode):
+        self.start = start
+        self.symbols = list(symbols)
+        self.index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.capacity = capacity
+        base = os.path.join(directory, str(start))
+        if mode == 'w+':
+            self.ts = open_memmap(base + '.ts.npy', mode='w+', dtype=np.int64, shape=(capacity,))
+            self.px = open_memmap(base + '.px.npy', mode='w+', dtype=np.int32,
+                                  shape=(len(self.symbols), capacity))
+            self.vol = open_memmap(base + '.vol.npy', mode='w+', dtype=np.int32,
+                                   shape=(len(self.symbols), capacity))
+            # Written last: the segment is listed only once its columns exist
+            with open(base + '.json', 'w', encoding='utf-8') as f:
+                json.dump({'start': start, 'symbols': self.symbols, 'capacity': capacity}, f)
+            self.count = 0
+        else:
+            self.ts, self.px, self.vol = (np.load(f'{base}.{column}.npy', mmap_mode=mode)
+                                          for column in COLUMNS)
+            # A tick is committed once its timestamp is written; the rest is unused capacity
+            unused = np.flatnonzero(self.ts == 0)
+            self.count = int(unused[0]) if len(unused) else capacity
+
+    @classmethod
+    def open(cls, directory, start, mode='r'):
+        with open(os.path.join(directory, f'{start}.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        return cls(directory, start, meta['symbols'], meta['capacity'], mode)
+
+    @property
+    def day(self):
+        return self.start // DAY_MS
+
+    def accepts(self, timestamp, symbols):
+        return (self.count < self.capacity and timestamp // DAY_MS == self.day
+                and symbols == self.symbols)
+
+    def append(self, timestamp, cents, volume):
+        i = self.count
+        self.px[:, i] = cents
+        self.vol[:, i] = volume
+        # Written last: a reader or a restart only sees complete ticks
+        self.ts[i] = timestamp
+        self.count = i + 1
+
+    def refresh(self):
+        """Re-reads how many ticks are committed, for a segment another process appends to."""
+        unused = np.flatnonzero(self.ts[self.count:] == 0)
+        self.count += int(unused[0]) if len(unused) else self.capacity - self.count
+
+    def flush(self):
+        for column in (self.ts, self.px, self.vol):
+            if isinstance(column, np.memmap) and column.mode != 'r':
+                column.flush()
+
+    def series(self, symbol, count=None):
+        """Returns (timestamps, cents, volume) of one symbol's first ``count`` ticks."""
+        n = self.count if count is None else count
+        row = self.index[symbol]
+        return self.ts[:n], self.px[row, :n], self.vol[row, :n]
+
+
+def rollup(timestamps, cents, volume, interval_ms):
+    """Rolls ticks up into bars; returns (bar starts, open, high, low, close, volume) arrays."""
+    if not len(timestamps):
+        empty = np.empty(0, dtype=np.int64)
+        return (empty,) * 6
+    bucket = timestamps // interval_ms * interval_ms
+    edges = np.flatnonzero(np.diff(bucket)) + 1
+    starts = np.concatenate(([0], edges))
+    ends = np.concatenate((edges - 1, [len(bucket) - 1]))
+    return (bucket[starts], cents[starts], np.maximum.reduceat(cents, starts),
+            np.minimum.reduceat(cents, starts), cents[ends],
+            np.add.reduceat(volume.astype(np.int64), starts))
+
+
+def merge_bars(bars):
+    """Concatenates bars from consecutive segments, merging bars that share a start."""
+    bars = [b for b in bars if len(b[0])]
+    if not bars:
+        return rollup(np.empty(0, dtype=np.int64), None, None, 1)
+    t, o, h, l, c, v = (np.concatenate(column) for column in zip(*bars))
+    if len(bars) == 1 or not (np.diff(t) == 0).any():
+        return t, o, h, l, c, v
+    edges = np.flatnonzero(np.diff(t)) + 1
+    starts = np.concatenate(([0], edges))
+    ends = np.concatenate((edges - 1, [len(t) - 1]))
+    return (t[starts], o[starts], np.maximum.reduceat(h, starts), np.minimum.reduceat(l, starts),
+            c[ends], np.add.reduceat(v, starts))
+
+
+class TickStore:
+    """Appends full-universe price ticks and serves OHLCV bars for one symbol at a time.
+
+    One thread (the price updater) appends; any number of request threads
+    read. Volume recorded with ``add_volume()`` is attached to the next tick.
+    With ``readonly=True`` the store only serves candles.
+    """
+
+    def __init__(self, directory, symbols, segment_ticks=SEGMENT_TICKS, cache_size=BAR_CACHE_SIZE,
+                 readonly=False):
+        self.directory = directory
+        self.symbols = list(symbols)
+        self.segment_ticks = segment_ticks
+        self.cache_size = cache_size
+        self.readonly = readonly
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._volume = np.zeros(len(self.symbols), dtype=np.int64)
+        self._symbol_index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self._bars = OrderedDict()
+        starts = sorted(int(name[:-5]) for name in os.listdir(directory) if name.endswith('.json'))
+        self._segments = [Segment.open(directory, start) for start in starts[:-1]]
+        self._active = None
+        if starts:
+            # Keep appending to the last segment after a restart
+            self._active = Segment.open(directory, starts[-1], mode='r' if readonly else 'r+')
+            self._segments.append(self._active)
+
+    def add_volume(self, symbol, quantity):
+        """Records traded shares, to be attached to the next tick."""
+        i = self._symbol_index.get(symbol)
+        if i is not None:
+            with self._lock:
+                self._volume[i] += int(quantity)
+
+    def append(self, prices, timestamp=None):
+        """Appends one tick of ``prices`` (aligned with the store's symbols) at ``timestamp`` seconds."""
+        if self.readonly:
+            raise RuntimeError('Tick store is read-only')
+        ms = int((time.time() if timestamp is None else timestamp) * 1000)
+        cents = np.rint(np.asarray(prices, dtype=np.float64) * 100).astype(np.int32)
+        with self._lock:
+            volume = np.minimum(self._volume, np.iinfo(np.int32).max).astype(np.int32)
+            self._volume[:] = 0
+        active = self._active
+        if active is not None and active.count and ms <= int(active.ts[active.count - 1]):
+            # Timestamps must increase for range lookups; nudge a tick that arrives early
+            ms = int(active.ts[active.count - 1]) + 1
+        if active is None or not active.accepts(ms, self.symbols):
+            active = self._roll(ms)
+        active.append(ms, cents, volume)
+
+    def candles(self, symbol, interval, start=None, end=None, limit=DEFAULT_CANDLES):
+        """Returns up to ``limit`` bars as [start seconds, open, high, low, close, volume] lists.
+
+        Bars are those starting in [start, end) seconds, newest ``limit``
+        kept; ``end`` defaults to now and ``start`` to ``limit`` bars before it.
+        """
+        interval_ms = INTERVALS[interval]
+        end_ms = int((time.time() if end is None else end) * 1000)
+        start_ms = (end_ms - limit * interval_ms if start is None else int(start * 1000))
+        start_ms = start_ms // interval_ms * interval_ms
+
+        if self.readonly:
+            self._reload()
+        with self._lock:
+            segments = list(self._segments)
+            active = self._active
+        # A segment runs until the next one starts
+        bars = []
+        for i, segment in enumerate(segments):
+            if symbol not in segment.index or segment.start >= end_ms:
+                continue
+            if i + 1 < len(segments) and segments[i + 1].start <= start_ms:
+                continue
+            bars.append(self._segment_bars(segment, symbol, interval_ms, segment is active))
+
+        t, o, h, l, c, v = merge_bars(bars)
+        lo, hi = np.searchsorted(t, [start_ms, end_ms])
+        lo = max(lo, hi - limit)
+        return [
+            [ts // 1000, op / 100, hp / 100, lp / 100, cp / 100, vol]
+            for ts, op, hp, lp, cp, vol in zip(t[lo:hi].tolist(), o[lo:hi].tolist(), h[lo:hi].tolist(),
+                                               l[lo:hi].tolist(), c[lo:hi].tolist(), v[lo:hi].tolist())
+        ]
+
+    def close(self):
+        """Flushes the segment being written."""
+        if self._active is not None:
+            self._active.flush()
+
+    def _segment_bars(self, segment, symbol, interval_ms, active):
+        if active:
+            # Still growing: roll up the ticks committed so far
+            return rollup(*segment.series(symbol, segment.count), interval_ms)
+        key = (segment.start, symbol, interval_ms)
+        with self._lock:
+            bars = self._bars.get(key)
+            if bars is not None:
+                self._bars.move_to_end(key)
+                return bars
+        bars = rollup(*segment.series(symbol), interval_ms)
+        with self._lock:
+            self._bars[key] = bars
+            while len(self._bars) > self.cache_size:
+                self._bars.popitem(last=False)
+        return bars
+
+    def _reload(self):
+        """Picks up ticks and segments the writing process added since the last query."""
+        with self._lock:
+            known = self._active.start if self._active is not None else -1
+            starts = sorted(int(name[:-5]) for name in os.listdir(self.directory)
+                            if name.endswith('.json') and int(name[:-5]) > known)
+            if self._active is not None:
+                # The writer may have added ticks to the last segment before sealing it
+                self._active.refresh()
+            for start in starts:
+                self._active = Segment.open(self.directory, start)
+                self._segments.append(self._active)
+
+    def _roll(self, ms):
+        """Seals the active segment and starts a new one at ``ms``."""
+        previous = self._active
+        if previous is not None:
+            previous.flush()
+        segment = Segment(self.directory, ms, self.symbols, self.segment_ticks, 'w+')
+        with self._lock:
+            self._segments.append(segment)
+            self._active = segment
+        return segment
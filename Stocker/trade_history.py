@@ -0,0 +1,133 @@
+"""Keyset-paginated trade history.
+
+Pages are ordered newest first by (timestamp, id). Instead of an OFFSET,
+each page ends with an opaque cursor holding the position of its last row,
+and the next page starts strictly after it. Every page therefore costs
+the same index range scan no matter how deep into the history it is.
+"""
+import base64
+import json
+from datetime import datetime, timedelta
+
+PAGE_SIZE = 50
+TRADE_TYPES = ('BUY', 'SELL')
+DATE_FORMAT = '%Y-%m-%d'
+
+
+def encode_cursor(position):
+    """Encodes a JSON-serializable page position as a URL-safe token."""
+    raw = json.dumps(position, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Decodes a token from encode_cursor(), returning None if absent or malformed.
+
+    Backends only ever encode a list (SQLite, memory) or a dict (DynamoDB
+    key), so any other JSON value counts as malformed.
+    """
+    if not token:
+        return None
+    try:
+        position = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+    except (ValueError, TypeError):
+        return None
+    return position if isinstance(position, (list, dict)) else None
+
+
+def parse_filters(args, symbols):
+    """Returns the valid history filters from request args as a dict.
+
+    Keys are only present when set: ``symbol``, ``type`` and the inclusive
+    ``start``/``end`` dates in YYYY-MM-DD form.
+    """
+    filters = {}
+    symbol = args.get('symbol', '').upper()
+    if symbol in symbols:
+        filters['symbol'] = symbol
+    trade_type = args.get('type', '').upper()
+    if trade_type in TRADE_TYPES:
+        filters['type'] = trade_type
+    for name in ('start', 'end'):
+        value = args.get(name, '')
+        try:
+            datetime.strptime(value, DATE_FORMAT)
+        except ValueError:
+            continue
+        filters[name] = value
+    return filters
+
+
+def timestamp_bounds(filters):
+    """Returns (lower, upper) timestamp strings for the date filters.
+
+    ``lower`` is inclusive and ``upper`` exclusive; either may be None. Both
+    compare correctly against SQLite's 'YYYY-MM-DD HH:MM:SS' timestamps and
+    the ISO timestamps stored in DynamoDB.
+    """
+    lower = filters.get('start')
+    upper = None
+    if 'end' in filters:
+        end = datetime.strptime(filters['end'], DATE_FORMAT) + timedelta(days=1)
+        upper = end.strftime(DATE_FORMAT)
+    return lower, upper
+
+
+def filter_clauses(filters):
+    """Returns (clauses, params) restricting trades aliased ``t`` to the given filters."""
+    clauses = []
+    params = []
+    if 'symbol' in filters:
+        clauses.append('t.stock_symbol = ?')
+        params.append(filters['symbol'])
+    if 'type' in filters:
+        clauses.append('t.type = ?')
+        params.append(filters['type'])
+    lower, upper = timestamp_bounds(filters)
+    if lower:
+        clauses.append('t.timestamp >= ?')
+        params.append(lower)
+    if upper:
+        clauses.append('t.timestamp < ?')
+        params.append(upper)
+    return clauses, params
+
+
+USER_COLUMNS = 't.stock_symbol, t.qty, t.price, t.type, t.timestamp, t.id'
+ADMIN_COLUMNS = 'u.username, t.stock_symbol, t.qty, t.price, t.type, t.timestamp, t.id'
+
+
+def fetch_trades_page(conn, filters, cursor=None, user_id=None, limit=PAGE_SIZE):
+    """Returns (rows, next_cursor) for one page of trades from SQLite.
+
+    With ``user_id`` the rows are (stock_symbol, qty, price, type, timestamp, id);
+    without it they span all users and start with the username.
+    """
+    clauses = []
+    params = []
+    if user_id is not None:
+        sql = f'SELECT {USER_COLUMNS} FROM trades t'
+        clauses.append('t.user_id = ?')
+        params.append(user_id)
+    else:
+        sql = f'SELECT {ADMIN_COLUMNS} FROM trades t JOIN users u ON t.user_id = u.id'
+
+    filter_sql, filter_params = filter_clauses(filters)
+    clauses.extend(filter_sql)
+    params.extend(filter_params)
+    if cursor is not None:
+        clauses.append('(t.timestamp, t.id) < (?, ?)')
+        params.extend(cursor)
+
+    if clauses:
+        sql += ' WHERE ' + ' AND '.join(clauses)
+    sql += ' ORDER BY t.timestamp DESC, t.id DESC LIMIT ?'
+    params.append(limit + 1)
+
+    rows = conn.execute(sql, params).fetchall()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor([last[-2], last[-1]])
+    return rows, next_cursor
@@ -0,0 +1,213 @@
+"""Trade execution engine for the SQLite backend.
+
+A trade is recorded and applied to the portfolio inside a single
+``BEGIN IMMEDIATE`` transaction. The position update is one UPSERT that
+computes the new quantity and weighted average price in SQL, so concurrent
+orders for the same user and symbol serialize on the write lock instead of
+racing on a read-modify-write. In the same transaction the fill is applied
+to the position's open lots (see lots.py), which records realized P&L and
+sets the average price to the cost of the lots still open.
+
+A sell of more shares than the user holds is rejected with ValueError,
+as the DynamoDB backend does. The holding is read after the write lock
+is taken, so two concurrent sells cannot both pass the check.
+"""
+from lots import FIFO, apply_fills
+
+TRADE_TYPES = ('BUY', 'SELL')
+
+# Largest quantity one order may trade; keeps quantities and their running
+# totals well inside SQLite's 64-bit INTEGER range
+MAX_QUANTITY = 10 ** 9
+
+INSERT_TRADE = '''
+    INSERT INTO trades (user_id, stock_symbol, qty, price, type)
+    VALUES (?, ?, ?, ?, ?)
+'''
+
+SELECT_HELD = '''
+    SELECT quantity FROM portfolio WHERE user_id = ? AND stock_symbol = ?
+'''
+
+SELECT_HOLDINGS = '''
+    SELECT stock_symbol, quantity FROM portfolio WHERE user_id = ?
+'''
+
+# :delta is the signed change in quantity, :buy_qty/:buy_cost the shares and
+# notional bought. Sells leave the average price untouched.
+UPSERT_POSITION = '''
+    INSERT INTO portfolio (user_id, stock_symbol, quantity, avg_price)
+    VALUES (:user_id, :symbol, :delta, :open_price)
+    ON CONFLICT (user_id, stock_symbol) DO UPDATE SET
+        avg_price = CASE
+            WHEN :buy_qty > 0 AND quantity + :buy_qty != 0
+            THEN (quantity * avg_price + :buy_cost) / (quantity + :buy_qty)
+            ELSE avg_price
+        END,
+        quantity = quantity + :delta
+    RETURNING quantity, avg_price
+'''
+
+DELETE_CLOSED_POSITION = '''
+    DELETE FROM portfolio
+    WHERE user_id = ? AND stock_symbol = ? AND quantity = 0
+'''
+
+
+def validate_order(symbol, quantity, trade_type, prices):
+    """Raises ValueError if the order cannot be executed against ``prices``."""
+    if trade_type not in TRADE_TYPES:
+        raise ValueError(f'Invalid trade type: {trade_type}')
+    if symbol not in prices:
+        raise ValueError('Invalid stock symbol!')
+    if quantity <= 0:
+        raise ValueError('Quantity must be a positive number.')
+    if quantity > MAX_QUANTITY:
+        raise ValueError(f'Quantity cannot exceed {MAX_QUANTITY:,} shares.')
+
+
+def validate_sell(symbol, quantity, held):
+    """Raises ValueError if selling ``quantity`` shares would sell more than the ``held`` ones."""
+    if held <= 0:
+        raise ValueError(f'You do not own any shares of {symbol} to sell.')
+    if quantity > held:
+        raise ValueError(f'You only own {held} shares of {symbol}. Cannot sell more than you own.')
+
+
+def position_params(user_id, symbol, delta, buy_qty, buy_cost, open_price):
+    """Builds the named parameters for UPSERT_POSITION."""
+    return {
+        'user_id': user_id,
+        'symbol': symbol,
+        'delta': delta,
+        'buy_qty': buy_qty,
+        'buy_cost': buy_cost,
+        'open_price': open_price,
+    }
+
+
+def apply_position(cursor, params):
+    """Applies one position change and returns the resulting (quantity, avg_price)."""
+    quantity, avg_price = cursor.execute(UPSERT_POSITION, params).fetchone()
+    if quantity == 0:
+        cursor.execute(DELETE_CLOSED_POSITION, (params['user_id'], params['symbol']))
+    return quantity, avg_price
+
+
+def execute_trade(conn, user_id, symbol, quantity, price, trade_type, method=FIFO):
+    """Records a trade and updates the position and its lots atomically.
+
+    Returns the position after the trade as (quantity, avg_price); a
+    quantity of 0 means the position was closed. Raises ValueError for an
+    oversell.
+    """
+    if trade_type == 'BUY':
+        params = position_params(user_id, symbol, quantity, quantity, quantity * price, price)
+    else:
+        params = position_params(user_id, symbol, -quantity, 0, 0, price)
+
+    cursor = conn.cursor()
+    cursor.execute('BEGIN IMMEDIATE')
+    try:
+        if trade_type == 'SELL':
+            row = cursor.execute(SELECT_HELD, (user_id, symbol)).fetchone()
+            validate_sell(symbol, quantity, row[0] if row else 0)
+        cursor.execute(INSERT_TRADE, (user_id, symbol, quantity, price, trade_type))
+        held, avg_price = apply_position(cursor, params)
+        avg_cost = apply_fills(cursor, user_id, symbol, [(params['delta'], price)], method)
+        position = (held, avg_price if avg_cost is None else avg_cost)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return position
+
+
+def parse_order(order):
+    """Normalizes one JSON order into (symbol, quantity, trade_type)."""
+    if not isinstance(order, dict):
+        raise ValueError('Order must be an object.')
+    symbol = str(order.get('stock_symbol', '')).upper()
+    trade_type = str(order.get('trade_type', '')).upper()
+    quantity = order.get('quantity')
+    if isinstance(quantity, bool) or not isinstance(quantity, (int, str)):
+        raise ValueError('Quantity must be a whole number.')
+    try:
+        quantity = int(quantity)
+    except ValueError:
+        raise ValueError('Quantity must be a whole number.')
+    return symbol, quantity, trade_type
+
+
+def execute_batch(conn, user_id, orders, prices, method=FIFO):
+    """Executes a batch of orders for one user against a single price snapshot.
+
+    Every valid order is filled at the snapshot price. All trades are
+    written with one executemany and the position changes are netted per
+    symbol, then applied in the same transaction. Each symbol's fills are
+    applied to its lots in submission order, the same order a replay of
+    the trades table uses, and the average price follows the open lots.
+
+    A sell is rejected if it would sell more than the user holds after the
+    orders before it in the batch.
+
+    Returns one result dict per order, in submission order.
+    """
+    results = []
+    valid = []
+    for index, order in enumerate(orders):
+        try:
+            symbol, quantity, trade_type = parse_order(order)
+            validate_order(symbol, quantity, trade_type, prices)
+        except ValueError as e:
+            results.append({'index': index, 'status': 'rejected', 'error': str(e)})
+            continue
+        results.append(None)
+        valid.append((index, symbol, quantity, trade_type))
+
+    if not valid:
+        return results
+
+    cursor = conn.cursor()
+    cursor.execute('BEGIN IMMEDIATE')
+    try:
+        held = dict(cursor.execute(SELECT_HOLDINGS, (user_id,)).fetchall())
+        trade_rows = []
+        netted = {}
+        for index, symbol, quantity, trade_type in valid:
+            if trade_type == 'SELL':
+                try:
+                    validate_sell(symbol, quantity, held.get(symbol, 0))
+                except ValueError as e:
+                    results[index] = {'index': index, 'status': 'rejected', 'error': str(e)}
+                    continue
+
+            price = prices[symbol]
+            trade_rows.append((user_id, symbol, quantity, price, trade_type))
+            net = netted.setdefault(symbol, {'delta': 0, 'buy_qty': 0, 'buy_cost': 0, 'sell_price': price,
+                                             'fills': []})
+            if trade_type == 'BUY':
+                held[symbol] = held.get(symbol, 0) + quantity
+                net['delta'] += quantity
+                net['buy_qty'] += quantity
+                net['buy_cost'] += quantity * price
+                net['fills'].append((quantity, price))
+            else:
+                held[symbol] -= quantity
+                net['delta'] -= quantity
+                net['fills'].append((-quantity, price))
+            results[index] = {'index': index, 'status': 'filled', 'stock_symbol': symbol,
+                              'trade_type': trade_type, 'quantity': quantity, 'price': price}
+
+        if trade_rows:
+            cursor.executemany(INSERT_TRADE, trade_rows)
+        for symbol, net in netted.items():
+            open_price = net['buy_cost'] / net['buy_qty'] if net['buy_qty'] else net['sell_price']
+            apply_position(cursor, position_params(
+                user_id, symbol, net['delta'], net['buy_qty'], net['buy_cost'], open_price))
+            apply_fills(cursor, user_id, symbol, net['fills'], method)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return results
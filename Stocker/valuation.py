@@ -0,0 +1,108 @@
+"""Vectorized mark-to-market valuation.
+
+Positions are (owner, symbol, quantity, avg_price) tuples from either
+backend. ``value_positions()`` prices all of them against one snapshot in
+a single NumPy pass. Each symbol's quote is looked up once, then market
+value, cost basis, unrealized P&L and P&L % are computed as whole-array
+operations. Per-owner totals come from one bincount per measure, so
+valuing every user for the admin pages costs the same few array
+operations as valuing one.
+
+Positions in a symbol with no quote are marked at their average price.
+P&L % is P&L over the absolute cost basis, so a short position that
+loses money shows a negative percentage, as a long one does.
+"""
+import numpy as np
+
+
+def _round(value):
+    return round(float(value), 2)
+
+
+class Valuation:
+    """The valuation of a set of positions against one price snapshot."""
+
+    def __init__(self, positions, prices):
+        positions = list(positions)
+        n = len(positions)
+        self.owners = [p[0] for p in positions]
+        self.symbols = [p[1] for p in positions]
+        self.quantities = [p[2] for p in positions]
+        quantity = np.fromiter((p[2] for p in positions), np.float64, n)
+        avg_price = np.fromiter((p[3] for p in positions), np.float64, n)
+
+        # One quote lookup per distinct symbol, then a gather per position
+        symbols, symbol_index = np.unique(np.asarray(self.symbols, dtype=object), return_inverse=True)
+        quotes = np.array([float(prices.get(s, np.nan)) for s in symbols], dtype=np.float64)
+        price = quotes[symbol_index] if n else np.empty(0)
+        price = np.where(np.isnan(price), avg_price, price)
+
+        self.avg_price = avg_price
+        self.price = price
+        self.market_value = quantity * price
+        self.cost_basis = quantity * avg_price
+        # Capital at stake, whichever side the position is on
+        self.gross_cost = np.abs(self.cost_basis)
+        self.pnl = self.market_value - self.cost_basis
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.pnl_percent = np.where(self.gross_cost != 0, self.pnl / self.gross_cost * 100, 0.0)
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def positions(self):
+        """Returns one dict per position, in input order, with values rounded to cents."""
+        return [
+            {
+                'owner': owner,
+                'symbol': symbol,
+                'quantity': quantity,
+                'avg_price': _round(avg),
+                'price': _round(price),
+                'market_value': _round(value),
+                'cost_basis': _round(cost),
+                'pnl': _round(pnl),
+                'pnl_percent': _round(pct),
+            }
+            for owner, symbol, quantity, avg, price, value, cost, pnl, pct in zip(
+                self.owners, self.symbols, self.quantities, self.avg_price.tolist(),
+                self.price.tolist(), self.market_value.tolist(), self.cost_basis.tolist(),
+                self.pnl.tolist(), self.pnl_percent.tolist())
+        ]
+
+    def totals(self):
+        """Returns {owner: totals} with the same fields as ``total()``."""
+        if not self.owners:
+            return {}
+        owners, owner_index = np.unique(np.asarray(self.owners, dtype=object), return_inverse=True)
+        k = len(owners)
+        counts = np.bincount(owner_index, minlength=k)
+        value = np.bincount(owner_index, weights=self.market_value, minlength=k)
+        cost = np.bincount(owner_index, weights=self.cost_basis, minlength=k)
+        gross = np.bincount(owner_index, weights=self.gross_cost, minlength=k)
+        return {
+            owner: _totals(int(c), v, b, g)
+            for owner, c, v, b, g in zip(owners.tolist(), counts.tolist(), value.tolist(), cost.tolist(),
+                                         gross.tolist())
+        }
+
+    def total(self):
+        """Returns positions, market_value, cost_basis, pnl and pnl_percent across all positions."""
+        return _totals(len(self), self.market_value.sum(), self.cost_basis.sum(), self.gross_cost.sum())
+
+
+def _totals(count, market_value, cost_basis, gross_cost):
+    # P&L % is over the gross cost, so shorts cannot flip or cancel out its sign
+    pnl = market_value - cost_basis
+    return {
+        'positions': count,
+        'market_value': _round(market_value),
+        'cost_basis': _round(cost_basis),
+        'pnl': _round(pnl),
+        'pnl_percent': _round(pnl / gross_cost * 100) if gross_cost else 0.0,
+    }
+
+
+def value_positions(positions, prices):
+    """Values (owner, symbol, quantity, avg_price) positions against a {symbol: price} map."""
+    return Valuation(positions, prices)
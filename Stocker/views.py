@@ -0,0 +1,612 @@
+"""The web app's routes, shared by every storage backend.
+
+app.py (SQLite), aws_app.py (DynamoDB) and memory_app.py (in memory)
+each build a ``Stocker`` from their Storage and Market and pass it to
+``create_app()``. The views below reach it through ``current_stocker()``,
+so one set of routes serves every backend.
+
+The session keeps the user's ``id`` as returned by the backend (the
+email for DynamoDB) under ``user_id``, and their email for notifications.
+"""
+import click
+from flask import Flask, Response, current_app, flash, g, jsonify, redirect, render_template, request, session, url_for
+
+from app_factory import RouteRegistry, Services
+from cache import PortfolioCache
+from exports import EXPORT_FORMATS, encode_rows, export_filename
+from lots import pnl_report
+from market import DEFAULT_SHARED_PRICES, SHARED_PRICES
+from metrics import (PROFILE_SLOW_MS, REGISTRY, SlowRequestProfiler, TrackedStream, begin_request, detach_request,
+                     end_request, finish_request)
+from passwords import PasswordHasher, PasswordHasherBusy
+from price_stream import MAX_STREAMS, StreamLimiter, parse_last_seq, price_events
+from storage import EXPORT_COLUMNS
+from tick_store import parse_candle_query
+from trade_history import decode_cursor, parse_filters
+from trading import validate_order
+from valuation import value_positions
+
+# Views are declared with @routes.route and attached by create_app()
+routes = RouteRegistry()
+
+PORTFOLIO_CACHE_SIZE = 1024
+# Seconds a user's cached positions live; bounds how long a trade handled
+# by another worker process (gunicorn -w N) goes unseen
+PORTFOLIO_CACHE_TTL = 2.0
+MAX_BATCH_ORDERS = 1000
+# Responses that last as long as the client stays connected; the slow
+# request profiler would log every one of them, so it skips them
+UNPROFILED_ENDPOINTS = frozenset({'stock_price_stream'})
+
+
+class Stocker:
+    """One backend's storage and market, plus the state the views keep around them.
+
+    ``notify(subject, message, email=None)`` sends a notification, e.g.
+    through SNS; by default nothing is sent. ``starters`` are extra
+    background services to start before the storage's and the market's.
+    ``passwords`` hashes and checks passwords (see passwords.py).
+    ``max_price_streams`` caps the open price streams (see price_stream.py).
+    """
+
+    def __init__(self, storage, market, notify=None, starters=(), passwords=None,
+                 portfolio_cache_size=PORTFOLIO_CACHE_SIZE, portfolio_cache_ttl=PORTFOLIO_CACHE_TTL,
+                 max_price_streams=MAX_STREAMS):
+        self.storage = storage
+        self.market = market
+        self.notify = notify or (lambda subject, message, email=None: None)
+        self.passwords = passwords or PasswordHasher()
+        # Per-user positions, kept current by trades so page loads skip the backend
+        self.portfolio_cache = PortfolioCache(portfolio_cache_size, symbol_of=lambda position: position[1],
+                                              ttl=portfolio_cache_ttl)
+        self.price_streams = StreamLimiter(max_price_streams)
+        # Opt-in: STOCKER_PROFILE_SLOW_MS=<ms> logs the sampled stacks of slower requests
+        self.profiler = SlowRequestProfiler(float(PROFILE_SLOW_MS)) if PROFILE_SLOW_MS else None
+        if self.profiler:
+            starters = (*starters, self.profiler.start)
+        self.services = Services(*starters, storage.start, market.start)
+        REGISTRY.add_stats('stocker_portfolio_cache', self.portfolio_cache.stats)
+        REGISTRY.add_stats('stocker_password_hasher', self.passwords.stats)
+        REGISTRY.add_stats('stocker_price_streams', self.price_streams.stats)
+
+    def start_services(self):
+        """Starts the background services once per process; returns False if already running."""
+        return self.services.start()
+
+    def positions(self, user_id):
+        """Returns the user's positions, from the cache when possible."""
+        return self.portfolio_cache.get(user_id, lambda: self.storage.positions(user_id))
+
+    def value_portfolio(self, user_id, prices):
+        """Values the user's positions against a {symbol: price} map."""
+        return value_positions(self.positions(user_id), prices)
+
+    def value_all_portfolios(self, prices):
+        """Returns (positions with their last change, valuation) for every user."""
+        positions = self.storage.all_positions()
+        return positions, value_positions([p[:4] for p in positions], prices)
+
+    def execute_trade(self, user_id, symbol, quantity, price, trade_type):
+        """Executes one trade and writes the resulting position through to the cache."""
+        with self.portfolio_cache.writing(user_id):
+            position = self.storage.execute_trade(user_id, symbol, quantity, price, trade_type)
+            self.portfolio_cache.set_position(user_id, symbol, position)
+        self.market.record_volume(symbol, quantity)
+        return position
+
+    def execute_batch(self, user_id, orders, prices):
+        """Executes a batch of JSON orders against one price map; returns the per-order results."""
+        with self.portfolio_cache.writing(user_id):
+            try:
+                results = self.storage.execute_batch(user_id, orders, prices)
+            finally:
+                # Even a failed batch may have written some orders
+                self.portfolio_cache.invalidate(user_id)
+        for r in results:
+            if r['status'] == 'filled':
+                self.market.record_volume(r['stock_symbol'], r['quantity'])
+        return results
+
+
+def current_stocker():
+    """Returns the Stocker of the app handling the current request."""
+    return current_app.extensions['stocker']
+
+
+def create_app(stocker, secret_key, registry=None, start_services=False):
+    """Builds a Flask app serving ``stocker``, without touching storage, disk or threads.
+
+    ``registry`` adds backend-specific routes and commands. Pass
+    ``start_services=True`` from a process that serves requests.
+    """
+    app = Flask(__name__)
+    app.secret_key = secret_key
+    app.extensions['stocker'] = stocker
+    routes.init_app(app)
+    if registry is not None:
+        registry.init_app(app)
+    if start_services:
+        stocker.start_services()
+    return app
+
+
+def request_profiler():
+    """Returns the slow request profiler, or None if off or the endpoint is not profiled."""
+    if request.endpoint in UNPROFILED_ENDPOINTS:
+        return None
+    return current_stocker().profiler
+
+@routes.before_request
+def begin_request_metrics():
+    begin_request(request.endpoint)
+    profiler = request_profiler()
+    if profiler:
+        profiler.begin()
+
+@routes.after_request
+def record_response_status(response):
+    g.response_status = response.status_code
+    # A streamed body is sent after teardown, so its request is finished when the body is
+    if response.is_streamed and not response.direct_passthrough:
+        stats = detach_request()
+        if stats is not None:
+            profiler = request_profiler()
+            method, path, status = request.method, request.path, response.status_code
+
+            def finish(stats):
+                finish_request(stats, method, status)
+                if profiler:
+                    profiler.end(stats, method, path, status)
+
+            response.response = TrackedStream(response.response, stats, finish)
+    return response
+
+@routes.teardown_request
+def end_request_metrics(exception):
+    status = 500 if exception is not None else g.get('response_status', 500)
+    stats = end_request(request.method, status)
+    profiler = request_profiler()
+    if profiler and stats:
+        profiler.end(stats, request.method, request.path, status)
+
+@routes.route('/')
+def index():
+    return render_template('index.html')
+
+@routes.route('/signup', methods=['GET', 'POST'])
+def signup():
+    if request.method == 'POST':
+        username = request.form['username']
+        email = request.form['email']
+        password = request.form['password']
+        role = request.form['role']
+
+        stocker = current_stocker()
+        try:
+            if stocker.storage.username_exists(username):
+                flash('Username or email already exists!', 'error')
+                return render_template('signup.html')
+            if not stocker.storage.create_user(username, email, stocker.passwords.hash(password), role):
+                flash('Username or email already exists!', 'error')
+                return render_template('signup.html')
+        except PasswordHasherBusy as e:
+            flash(str(e), 'error')
+            return render_template('signup.html'), 503
+        except Exception as e:
+            flash(f'Error creating account: {str(e)}', 'error')
+            return render_template('signup.html')
+
+        stocker.notify('Welcome to Stocker', f'Thank you {username} for signing up as a {role}', email)
+        flash('Account created successfully!', 'success')
+        return redirect(url_for('login'))
+
+    return render_template('signup.html')
+
+@routes.route('/check_username')
+def check_username():
+    username = request.args.get('username', '')
+    try:
+        return jsonify({'exists': current_stocker().storage.username_exists(username)})
+    except Exception as e:
+        print(f"Error checking username: {e}")
+        return jsonify({'exists': False})
+
+@routes.route('/login', methods=['GET', 'POST'])
+def login():
+    if request.method == 'POST':
+        email = request.form['email']
+        password = request.form['password']
+        role = request.form['role']
+
+        stocker = current_stocker()
+        try:
+            user = stocker.storage.find_user(email)
+            matches = False
+            if user and user['role'] == role:
+                # Runs on the hashing pool; a legacy or outdated hash comes back upgraded
+                matches, rehashed = stocker.passwords.check(password, user['password'])
+                if rehashed:
+                    stocker.storage.set_password(email, rehashed)
+        except PasswordHasherBusy as e:
+            flash(str(e), 'error')
+            return render_template('login.html'), 503
+        except Exception as e:
+            flash(f'Login error: {str(e)}', 'error')
+            return render_template('login.html')
+
+        if matches:
+            session['user_id'] = user['id']
+            session['username'] = user['username']
+            session['email'] = user['email']
+            session['role'] = user['role']
+            flash('Login successful!', 'success')
+
+            if role == 'Admin':
+                return redirect(url_for('admin_dashboard'))
+            else:
+                return redirect(url_for('dashboard'))
+        else:
+            flash('Incorrect email/password or role mismatch!', 'error')
+
+    return render_template('login.html')
+
+@routes.route('/logout')
+def logout():
+    session.clear()
+    return redirect(url_for('index'))
+
+@routes.route('/dashboard')
+def dashboard():
+    if 'user_id' not in session or session['role'] != 'Trader':
+        return redirect(url_for('login'))
+
+    stocker = current_stocker()
+    snapshot = stocker.market.board.current()
+    try:
+        # Value the user's portfolio against one price snapshot
+        valuation = stocker.value_portfolio(session['user_id'], snapshot.prices)
+    except Exception as e:
+        print(f"Error fetching portfolio for dashboard: {e}")
+        flash(f"Error loading dashboard: {e}", 'error')
+        valuation = value_positions([], snapshot.prices)
+
+    return render_template('dashboard.html', stocks=snapshot.prices, positions=valuation.positions(),
+                           totals=valuation.total(), valuation_seq=snapshot.seq)
+
+@routes.route('/trade', methods=['GET', 'POST'])
+def trade():
+    if 'user_id' not in session or session['role'] != 'Trader':
+        return redirect(url_for('login'))
+
+    stocker = current_stocker()
+    stock_prices = stocker.market.board.current().prices
+
+    if request.method == 'POST':
+        stock_symbol = request.form['stock_symbol'].upper()
+        trade_type = request.form['trade_type']
+        try:
+            quantity = int(request.form['quantity'])
+        except ValueError:
+            flash('Invalid quantity. Please enter a number.', 'error')
+            return redirect(url_for('trade'))
+
+        try:
+            validate_order(stock_symbol, quantity, trade_type, stock_prices)
+        except ValueError as e:
+            flash(str(e), 'error')
+            return redirect(url_for('trade'))
+
+        price = stock_prices[stock_symbol]
+
+        try:
+            # Trade record and position change commit together, or not at all
+            stocker.execute_trade(session['user_id'], stock_symbol, quantity, price, trade_type)
+        except ValueError as e:
+            # Rejected by the backend, e.g. an oversell on DynamoDB
+            flash(str(e), 'error')
+            return redirect(url_for('trade'))
+        except Exception as e:
+            flash(f'Trade error: {str(e)}', 'error')
+            return render_template('trade.html', stocks=stock_prices)
+
+        stocker.notify(
+            'Trade Confirmation',
+            f'Your {trade_type} order for {quantity} shares of {stock_symbol} at ${price:.2f} has been executed.',
+            session.get('email')
+        )
+        flash(f'{trade_type} order completed successfully!', 'success')
+        return redirect(url_for('dashboard'))
+
+    return render_template('trade.html', stocks=stock_prices)
+
+@routes.route('/portfolio')
+def portfolio():
+    if 'user_id' not in session or session['role'] != 'Trader':
+        return redirect(url_for('login'))
+
+    stocker = current_stocker()
+    snapshot = stocker.market.board.current()
+    try:
+        valuation = stocker.value_portfolio(session['user_id'], snapshot.prices)
+    except Exception as e:
+        print(f"Error fetching portfolio: {e}")
+        flash(f"Error loading portfolio: {e}", 'error')
+        valuation = value_positions([], snapshot.prices)
+
+    return render_template('portfolio.html', positions=valuation.positions(),
+                           totals=valuation.total(), valuation_seq=snapshot.seq)
+
+@routes.route('/history')
+def history():
+    if 'user_id' not in session or session['role'] != 'Trader':
+        return redirect(url_for('login'))
+
+    stocker = current_stocker()
+    symbols = stocker.market.symbols
+    filters = parse_filters(request.args, symbols)
+    cursor = decode_cursor(request.args.get('cursor'))
+    if cursor is None and request.args.get('cursor'):
+        return jsonify({'error': 'Invalid cursor'}), 400
+    try:
+        trades, next_cursor = stocker.storage.trades_page(filters, cursor, user_id=session['user_id'])
+    except Exception as e:
+        print(f"Error fetching transaction history: {e}")
+        flash(f"Error loading history: {e}", 'error')
+        trades, next_cursor = [], None
+
+    return render_template('history.html', trades=trades, next_cursor=next_cursor,
+                           filters=filters, symbols=symbols)
+
+@routes.route('/help', methods=['GET', 'POST'])
+def help():
+    if request.method == 'POST':
+        # Ensure user is logged in to associate help request
+        if 'user_id' not in session:
+            flash('Please log in to send a help request.', 'error')
+            return redirect(url_for('login'))
+
+        message = request.form.get('message', '')
+        if not message.strip():
+            flash('Message cannot be empty.', 'error')
+            return redirect(url_for('help'))
+
+        current_stocker().notify(
+            'Help Request from Stocker',
+            f'User {session.get("username", "Unknown")} ({session.get("email", "N/A")}) sent: {message}'
+        )
+        flash('Your message was sent!', 'success')
+        return redirect(url_for('help'))
+
+    return render_template('help.html')
+
+@routes.route('/admin_dashboard')
+def admin_dashboard():
+    if 'user_id' not in session or session['role'] != 'Admin':
+        return redirect(url_for('login'))
+
+    try:
+        # Counters are kept up to date at signup and trade time
+        stats = current_stocker().storage.read_stats()
+    except Exception as e:
+        print(f"Error fetching admin dashboard data: {e}")
+        flash(f"Error loading admin dashboard: {e}", 'error')
+        stats = dict.fromkeys(('traders', 'trades', 'notional_volume', 'cost_basis'), 0)
+
+    return render_template('admin_dashboard.html',
+                         total_traders=int(stats['traders']),
+                         total_trades=int(stats['trades']),
+                         total_volume=round(stats['notional_volume'], 2),
+                         total_market_value=round(stats['cost_basis'], 2))
+
+@routes.route('/admin_portfolio')
+def admin_portfolio():
+    if 'user_id' not in session or session['role'] != 'Admin':
+        return redirect(url_for('login'))
+
+    stocker = current_stocker()
+    snapshot = stocker.market.board.current()
+    try:
+        positions, valuation = stocker.value_all_portfolios(snapshot.prices)
+        portfolios = [dict(valued, timestamp=position[4])
+                      for position, valued in zip(positions, valuation.positions())]
+    except Exception as e:
+        print(f"Error fetching admin portfolio: {e}")
+        flash(f"Error loading admin portfolio: {e}", 'error')
+        portfolios = []
+
+    return render_template('admin_portfolio.html', portfolios=portfolios, valuation_seq=snapshot.seq)
+
+@routes.route('/admin_history')
+def admin_history():
+    if 'user_id' not in session or session['role'] != 'Admin':
+        return redirect(url_for('login'))
+
+    stocker = current_stocker()
+    symbols = stocker.market.symbols
+    filters = parse_filters(request.args, symbols)
+    cursor = decode_cursor(request.args.get('cursor'))
+    if cursor is None and request.args.get('cursor'):
+        return jsonify({'error': 'Invalid cursor'}), 400
+    try:
+        trades, next_cursor = stocker.storage.trades_page(filters, cursor)
+    except Exception as e:
+        print(f"Error fetching admin history: {e}")
+        flash(f"Error loading admin history: {e}", 'error')
+        trades, next_cursor = [], None
+
+    return render_template('admin_history.html', trades=trades, next_cursor=next_cursor,
+                           filters=filters, symbols=symbols)
+
+@routes.route('/admin_export/<dataset>')
+def admin_export(dataset):
+    if 'user_id' not in session or session['role'] != 'Admin':
+        return redirect(url_for('login'))
+
+    fmt = request.args.get('format', 'csv')
+    if dataset not in EXPORT_COLUMNS or fmt not in EXPORT_FORMATS:
+        return jsonify({'error': 'Unknown export'}), 404
+
+    stocker = current_stocker()
+    columns, rows = stocker.storage.export(dataset, parse_filters(request.args, stocker.market.symbols))
+    return Response(encode_rows(fmt, columns, rows),
+                    mimetype=EXPORT_FORMATS[fmt],
+                    headers={'Content-Disposition': f'attachment; filename={export_filename(dataset, fmt)}'})
+
+@routes.route('/admin_manage')
+def admin_manage():
+    if 'user_id' not in session or session['role'] != 'Admin':
+        return redirect(url_for('login'))
+
+    stocker = current_stocker()
+    snapshot = stocker.market.board.current()
+    try:
+        traders = stocker.storage.list_traders()
+        # Portfolio value is market value at the current prices
+        totals = stocker.value_all_portfolios(snapshot.prices)[1].totals()
+    except Exception as e:
+        print(f"Error fetching admin manage data: {e}")
+        flash(f"Error loading admin manage page: {e}", 'error')
+        traders, totals = [], {}
+
+    for trader in traders:
+        owned = totals.get(trader['owner'])
+        trader['portfolio_value'] = owned['market_value'] if owned else 0.0
+        trader['stocks_owned'] = owned['positions'] if owned else 0
+
+    return render_template('admin_manage.html', traders=traders, valuation_seq=snapshot.seq)
+
+@routes.route('/api/stock_prices')
+def api_stock_prices():
+    payload = current_stocker().market.payload
+    since = parse_last_seq(request.args.get('since'))
+    if since is not None:
+        snapshot, body = payload.delta(since)
+        response = Response(body, mimetype='application/json')
+    else:
+        snapshot, body, etag = payload.full()
+        response = Response(body, mimetype='application/json')
+        response.set_etag(etag)
+        response.last_modified = snapshot.timestamp
+        response.cache_control.no_cache = True
+        response = response.make_conditional(request)
+    response.headers['X-Price-Seq'] = str(snapshot.seq)
+    return response
+
+@routes.route('/api/stock_prices/stream')
+def stock_price_stream():
+    stocker = current_stocker()
+    # Each stream holds a thread until the client leaves; past the cap, clients poll
+    if not stocker.price_streams.acquire():
+        return jsonify({'error': 'Too many price streams. Poll /api/stock_prices instead.'}), 503
+    last_seq = parse_last_seq(request.headers.get('Last-Event-ID', request.args.get('since')))
+    response = Response(price_events(stocker.market.board, last_seq),
+                        mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    response.call_on_close(stocker.price_streams.release)
+    return response
+
+@routes.route('/api/portfolio/valuation')
+def portfolio_valuation():
+    if 'user_id' not in session or session['role'] != 'Trader':
+        return jsonify({'error': 'Login required'}), 401
+
+    stocker = current_stocker()
+    snapshot = stocker.market.board.current()
+    valuation = stocker.value_portfolio(session['user_id'], snapshot.prices)
+    return jsonify({'seq': snapshot.seq, 'total': valuation.total(), 'positions': valuation.positions()})
+
+@routes.route('/api/portfolio/pnl')
+def portfolio_pnl():
+    if 'user_id' not in session or session['role'] != 'Trader':
+        return jsonify({'error': 'Login required'}), 401
+
+    stocker = current_stocker()
+    user_id = session['user_id']
+    realized = stocker.storage.realized(user_id)
+    if realized is None:
+        return jsonify({'error': 'Realized P&L is not tracked by this backend'}), 404
+
+    snapshot = stocker.market.board.current()
+    valuation = stocker.value_portfolio(user_id, snapshot.prices)
+    positions, total = pnl_report(valuation.positions(), realized)
+    return jsonify({'seq': snapshot.seq, 'method': stocker.storage.method, 'total': total,
+                    'positions': positions})
+
+@routes.route('/api/admin/valuation')
+def admin_valuation():
+    if 'user_id' not in session or session['role'] != 'Admin':
+        return jsonify({'error': 'Login required'}), 401
+
+    stocker = current_stocker()
+    snapshot = stocker.market.board.current()
+    valuation = stocker.value_all_portfolios(snapshot.prices)[1]
+    payload = {'seq': snapshot.seq, 'total': valuation.total(), 'users': valuation.totals()}
+    if request.args.get('positions'):
+        payload['positions'] = valuation.positions()
+    return jsonify(payload)
+
+@routes.route('/api/candles/<symbol>')
+def api_candles(symbol):
+    market = current_stocker().market
+    symbol = symbol.upper()
+    if symbol not in market.symbols:
+        return jsonify({'error': 'Unknown symbol'}), 404
+    try:
+        interval, start, end, limit = parse_candle_query(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    candles = market.tick_store.candles(symbol, interval, start, end, limit)
+    return jsonify({'symbol': symbol, 'interval': interval,
+                    'columns': ['time', 'open', 'high', 'low', 'close', 'volume'], 'candles': candles})
+
+@routes.route('/api/orders/batch', methods=['POST'])
+def api_orders_batch():
+    if 'user_id' not in session or session['role'] != 'Trader':
+        return jsonify({'error': 'Login required'}), 401
+
+    payload = request.get_json(silent=True) or {}
+    orders = payload.get('orders')
+    if not isinstance(orders, list) or not orders:
+        return jsonify({'error': 'Expected a non-empty "orders" list'}), 400
+    if len(orders) > MAX_BATCH_ORDERS:
+        return jsonify({'error': f'At most {MAX_BATCH_ORDERS} orders per batch'}), 413
+
+    # Price every order against the same snapshot
+    stocker = current_stocker()
+    results = stocker.execute_batch(session['user_id'], orders, stocker.market.board.current().prices)
+    filled = sum(1 for r in results if r['status'] == 'filled')
+
+    # 'rejected' counts every order not filled, including backend errors
+    return jsonify({'filled': filled, 'rejected': len(results) - filled, 'orders': results})
+
+@routes.route('/api/portfolio_cache/stats')
+def portfolio_cache_stats():
+    if 'user_id' not in session or session['role'] != 'Admin':
+        return jsonify({'error': 'Login required'}), 401
+    return jsonify(current_stocker().portfolio_cache.stats())
+
+# Prometheus scrape endpoint; like most exporters it is not behind the login
+@routes.route('/metrics')
+def metrics():
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+@routes.command('reconcile-stats')
+def reconcile_stats_command():
+    """Recompute the admin dashboard counters from the stored users, trades and positions."""
+    storage = current_stocker().storage
+    storage.init()
+    for name, value in storage.reconcile_stats().items():
+        print(f"{name}: {value}")
+
+@routes.command('price-publisher')
+@click.option('--name', default=lambda: SHARED_PRICES or DEFAULT_SHARED_PRICES,
+              help='Shared-memory name; workers set STOCKER_SHARED_PRICES to it.')
+def price_publisher_command(name):
+    """Run the one price simulator shared by worker processes, until interrupted."""
+    stocker = current_stocker()
+    stocker.storage.start()
+    try:
+        stocker.market.run_publisher(name)
+    finally:
+        stocker.storage.close()